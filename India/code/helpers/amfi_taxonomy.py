@@ -69,17 +69,36 @@ def find_unapproved_taxonomy_rows(csv_file, path=None):
     '''
     import csv as csv_module
 
+    if not os.path.exists(csv_file):
+        return []
+    with open(csv_file, 'r', newline='') as f:
+        return find_unapproved_taxonomy_in_rows(list(csv_module.reader(f)), path)
+
+
+def find_unapproved_taxonomy_in_rows(rows, path=None):
+    '''
+    find_unapproved_taxonomy_in_rows is find_unapproved_taxonomy_rows over
+    the already parsed rows of mf.csv, header first
+    '''
     known_types, known_categories = load_known_taxonomy(path)
     problems = []
-    if not os.path.exists(csv_file):
+    if not rows:
         return problems
-    with open(csv_file, 'r', newline='') as f:
-        reader = csv_module.DictReader(f)
-        for lineno, row in enumerate(reader, start=2):
-            fund_type = (row.get('amfi_fund_type') or '').strip()
-            category = (row.get('amfi_category') or '').strip()
-            if fund_type and fund_type not in known_types:
-                problems.append((lineno, 'amfi_fund_type', fund_type))
-            if category and category not in known_categories:
-                problems.append((lineno, 'amfi_category', category))
+    header = rows[0]
+    type_idx = header.index('amfi_fund_type') if 'amfi_fund_type' in header else None
+    category_idx = header.index('amfi_category') if 'amfi_category' in header else None
+
+    def get_value(row, idx):
+        if idx is None or idx >= len(row):
+            return ''
+        return row[idx].strip()
+
+    # blank lines are skipped without being counted, as csv.DictReader does
+    for lineno, row in enumerate((row for row in rows[1:] if row), start=2):
+        fund_type = get_value(row, type_idx)
+        category = get_value(row, category_idx)
+        if fund_type and fund_type not in known_types:
+            problems.append((lineno, 'amfi_fund_type', fund_type))
+        if category and category not in known_categories:
+            problems.append((lineno, 'amfi_category', category))
     return problems
@@ -0,0 +1,137 @@
+import asyncio
+from urllib.parse import urlsplit
+import httpx
+from .http_cache import get_default_cache, CachedResponse
+from .http_client import (TokenBucket, HOST_RATE_LIMITS, DEFAULT_TIMEOUT, DEFAULT_RETRIES,
+                          RETRY_STATUS_CODES, get_backoff, get_retry_after)
+
+
+# requests in flight across all hosts, and per host
+MAX_IN_FLIGHT = 200
+MAX_IN_FLIGHT_PER_HOST = 100
+
+
+class AsyncFetcher:
+    '''
+    AsyncFetcher is the asyncio counterpart of HttpClient: GET with a cap on
+    requests in flight per host, the same per-host token buckets and the same
+    retry/backoff policy.  Successful responses go through the default
+    HttpCache, so an enrichment re-run replays from disk like the threaded
+    fetchers do.
+    '''
+    def __init__(self, client, per_host=MAX_IN_FLIGHT_PER_HOST, rate_limits=None,
+                 retries=DEFAULT_RETRIES, cache=None):
+        self.client = client
+        self.per_host = per_host
+        self.rate_limits = HOST_RATE_LIMITS if rate_limits is None else rate_limits
+        self.retries = retries
+        self.cache = cache
+        self._host_slots = dict()
+        self._buckets = dict()
+
+    async def get(self, url, **kwargs):
+        # the cache reads and writes files, so it runs off the event loop
+        if self.cache:
+            cached = await asyncio.to_thread(self.cache.get_fresh, url)
+            if cached:
+                return cached
+        host = urlsplit(url).hostname
+        slots = self._host_slots.get(host)
+        if not slots:
+            slots = self._host_slots[host] = asyncio.Semaphore(self.per_host)
+        async with slots:
+            response = await self._get_with_retries(url, host, **kwargs)
+        if response.status_code == 200 and self.cache:
+            await asyncio.to_thread(self.cache.put, url, response.content, response.headers, response.encoding)
+        return CachedResponse(url, response.status_code, response.content,
+                              dict(response.headers), response.encoding)
+
+    async def _get_with_retries(self, url, host, **kwargs):
+        for attempt in range(1, self.retries + 1):
+            await self._throttle(host)
+            try:
+                response = await self.client.get(url, **kwargs)
+            except httpx.TransportError as ex:
+                if attempt == self.retries:
+                    raise
+                delay = get_backoff(attempt)
+                print(f'exception {ex!r} getting {url} attempt {attempt}. retrying in {delay:.1f}s')
+                await asyncio.sleep(delay)
+                continue
+            if response.status_code in RETRY_STATUS_CODES and attempt < self.retries:
+                delay = get_retry_after(response) or get_backoff(attempt)
+                print(f'status {response.status_code} getting {url} attempt {attempt}. retrying in {delay:.1f}s')
+                await asyncio.sleep(delay)
+                continue
+            return response
+
+    async def _throttle(self, host):
+        limit = self.rate_limits.get(host)
+        if not limit:
+            return
+        bucket = self._buckets.get(host)
+        if not bucket:
+            bucket = self._buckets[host] = TokenBucket(*limit)
+        while True:
+            wait = bucket.reserve()
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+
+async def run_enrichment(items, worker, on_result, max_in_flight=MAX_IN_FLIGHT,
+                         per_host=MAX_IN_FLIGHT_PER_HOST, verify=True, transport=None, cache=None,
+                         on_error=None):
+    '''
+    run_enrichment calls `await worker(fetcher, key, value)` for every
+    (key, value) in items with at most max_in_flight calls running at once,
+    and hands each result to on_result(key, result) as soon as it completes.
+
+    items are pulled lazily through a bounded queue, so a slow upstream
+    applies backpressure instead of every call being scheduled up front.
+    on_result always runs on the event loop thread, one call at a time, so
+    it can update shared data without locking.  A worker that raises is
+    reported and its key gets on_error(key, exception), or on_result(key,
+    None) without on_error, for callers that need to tell a failed fetch
+    from a key with nothing to add.
+    '''
+    limits = httpx.Limits(max_connections=max_in_flight, max_keepalive_connections=max_in_flight)
+    async with httpx.AsyncClient(verify=verify, timeout=DEFAULT_TIMEOUT, limits=limits,
+                                 transport=transport) as client:
+        fetcher = AsyncFetcher(client, per_host=per_host, cache=cache)
+        queue = asyncio.Queue(maxsize=max_in_flight)
+        done = object()
+
+        async def produce():
+            for item in items:
+                await queue.put(item)
+            for _ in range(max_in_flight):
+                await queue.put(done)
+
+        async def consume():
+            while True:
+                item = await queue.get()
+                if item is done:
+                    return
+                key, value = item
+                try:
+                    result = await worker(fetcher, key, value)
+                except Exception as ex:
+                    print(f'ERROR: exception enriching {key}: {ex!r}')
+                    if on_error:
+                        on_error(key, ex)
+                        continue
+                    result = None
+                on_result(key, result)
+
+        await asyncio.gather(produce(), *[consume() for _ in range(max_in_flight)])
+
+
+def enrich(items, worker, on_result, max_in_flight=MAX_IN_FLIGHT, per_host=MAX_IN_FLIGHT_PER_HOST,
+           verify=True, transport=None, on_error=None):
+    '''
+    enrich runs run_enrichment to completion from synchronous code, using the
+    default HttpCache.  See run_enrichment for the arguments.
+    '''
+    return asyncio.run(run_enrichment(items, worker, on_result, max_in_flight, per_host,
+                                      verify, transport, get_default_cache(), on_error))
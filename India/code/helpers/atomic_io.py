@@ -0,0 +1,206 @@
+import contextlib
+import json
+import os
+import stat
+import tempfile
+import time
+
+
+JOURNAL_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'portfoliomanager-data', 'journal')
+# a journal left behind by a run that stopped more than this long ago is not resumed
+JOURNAL_MAX_AGE = 24 * 60 * 60
+# Checkpoint appends its buffered results after this many, or this many seconds
+CHECKPOINT_FLUSH_EVERY = 100
+CHECKPOINT_FLUSH_INTERVAL = 30
+
+
+def fsync_dir(path):
+    '''
+    fsync_dir makes a rename in directory path durable (no-op where directories can't be opened, e.g. Windows)
+    '''
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+@contextlib.contextmanager
+def atomic_write(path, mode='w', **kwargs):
+    '''
+    atomic_write is open(path, mode, **kwargs) for writing a whole file
+    without ever leaving it truncated: data goes to a temp file in the same
+    directory, which is fsynced and renamed over path only once the with
+    block completes.  If the block raises, path is left untouched.
+    '''
+    path = os.path.abspath(path)
+    directory = os.path.dirname(path)
+    # a unique temp file, so threads writing the same path don't share one
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f'.{os.path.basename(path)}.', suffix='.tmp')
+    try:
+        # mkstemp creates the file private; give it the mode path had, or a plain file's
+        try:
+            os.chmod(tmp_path, stat.S_IMODE(os.stat(path).st_mode))
+        except OSError:
+            os.chmod(tmp_path, 0o644)
+        with os.fdopen(fd, mode, **kwargs) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        fsync_dir(directory)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def write_json(path, data, encoding=None, **dump_kwargs):
+    '''
+    write_json is json.dump(data, open(path, 'w'), **dump_kwargs) done with atomic_write
+    '''
+    with atomic_write(path, 'w', encoding=encoding) as f:
+        json.dump(data, f, **dump_kwargs)
+
+
+class Journal:
+    '''
+    Journal is an append-only record (one JSON object per line) of the steps
+    a multi-phase run has completed, so that a run interrupted part way can
+    be started again and skip the steps, and the network work behind them,
+    that already finished.  Each record is fsynced as it is appended.
+
+    A journal whose last record is older than max_age belongs to a run that
+    was abandoned rather than interrupted, and is started over.
+    '''
+    def __init__(self, name, journal_dir=None, max_age=JOURNAL_MAX_AGE):
+        self.path = os.path.join(journal_dir or JOURNAL_DIR, f'{name}.jsonl')
+        self.max_age = max_age
+        self.records = self._load()
+
+    def _load(self):
+        records = list()
+        try:
+            with open(self.path, 'r') as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        # a record cut short by a crash; everything before it stands
+                        break
+        except OSError:
+            return records
+        if records and time.time() - records[-1].get('at', 0) > self.max_age:
+            print(f'ignoring journal {self.path} last updated {time.ctime(records[-1].get("at", 0))}')
+            self.clear()
+            return list()
+        return records
+
+    def is_done(self, step):
+        return any(record.get('step') == step for record in self.records)
+
+    def completed(self):
+        return [record.get('step') for record in self.records]
+
+    def record(self, step, **details):
+        '''
+        record appends that step completed, with any details worth keeping (e.g. files written)
+        '''
+        record = dict(details, step=step, at=time.time())
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self.records.append(record)
+
+    def clear(self):
+        '''
+        clear forgets every step, once a run has completed
+        '''
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.records = list()
+
+
+class Checkpoint:
+    '''
+    Checkpoint keeps the results of a long running phase (e.g. per scheme
+    code payloads fetched from upstream) on disk as they come in, so a run
+    that dies part way can resume with them instead of fetching everything
+    again.  Results are buffered and appended, fsynced, every flush_every
+    results or flush_interval seconds, whichever comes first.
+
+    Without resume any results left by an earlier run are discarded.
+    '''
+    def __init__(self, name, resume=False, journal_dir=None, flush_every=None, flush_interval=None):
+        self.path = os.path.join(journal_dir or JOURNAL_DIR, f'{name}.checkpoint.jsonl')
+        self.flush_every = flush_every or CHECKPOINT_FLUSH_EVERY
+        self.flush_interval = flush_interval or CHECKPOINT_FLUSH_INTERVAL
+        self.results = dict()
+        self._pending = list()
+        self._flushed_at = time.monotonic()
+        if resume:
+            self._load()
+            if self.results:
+                print(f'resuming with {len(self.results)} results from {self.path}')
+        else:
+            self.clear()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        break
+                    self.results[record['key']] = record['result']
+        except OSError:
+            pass
+
+    def __contains__(self, key):
+        return key in self.results
+
+    def add(self, key, result):
+        self.results[key] = result
+        self._pending.append({'key': key, 'result': result})
+        if len(self._pending) >= self.flush_every or time.monotonic() - self._flushed_at >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if self._pending:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, 'a') as f:
+                for record in self._pending:
+                    f.write(json.dumps(record) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            self._pending = list()
+        self._flushed_at = time.monotonic()
+
+    def clear(self):
+        '''
+        clear discards the results, once the phase has written them out
+        '''
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.results = dict()
+        self._pending = list()
+
+
+def run_step(journal, step, fn, *args, **kwargs):
+    '''
+    run_step calls fn(*args, **kwargs) and records step in journal, unless
+    journal already has step from an interrupted run
+    '''
+    if journal.is_done(step):
+        print(f'skipping {step}: completed by an earlier run')
+        return None
+    result = fn(*args, **kwargs)
+    journal.record(step)
+    return result
@@ -0,0 +1,112 @@
+import atexit
+import contextlib
+import os
+import threading
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+
+
+def needs_no_sandbox():
+    '''
+    needs_no_sandbox tells if Chrome has to run without its sandbox: as root
+    (it refuses to start otherwise), on CI, or when PM_CHROME_NO_SANDBOX=1
+    '''
+    if os.environ.get('PM_CHROME_NO_SANDBOX') == '1' or os.environ.get('CI'):
+        return True
+    return hasattr(os, 'geteuid') and os.geteuid() == 0
+
+
+class BrowserPool:
+    '''
+    BrowserPool starts Chrome once, the first time a scraper asks for it,
+    and hands each scraper a fresh tab of that one browser instead of every
+    scraper paying for a cold start of its own.  A WebDriver drives one tab
+    at a time, so tabs are handed out one at a time too.
+
+    Chrome runs headless unless headless=False.
+    '''
+    def __init__(self, headless=True, service=None):
+        self.headless = headless
+        self.service = service
+        self._driver = None
+        self._home = None
+        self._lock = threading.RLock()
+
+    def _start(self):
+        options = webdriver.ChromeOptions()
+        if self.headless:
+            options.add_argument('--headless=new')
+        if needs_no_sandbox():
+            options.add_argument('--no-sandbox')
+        options.add_argument('--disable-dev-shm-usage')
+        driver = webdriver.Chrome(service=self.service or Service(), options=options)
+        self._home = driver.current_window_handle
+        return driver
+
+    @property
+    def started(self):
+        return self._driver is not None
+
+    @contextlib.contextmanager
+    def tab(self, download_dir=None):
+        '''
+        tab yields the driver switched to a new tab, which is closed
+        afterwards.  Files the tab downloads go to download_dir if given.
+        '''
+        with self._lock:
+            if self._driver is None:
+                self._driver = self._start()
+            driver = self._driver
+            driver.switch_to.new_window('tab')
+            try:
+                if download_dir:
+                    driver.execute_cdp_cmd('Browser.setDownloadBehavior',
+                                           {'behavior': 'allow', 'downloadPath': os.path.abspath(download_dir)})
+                yield driver
+            finally:
+                try:
+                    # implicit waits are set on the driver, not the tab
+                    driver.implicitly_wait(0)
+                    driver.close()
+                    driver.switch_to.window(self._home)
+                except Exception as ex:
+                    # a tab we can't get back from; start afresh next time
+                    print(f'exception {ex} closing browser tab. restarting browser')
+                    self.close()
+
+    def close(self):
+        '''
+        close quits the browser, if it was started
+        '''
+        with self._lock:
+            if self._driver is not None:
+                try:
+                    self._driver.quit()
+                except Exception as ex:
+                    print(f'exception {ex} quitting browser')
+                self._driver = None
+                self._home = None
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_browser_pool():
+    '''
+    get_browser_pool returns the process wide BrowserPool, closed when the
+    process exits.  PM_HEADLESS=0 shows the browser window.
+    '''
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool(headless=os.environ.get('PM_HEADLESS', '1') != '0')
+            atexit.register(_pool.close)
+    return _pool
+
+
+def browser_tab(download_dir=None):
+    '''
+    browser_tab is get_browser_pool().tab(download_dir)
+    '''
+    return get_browser_pool().tab(download_dir)
@@ -0,0 +1,128 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+
+
+# seconds between directory snapshots when inotify is not available
+POLL_INTERVAL = 0.2
+
+# names browsers give a download until it is complete
+PARTIAL_SUFFIXES = ('.crdownload', '.part', '.partial', '.download', '.tmp')
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+# struct inotify_event: wd, mask, cookie, len, then len bytes of NUL padded name
+INOTIFY_EVENT = struct.Struct('iIII')
+
+
+def is_partial_download(name):
+    return name.endswith(PARTIAL_SUFFIXES) or name.startswith('.')
+
+
+def snapshot(directory):
+    '''
+    snapshot returns the set of file names in directory
+    '''
+    return set(os.listdir(directory))
+
+
+def _init_inotify(directory):
+    # an inotify fd watching directory for files closed after writing or
+    # renamed into it, or None where inotify can't be used
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    if libc.inotify_add_watch(fd, os.fsencode(directory), IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+        os.close(fd)
+        return None
+    return fd
+
+
+class DownloadWatcher:
+    '''
+    DownloadWatcher notices files a browser downloads into directory.
+    Create it before starting the download; wait then returns as soon as a
+    new file is completely written.  On Linux it is woken by inotify when a
+    file is closed after writing or renamed into place (as Chrome does with
+    its .crdownload files).  Elsewhere it compares snapshots of the
+    directory every POLL_INTERVAL seconds and takes a file whose size held
+    between two snapshots as complete.
+    '''
+    def __init__(self, directory, use_inotify=True):
+        self.directory = directory
+        self.existing = snapshot(directory)
+        self._fd = _init_inotify(directory) if use_inotify else None
+        # names inotify reported complete, or sizes seen at the last snapshot
+        self._completed = set()
+        self._sizes = dict()
+
+    def _new_names(self):
+        return {name for name in snapshot(self.directory) - self.existing if not is_partial_download(name)}
+
+    def _complete_names(self):
+        names = self._new_names()
+        if self._fd is not None:
+            return names & self._completed
+        sizes = dict()
+        for name in names:
+            try:
+                sizes[name] = os.path.getsize(os.path.join(self.directory, name))
+            except OSError:
+                pass
+        complete = {name for name, size in sizes.items() if self._sizes.get(name) == size}
+        self._sizes = sizes
+        return complete
+
+    def wait(self, timeout):
+        '''
+        wait returns the paths of the new files once a download has
+        completed, or [] after timeout seconds
+        '''
+        deadline = time.monotonic() + timeout
+        while True:
+            if self._complete_names():
+                # the caller decides what to make of more than one
+                return sorted(os.path.join(self.directory, name) for name in self._new_names())
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return []
+            if self._fd is None:
+                time.sleep(min(POLL_INTERVAL, remaining))
+            else:
+                self._read_events(remaining)
+
+    def _read_events(self, timeout):
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset < len(data):
+            _, _, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+            name = data[offset + INOTIFY_EVENT.size:offset + INOTIFY_EVENT.size + length]
+            self._completed.add(os.fsdecode(name.rstrip(b'\0')))
+            offset += INOTIFY_EVENT.size + length
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,125 @@
+import datetime
+import json
+import os
+from .atomic_io import write_json
+from .gold_series import GOLD_DIR, DATE_FORMAT, get_year_files
+
+
+def new_year_data():
+    return {
+        "date_format": "dd/mm/yyyy",
+        "currency": "INR",
+        "weight": "gram",
+        "prices": {
+        }
+    }
+
+
+def month_start(dt):
+    return datetime.date(dt.year, dt.month, 1)
+
+
+def month_starts(first, last):
+    '''
+    month_starts returns the first of every month from first's month to
+    last's month, both included
+    '''
+    res = list()
+    dt = month_start(first)
+    while dt <= last:
+        res.append(dt)
+        dt = datetime.date(dt.year + dt.month // 12, dt.month % 12 + 1, 1)
+    return res
+
+
+def read_year_files(gold_dir=None):
+    '''
+    read_year_files returns {year: (path, data)} of the yearly price files in gold_dir
+    '''
+    res = dict()
+    for year, path in get_year_files(gold_dir).items():
+        with open(path, 'r') as f:
+            res[year] = (path, json.load(f))
+    return res
+
+
+def get_recorded_months(year_files):
+    months = set()
+    for _, data in year_files.values():
+        for dt_str in data.get('prices', dict()):
+            months.add(month_start(datetime.datetime.strptime(dt_str, DATE_FORMAT).date()))
+    return months
+
+
+def find_missing_months(year_files, today=None):
+    '''
+    find_missing_months returns the month starts, from the first month on
+    record up to today's month, with no price in any year file.  A month
+    counts as recorded if it has a price for any day of it, as when the 1st
+    was a holiday (06/08/2022).
+    '''
+    today = today or datetime.date.today()
+    recorded = get_recorded_months(year_files)
+    if not recorded:
+        return [month_start(today)]
+    return [dt for dt in month_starts(min(recorded), today) if dt not in recorded]
+
+
+def get_fill(month, physical_gold, digi_gold):
+    '''
+    get_fill returns (date, prices) of the earliest day of month that has
+    both a physical and a digital price, or (None, None)
+    '''
+    days = sorted(dt for dt in digi_gold if dt in physical_gold and month_start(dt) == month)
+    if not days:
+        return None, None
+    dt = days[0]
+    return dt, {"24K": physical_gold[dt]["24K"], "22K": physical_gold[dt]["22K"], "digital": digi_gold[dt]}
+
+
+def sort_prices(prices):
+    return dict(sorted(prices.items(), key=lambda item: datetime.datetime.strptime(item[0], DATE_FORMAT)))
+
+
+class GoldBackfill:
+    '''
+    GoldBackfill fills months missing from the yearly gold price files from
+    one fetch of the price history pages.
+
+    missing lists what needs filling, so a run with nothing missing doesn't
+    fetch at all.  fill adds what the fetched history has of those months
+    and writes each year file it changed exactly once; still_missing is
+    what the history didn't go back far enough for.
+    '''
+    def __init__(self, gold_dir=None, today=None):
+        self.gold_dir = gold_dir or GOLD_DIR
+        if not os.path.exists(self.gold_dir):
+            raise Exception(f"gold directory {self.gold_dir} does not exist")
+        self.year_files = read_year_files(self.gold_dir)
+        self.missing = find_missing_months(self.year_files, today)
+        self.filled = dict()
+        self.still_missing = list(self.missing)
+
+    def fill(self, physical_gold, digi_gold):
+        '''
+        fill returns the paths of the year files written
+        '''
+        changed = dict()
+        still_missing = list()
+        for month in self.missing:
+            dt, prices = get_fill(month, physical_gold, digi_gold)
+            if not dt:
+                still_missing.append(month)
+                continue
+            self.filled[dt] = prices
+            changed.setdefault(dt.year, dict())[dt.strftime(DATE_FORMAT)] = prices
+        self.still_missing = still_missing
+
+        written = list()
+        for year, prices in sorted(changed.items()):
+            path, data = self.year_files.get(year, (os.path.join(self.gold_dir, f'{year}.json'), new_year_data()))
+            data["prices"] = sort_prices({**data.get("prices", dict()), **prices})
+            write_json(path, data, indent=4)
+            self.year_files[year] = (path, data)
+            written.append(path)
+        return written
@@ -0,0 +1,78 @@
+import lxml.html
+from .utils import get_float_or_none_from_string, get_date_or_none_from_string
+
+
+DATE_FORMAT = '%d %B %Y'
+
+
+def get_price(text):
+    return get_float_or_none_from_string(text.replace('₹', '').replace(',', '').strip())
+
+
+def find_column(header, name):
+    for i, cell in enumerate(header):
+        if name in cell:
+            return i
+    return None
+
+
+def get_tables(html):
+    '''
+    get_tables yields (header cells, data rows) of every table in html, with
+    the text of each cell stripped.  The first row is taken as the header.
+    '''
+    if not html or not html.strip():
+        return
+    doc = lxml.html.fromstring(html)
+    for table in doc.iter('table'):
+        rows = [[cell.text_content().strip() for cell in row.xpath('./th|./td')] for row in table.iter('tr')]
+        if rows:
+            yield rows[0], rows[1:]
+
+
+def parse_physical_gold_html(html):
+    '''
+    parse_physical_gold_html returns {date: {'24K': price, '22K': price}} per
+    gram from the daily rates table of gadgets360's gold rate page (prices
+    there are per 10 grams)
+    '''
+    res = dict()
+    for header, rows in get_tables(html):
+        text = ' '.join(header)
+        if 'Date' not in text or '24K' not in text or '22K' not in text:
+            continue
+        col24k = find_column(header, '24K')
+        col22k = find_column(header, '22K')
+        for cols in rows:
+            if len(cols) <= max(col24k, col22k):
+                continue
+            dt = get_date_or_none_from_string(cols[0], DATE_FORMAT, printout=False)
+            val24k = get_price(cols[col24k])
+            val22k = get_price(cols[col22k])
+            if dt and val22k and val24k:
+                res[dt] = {"24K": val24k/10, "22K": val22k/10}
+    return res
+
+
+def parse_digital_gold_html(html):
+    '''
+    parse_digital_gold_html returns {date: closing price per gram} from the
+    price history table of gadgets360's digital gold page.  The table either
+    has a Close column (with Open/High/Low) or a single Price column.
+    '''
+    res = dict()
+    for header, rows in get_tables(html):
+        text = ' '.join(header)
+        if 'Date' not in text or ('Price' not in text and 'Close' not in text):
+            continue
+        col = find_column(header, 'Close')
+        if col is None:
+            col = find_column(header, 'Price')
+        for cols in rows:
+            if len(cols) <= col:
+                continue
+            dt = get_date_or_none_from_string(cols[0], DATE_FORMAT, printout=False)
+            val24k = get_price(cols[col])
+            if dt and val24k:
+                res[dt] = val24k
+    return res
@@ -0,0 +1,159 @@
+import datetime
+import json
+import os
+import re
+import threading
+import numpy as np
+
+
+GOLD_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'gold')
+# gold/<year>.json; other files there (e.g. sgb_tranche.json) are not prices
+YEAR_FILE = re.compile(r'^(\d{4})\.json$')
+DATE_FORMAT = '%d/%m/%Y'
+
+PRICE_FIELDS = ['24K', '22K', 'digital']
+GOLD_DTYPE = np.dtype([('date', 'datetime64[D]')] + [(field, 'f8') for field in PRICE_FIELDS])
+
+
+def get_year_files(gold_dir=None):
+    '''
+    get_year_files returns {year: path} of the yearly price files in gold_dir
+    '''
+    gold_dir = gold_dir or GOLD_DIR
+    files = dict()
+    for name in os.listdir(gold_dir):
+        match = YEAR_FILE.match(name)
+        if match:
+            files[int(match.group(1))] = os.path.join(gold_dir, name)
+    return files
+
+
+def to_datetime64(dt):
+    if isinstance(dt, str):
+        dt = datetime.datetime.strptime(dt, DATE_FORMAT).date()
+    elif isinstance(dt, datetime.datetime):
+        dt = dt.date()
+    return np.datetime64(dt, 'D')
+
+
+def to_prices(row):
+    '''
+    to_prices turns a row of the series into the {'24K', '22K', 'digital'}
+    dict of the year files, leaving out prices not recorded
+    '''
+    return {field: float(row[field]) for field in PRICE_FIELDS if not np.isnan(row[field])}
+
+
+def read_year_file(path):
+    with open(path, 'r') as f:
+        prices = json.load(f).get('prices', dict())
+    rows = [(to_datetime64(dt_str),) + tuple(np.nan if values.get(field) is None else values[field] for field in PRICE_FIELDS)
+            for dt_str, values in prices.items()]
+    return np.array(rows, dtype=GOLD_DTYPE)
+
+
+class GoldSeries:
+    '''
+    GoldSeries is every yearly gold price file as one date sorted NumPy
+    structured array of (date, 24K, 22K, digital), with NaN for a price a
+    date doesn't have.  Point, range and as-of lookups are binary searches
+    over it.
+
+    Every year file is read in full on the first lookup.  Lookups after
+    that don't touch the filesystem; call refresh to pick up files changed
+    since (say update_gold added a month).
+    '''
+    def __init__(self, gold_dir=None):
+        self.gold_dir = gold_dir or GOLD_DIR
+        self._signature = None
+        self._series = None
+        self._lock = threading.Lock()
+
+    def _get_signature(self):
+        signature = list()
+        for year, path in sorted(get_year_files(self.gold_dir).items()):
+            st = os.stat(path)
+            signature.append((year, st.st_mtime_ns, st.st_size))
+        return tuple(signature)
+
+    def _load(self):
+        signature = self._get_signature()
+        if self._series is not None and signature == self._signature:
+            return False
+        files = get_year_files(self.gold_dir)
+        parts = [read_year_file(files[year]) for year, _, _ in signature]
+        series = np.concatenate(parts) if parts else np.empty(0, dtype=GOLD_DTYPE)
+        series = np.sort(series, order='date', kind='stable')
+        # a date listed twice keeps its last listing
+        last = np.append(series['date'][1:] != series['date'][:-1], True) if len(series) else []
+        self._series = series[last]
+        self._signature = signature
+        return True
+
+    def refresh(self):
+        '''
+        refresh reads the year files again if any was added, removed or
+        changed since they were read, and returns whether it did
+        '''
+        with self._lock:
+            return self._load()
+
+    @property
+    def series(self):
+        if self._series is None:
+            with self._lock:
+                if self._series is None:
+                    self._load()
+        return self._series
+
+    def __len__(self):
+        return len(self.series)
+
+    def dates(self):
+        return [dt.astype(datetime.date) for dt in self.series['date']]
+
+    def get(self, dt):
+        '''
+        get returns the prices recorded for date dt, or None
+        '''
+        series = self.series
+        day = to_datetime64(dt)
+        i = np.searchsorted(series['date'], day)
+        if i < len(series) and series['date'][i] == day:
+            return to_prices(series[i])
+        return None
+
+    def as_of(self, dt):
+        '''
+        as_of returns (date, prices) of the latest date on or before dt, or (None, None)
+        '''
+        series = self.series
+        i = np.searchsorted(series['date'], to_datetime64(dt), side='right')
+        if i == 0:
+            return None, None
+        return series['date'][i - 1].astype(datetime.date), to_prices(series[i - 1])
+
+    def range(self, start=None, end=None):
+        '''
+        range returns the rows of the series dated start to end, both
+        inclusive and either open ended, as a structured array view
+        '''
+        series = self.series
+        lo = 0 if start is None else np.searchsorted(series['date'], to_datetime64(start), side='left')
+        hi = len(series) if end is None else np.searchsorted(series['date'], to_datetime64(end), side='right')
+        return series[lo:hi]
+
+
+_gold_series = None
+_gold_series_lock = threading.Lock()
+
+
+def get_gold_series():
+    '''
+    get_gold_series returns the process wide GoldSeries over India/gold
+    '''
+    global _gold_series
+    with _gold_series_lock:
+        if _gold_series is None:
+            _gold_series = GoldSeries()
+    return _gold_series
@@ -0,0 +1,347 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+import requests
+from .http_client import HttpClient, get_client
+
+
+CACHE_ROOT = os.path.join(os.path.expanduser('~'), '.cache', 'portfoliomanager-data')
+DEFAULT_CACHE_DIR = os.path.join(CACHE_ROOT, 'http')
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+HOUR = 60 * 60
+DAY = 24 * HOUR
+
+# How long a cached response is served without asking upstream again, by
+# URL prefix (first match wins).  NAV files change daily; scheme metadata
+# rarely does.  Anything not listed here is never served from cache.
+DEFAULT_TTLS = [
+    ('https://www.amfiindia.com/spages/NAVAll.txt', 6 * HOUR),
+    ('https://portal.amfiindia.com/spages/NAVAll.txt', 6 * HOUR),
+    ('https://api.mfapi.in/mf/', DAY),
+    ('https://api.kuvera.in/mf/api/v4/fund_schemes/list.json', DAY),
+    ('https://api.kuvera.in/mf/api/v5/fund_schemes/', 7 * DAY),
+    ('https://lt.morningstar.com/api/rest.svc/', DAY),
+]
+
+
+class CachedResponse:
+    '''
+    CachedResponse is the subset of requests.Response the fetchers in this
+    package use, backed by either a cached or a freshly fetched body.
+    '''
+    def __init__(self, url, status_code, content, headers=None, encoding=None, from_cache=False):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or dict()
+        self.encoding = encoding or 'utf-8'
+        self.from_cache = from_cache
+
+    @property
+    def ok(self):
+        return 200 <= self.status_code < 400
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding, errors='replace')
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class HttpCache:
+    '''
+    HttpCache keeps successful GET responses on disk, gzip compressed and
+    keyed by URL, so a re-run (e.g. after a crash during interactive review)
+    replays upstream payloads instead of downloading them again.
+
+    A response younger than its endpoint's TTL is served straight from disk.
+    An older one is revalidated with If-None-Match/If-Modified-Since and
+    re-served on 304.  If upstream can't be reached at all, a stale copy is
+    served rather than failing.  Total size on disk is bounded; the least
+    recently used responses are evicted first.
+    '''
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES, ttls=None):
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.max_bytes = max_bytes
+        self.ttls = DEFAULT_TTLS if ttls is None else ttls
+        self._lock = threading.Lock()
+        self._total_bytes = None
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def get_ttl(self, url):
+        for prefix, ttl in self.ttls:
+            if url.startswith(prefix):
+                return ttl
+        return 0
+
+    def get(self, url, session=None, ttl=None, **kwargs):
+        '''
+        get returns a CachedResponse for url, fetching it with session (or
+        the shared HttpClient) only when there is no fresh cached copy.
+
+        :param ttl: seconds a cached copy stays fresh.  Defaults to the endpoint's TTL from ttls
+        :param kwargs: passed on to session.get (e.g. timeout, verify)
+        '''
+        if ttl is None:
+            ttl = self.get_ttl(url)
+        if ttl <= 0:
+            return self._fetch(url, session, None, False, **kwargs)
+        meta = self._load_meta(url)
+        if meta and time.time() - meta['fetched_at'] < ttl:
+            cached = self._load(url, meta)
+            if cached:
+                return cached
+        return self._fetch(url, session, meta, True, **kwargs)
+
+    def get_fresh(self, url, ttl=None):
+        '''
+        get_fresh returns the cached response for url if it is within its TTL,
+        else None.  For fetchers that do their own I/O (e.g. asyncio) and
+        only want the cache's storage.
+        '''
+        if ttl is None:
+            ttl = self.get_ttl(url)
+        if ttl <= 0:
+            return None
+        meta = self._load_meta(url)
+        if meta and time.time() - meta['fetched_at'] < ttl:
+            return self._load(url, meta)
+        return None
+
+    def iter_lines(self, url, session=None, ttl=None, **kwargs):
+        '''
+        iter_lines is get for large text bodies: it yields the decoded lines
+        of url as they arrive instead of returning the whole body, so callers
+        can work through a response while it downloads.  Lines are written to
+        the cache as they stream and the copy is kept only once the body has
+        been read to the end.
+        '''
+        if ttl is None:
+            ttl = self.get_ttl(url)
+        meta = self._load_meta(url) if ttl > 0 else None
+        body_path, _ = self._paths(url)
+        if meta and time.time() - meta['fetched_at'] < ttl and os.path.exists(body_path):
+            yield from self._iter_cached_lines(url, meta)
+            return
+        headers = dict(kwargs.pop('headers', None) or dict())
+        if meta:
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+        try:
+            response = (session or get_client()).get(url, headers=headers, stream=True, **kwargs)
+        except requests.RequestException as ex:
+            if meta and os.path.exists(body_path):
+                print(f'exception {ex} getting {url}. serving cached copy from {time.ctime(meta["fetched_at"])}')
+                yield from self._iter_cached_lines(url, meta)
+                return
+            raise
+        if response.status_code == 304 and meta and os.path.exists(body_path):
+            meta['fetched_at'] = time.time()
+            self._write_meta(url, meta)
+            yield from self._iter_cached_lines(url, meta)
+            return
+        if response.status_code != 200:
+            raise requests.HTTPError(f'status {response.status_code} getting {url}', response=response)
+        meta = self._new_meta(url, dict(response.headers), response.encoding)
+        encoding = response.encoding or 'utf-8'
+        if ttl <= 0:
+            for line in response.iter_lines():
+                yield line.decode(encoding, errors='replace')
+            return
+        tmp_path = f'{body_path}.{threading.get_ident()}.tmp'
+        try:
+            with gzip.open(tmp_path, 'wb') as f:
+                for line in response.iter_lines():
+                    f.write(line + b'\n')
+                    yield line.decode(encoding, errors='replace')
+            self._commit(url, tmp_path, meta)
+        finally:
+            response.close()
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _iter_cached_lines(self, url, meta):
+        body_path, _ = self._paths(url)
+        os.utime(body_path)
+        with gzip.open(body_path, 'rt', encoding=meta.get('encoding') or 'utf-8', errors='replace', newline='') as f:
+            for line in f:
+                yield line.rstrip('\r\n')
+
+    def put(self, url, content, headers=None, encoding=None):
+        '''
+        put stores a successful response body for url if its endpoint has a TTL
+        '''
+        if self.get_ttl(url) <= 0:
+            return
+        headers = dict(headers or dict())
+        self._store(url, content, self._new_meta(url, headers, encoding))
+
+    def clear(self):
+        with self._lock:
+            for entry in os.scandir(self.cache_dir):
+                if entry.is_file():
+                    os.remove(entry.path)
+            self._total_bytes = 0
+
+    def _fetch(self, url, session, meta, store, **kwargs):
+        headers = dict(kwargs.pop('headers', None) or dict())
+        if meta:
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+        try:
+            response = (session or get_client()).get(url, headers=headers, **kwargs)
+        except requests.RequestException as ex:
+            cached = self._load(url, meta) if meta else None
+            if cached:
+                print(f'exception {ex} getting {url}. serving cached copy from {time.ctime(meta["fetched_at"])}')
+                return cached
+            raise
+        if response.status_code == 304 and meta:
+            cached = self._load(url, meta)
+            if cached:
+                meta['fetched_at'] = time.time()
+                self._write_meta(url, meta)
+                return cached
+        if response.status_code != 200:
+            return CachedResponse(url, response.status_code, response.content,
+                                  dict(response.headers), response.encoding)
+        meta = self._new_meta(url, dict(response.headers), response.encoding)
+        if store:
+            self._store(url, response.content, meta)
+        return CachedResponse(url, 200, response.content, meta['headers'], response.encoding)
+
+    @staticmethod
+    def _new_meta(url, headers, encoding):
+        return {
+            'url': url,
+            'fetched_at': time.time(),
+            'etag': headers.get('ETag', headers.get('etag', '')),
+            'last_modified': headers.get('Last-Modified', headers.get('last-modified', '')),
+            'encoding': encoding,
+            'headers': headers,
+        }
+
+    def _paths(self, url):
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, key + '.gz'), os.path.join(self.cache_dir, key + '.json')
+
+    def _load_meta(self, url):
+        _, meta_path = self._paths(url)
+        try:
+            with open(meta_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _load(self, url, meta):
+        body_path, _ = self._paths(url)
+        try:
+            with gzip.open(body_path, 'rb') as f:
+                content = f.read()
+            # mtime doubles as the last-access time for LRU eviction
+            os.utime(body_path)
+        except (OSError, EOFError):
+            return None
+        return CachedResponse(url, 200, content, meta.get('headers'), meta.get('encoding'), from_cache=True)
+
+    def _write_meta(self, url, meta):
+        _, meta_path = self._paths(url)
+        tmp_path = f'{meta_path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)
+
+    def _store(self, url, content, meta):
+        body_path, _ = self._paths(url)
+        tmp_path = f'{body_path}.{threading.get_ident()}.tmp'
+        with gzip.open(tmp_path, 'wb') as f:
+            f.write(content)
+        self._commit(url, tmp_path, meta)
+
+    def _commit(self, url, tmp_path, meta):
+        body_path, _ = self._paths(url)
+        with self._lock:
+            self._ensure_total()
+            if os.path.exists(body_path):
+                self._total_bytes -= os.path.getsize(body_path)
+            os.replace(tmp_path, body_path)
+            self._total_bytes += os.path.getsize(body_path)
+            self._write_meta(url, meta)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _ensure_total(self):
+        if self._total_bytes is None:
+            self._total_bytes = sum(entry.stat().st_size for entry in os.scandir(self.cache_dir)
+                                    if entry.name.endswith('.gz'))
+
+    def _evict(self):
+        # drop least recently used bodies until comfortably under the limit
+        bodies = sorted((entry.stat().st_mtime, entry.path, entry.stat().st_size)
+                        for entry in os.scandir(self.cache_dir) if entry.name.endswith('.gz'))
+        target = self.max_bytes * 0.9
+        for _, path, size in bodies:
+            if self._total_bytes <= target:
+                break
+            for p in [path, path[:-len('.gz')] + '.json']:
+                if os.path.exists(p):
+                    os.remove(p)
+            self._total_bytes -= size
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache():
+    '''
+    get_default_cache returns the process wide HttpCache, or None if caching
+    is turned off with PM_HTTP_CACHE=0.  PM_HTTP_CACHE_DIR overrides where
+    responses are kept.
+    '''
+    global _default_cache
+    if os.environ.get('PM_HTTP_CACHE', '1') == '0':
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = HttpCache(os.environ.get('PM_HTTP_CACHE_DIR'))
+    return _default_cache
+
+
+def cached_get(url, session=None, ttl=None, retries=None, **kwargs):
+    '''
+    cached_get is a drop in for session.get(url, **kwargs) that goes through
+    the default HttpCache.  retries is for an HttpClient session; a plain
+    requests.Session doesn't take it and makes a single attempt.
+    '''
+    session = session or get_client()
+    if retries is not None and isinstance(session, HttpClient):
+        kwargs['retries'] = retries
+    cache = get_default_cache()
+    if not cache:
+        return session.get(url, **kwargs)
+    return cache.get(url, session, ttl, **kwargs)
+
+
+def cached_iter_lines(url, session=None, ttl=None, **kwargs):
+    '''
+    cached_iter_lines streams the decoded lines of url through the default
+    HttpCache (see HttpCache.iter_lines)
+    '''
+    cache = get_default_cache()
+    if not cache:
+        response = (session or get_client()).get(url, stream=True, **kwargs)
+        if response.status_code != 200:
+            raise requests.HTTPError(f'status {response.status_code} getting {url}', response=response)
+        encoding = response.encoding or 'utf-8'
+        return (line.decode(encoding, errors='replace') for line in response.iter_lines())
+    return cache.iter_lines(url, session, ttl, **kwargs)
@@ -0,0 +1,182 @@
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+
+# worker threads used by the threaded fetchers (e.g. mf_ms.fetch_ms_pages);
+# the connection pool per host is sized to match so no worker waits on, or
+# discards, a connection
+MAX_WORKERS = 10
+# hosts the shared session keeps a connection pool for at once: kuvera (api
+# and site), mfapi, morningstar, amfiindia (www and portal), nsearchives,
+# nseindia, bseindia and gadgets360, with room to spare so none is evicted
+POOL_HOSTS = 16
+
+DEFAULT_TIMEOUT = 15
+# a host that doesn't accept the connection by then is taken as down
+DEFAULT_CONNECT_TIMEOUT = 5
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+MAX_BACKOFF = 30
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# (requests per second, burst) allowed per host.  Hosts not listed are not throttled.
+HOST_RATE_LIMITS = {
+    'api.kuvera.in': (20, 20),
+    'api.mfapi.in': (20, 20),
+    'lt.morningstar.com': (10, 10),
+}
+
+
+def get_backoff(attempt, backoff=DEFAULT_BACKOFF):
+    '''
+    get_backoff returns the delay before retry `attempt`: exponential in the
+    attempt number, capped at MAX_BACKOFF, with full jitter
+    '''
+    return random.uniform(0, min(MAX_BACKOFF, backoff * 2 ** (attempt - 1)))
+
+
+def is_unreachable(ex):
+    '''
+    is_unreachable tells if ex means the host couldn't be connected to at all
+    (DNS failure, connection refused, no route, connect timeout), which
+    retrying a moment later won't change
+    '''
+    if isinstance(ex, requests.ConnectTimeout):
+        return True
+    # requests wraps urllib3's MaxRetryError, whose reason is the real error
+    cause = ex.args[0] if ex.args else None
+    return isinstance(cause, NewConnectionError) or isinstance(getattr(cause, 'reason', None), NewConnectionError)
+
+
+def get_retry_after(response):
+    '''
+    get_retry_after returns the seconds asked for by a Retry-After header, or None
+    '''
+    try:
+        return min(MAX_BACKOFF, float(response.headers.get('Retry-After', '')))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    '''
+    TokenBucket allows `rate` acquisitions per second on average with bursts
+    of up to `capacity`.  acquire blocks until a token is available; reserve
+    is the non-blocking form for callers that wait some other way (asyncio).
+    '''
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        '''
+        reserve takes a token and returns 0 if one is available, otherwise
+        returns the seconds to wait before trying again
+        '''
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self):
+        while True:
+            wait = self.reserve()
+            if not wait:
+                return
+            time.sleep(wait)
+
+
+class HttpClient:
+    '''
+    HttpClient is the one HTTP session shared by all upstream fetchers.  It
+    keeps connections alive in a pool sized for MAX_WORKERS threads, retries
+    dropped connections, read timeouts and retryable statuses (429/5xx)
+    with exponential backoff and full jitter, and throttles each host to
+    HOST_RATE_LIMITS.  A host that can't be connected to fails at once
+    instead: it would only fail again on every retry.
+    '''
+    def __init__(self, pool_size=MAX_WORKERS, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF,
+                 rate_limits=None):
+        self.retries = retries
+        self.backoff = backoff
+        self.rate_limits = HOST_RATE_LIMITS if rate_limits is None else rate_limits
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=POOL_HOSTS, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._buckets = dict()
+        self._buckets_lock = threading.Lock()
+
+    def get(self, url, retries=None, **kwargs):
+        '''
+        get behaves like requests.get(url, **kwargs), retrying up to `retries`
+        attempts in total.  The last response (or exception) is returned (or
+        raised) once attempts run out.  A single number timeout is the read
+        timeout; connecting gets at most DEFAULT_CONNECT_TIMEOUT of it.
+        '''
+        timeout = kwargs.get('timeout', DEFAULT_TIMEOUT)
+        if isinstance(timeout, (int, float)):
+            kwargs['timeout'] = (min(DEFAULT_CONNECT_TIMEOUT, timeout), timeout)
+        attempts = retries or self.retries
+        host = urlsplit(url).hostname
+        for attempt in range(1, attempts + 1):
+            self._throttle(host)
+            try:
+                response = self.session.get(url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as ex:
+                if attempt == attempts or is_unreachable(ex):
+                    raise
+                delay = get_backoff(attempt, self.backoff)
+                print(f'exception {ex} getting {url} attempt {attempt}. retrying in {delay:.1f}s')
+                time.sleep(delay)
+                continue
+            if response.status_code in RETRY_STATUS_CODES and attempt < attempts:
+                delay = get_retry_after(response) or get_backoff(attempt, self.backoff)
+                print(f'status {response.status_code} getting {url} attempt {attempt}. retrying in {delay:.1f}s')
+                # hand the connection back to the pool before waiting
+                response.close()
+                time.sleep(delay)
+                continue
+            return response
+
+    def _throttle(self, host):
+        limit = self.rate_limits.get(host)
+        if not limit:
+            return
+        with self._buckets_lock:
+            bucket = self._buckets.get(host)
+            if not bucket:
+                bucket = self._buckets[host] = TokenBucket(*limit)
+        bucket.acquire()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    '''
+    get_client returns the process wide HttpClient
+    '''
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+    return _client
+
+
+def get(url, **kwargs):
+    return get_client().get(url, **kwargs)
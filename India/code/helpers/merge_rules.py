@@ -0,0 +1,118 @@
+ALL_FIELDS = '*'
+
+
+class MergeRule:
+    '''
+    MergeRule copies fields from a new entry into an existing one when every
+    condition given holds:
+
+    :param name: name recorded against each field the rule copies
+    :param same: fields that must hold the same value in both entries
+    :param set_in_new: fields that must not be blank in the new entry
+    :param blank_in_old: fields that must be blank in the existing entry
+    :param when: callable(new_entry, entry) for anything else
+    :param copy: fields always copied (a missing field is copied as None)
+    :param copy_if_set: fields copied only when not blank in the new entry;
+        ALL_FIELDS for every field of the new entry
+    '''
+    def __init__(self, name, same=(), set_in_new=(), blank_in_old=(), when=None, copy=(), copy_if_set=()):
+        self.name = name
+        self.same = same
+        self.set_in_new = set_in_new
+        self.blank_in_old = blank_in_old
+        self.when = when
+        self.copy = copy
+        self.copy_if_set = copy_if_set
+
+    def matches(self, new_entry, entry):
+        for field in self.same:
+            if new_entry.get(field, '') != entry.get(field, ''):
+                return False
+        for field in self.set_in_new:
+            if new_entry.get(field, '') == '':
+                return False
+        for field in self.blank_in_old:
+            if entry.get(field, '') != '':
+                return False
+        return self.when is None or self.when(new_entry, entry)
+
+    def apply(self, new_entry, entry, fired):
+        for field in self.copy:
+            entry[field] = new_entry.get(field)
+            fired[field] = self.name
+        fields = new_entry.keys() if self.copy_if_set == ALL_FIELDS else self.copy_if_set
+        for field in fields:
+            value = new_entry.get(field)
+            if value and value.strip() != '':
+                entry[field] = value
+                fired[field] = self.name
+
+
+def merge_entry(new_entry, entry, rules):
+    '''
+    merge_entry applies rules in order to entry (updated in place), each
+    seeing the entry as the rules before it left it.  A field copied by
+    several rules ends up with the last one's value.
+
+    Returns {field: name of the rule that set it}.
+    '''
+    fired = dict()
+    for rule in rules:
+        if rule.matches(new_entry, entry):
+            rule.apply(new_entry, entry, fired)
+    return fired
+
+
+def merge_entries(new_data, data, rules):
+    '''
+    merge_entries runs merge_entry for every ISIN in both new_data and data,
+    in one pass over new_data.
+
+    Returns {isin: {field: rule name}} for the ISINs any rule changed.
+    '''
+    fired = dict()
+    for isin, new_entry in new_data.items():
+        if isin in data:
+            fields = merge_entry(new_entry, data[isin], rules)
+            if fields:
+                fired[isin] = fields
+    return fired
+
+
+def count_fired_rules(fired):
+    '''
+    count_fired_rules returns {rule name: number of ISINs it changed}
+    '''
+    counts = dict()
+    for fields in fired.values():
+        for name in set(fields.values()):
+            counts[name] = counts.get(name, 0) + 1
+    return counts
+
+
+# every non blank field of the update replaces the existing value
+UPDATE_RULES = [
+    MergeRule('update', copy_if_set=ALL_FIELDS),
+]
+
+# what update_share.copy_selected_fields takes from modified_nse_bse_eq.json
+# into nse_bse_eq.json for an ISIN in both
+SELECTED_FIELD_RULES = [
+    # the same listing on both exchanges: refresh the BSE details
+    MergeRule('bse_details',
+              same=['bse_security_id', 'bse_security_code', 'nse_symbol'], set_in_new=['bse_security_id'],
+              copy=['bse_name', 'status', 'industry'], copy_if_set=['listing_date', 'cap', 'face_value']),
+    # same BSE listing and NSE symbol: refresh the NSE details
+    MergeRule('nse_details',
+              same=['bse_security_id', 'bse_security_code', 'nse_symbol'], set_in_new=['nse_symbol'],
+              copy=['listing_date', 'nse_name', 'industry']),
+    # same BSE listing, newly listed on NSE
+    MergeRule('nse_listing',
+              same=['bse_security_id', 'bse_security_code'], set_in_new=['nse_symbol'], blank_in_old=['nse_symbol'],
+              copy=['nse_symbol', 'listing_date', 'nse_name', 'industry']),
+    # NSE only so far, now listed on BSE under the NSE symbol
+    MergeRule('bse_listing',
+              same=['nse_symbol'], set_in_new=['nse_symbol'], blank_in_old=['bse_security_code', 'bse_security_id'],
+              when=lambda new_entry, entry: entry.get('nse_symbol', '') == new_entry.get('bse_security_id', ''),
+              copy=['bse_security_code', 'bse_security_id', 'bse_name', 'status']),
+]
@@ -1,8 +1,12 @@
-from mftool import Mftool
 import datetime
-import requests
 from .utils import get_date_or_none_from_string, get_date_or_none_from_string, get_float_or_zero_from_string
 from .amfi_taxonomy import apply_known_amfi_aliases
+from .http_cache import cached_get, cached_iter_lines
+
+
+# same file Mftool reads; fetched directly since Mftool() downloads it once more on construction
+NAV_ALL_URL = 'https://www.amfiindia.com/spages/NAVAll.txt'
+NAV_ALL_ALTERNATE_URL = 'https://portal.amfiindia.com/spages/NAVAll.txt'
 
 
 def parse_fund_type_info(scheme_data):
@@ -29,15 +33,29 @@ def parse_fund_type_info(scheme_data):
 
 
 def get_all_schemes()->dict:
+    return dict(iter_all_schemes())
+
+
+def iter_all_schemes():
+    '''
+    iter_all_schemes yields (code, details) for every scheme in AMFI's
+    NAVAll.txt with a non zero NAV as the file downloads, falling back to
+    the alternate URL if the primary can't be read.  A failure part way
+    through restarts from the alternate, so a code may be yielded twice.
+    '''
     try:
-        mf = Mftool()
-        url = mf._get_quote_url
-        response = mf._session.get(url)
-        data = response.text.split("\n")
+        yield from parse_nav_all(cached_iter_lines(NAV_ALL_URL))
     except Exception as e:
-        print(f'ERROR: exception fetching amfi details using Mftool: {e}.  Trying alternate')
-        data = get_schemes_alternate()
-    scheme_info = {}
+        print(f'ERROR: exception fetching amfi details from {NAV_ALL_URL}: {e}.  Trying alternate')
+        yield from parse_nav_all(get_schemes_alternate())
+
+
+def parse_nav_all(lines):
+    '''
+    parse_nav_all yields (code, details) for each scheme line in lines of
+    NAVAll.txt.  Fund house and AMFI type/category come from the header
+    lines preceding each block of schemes.
+    '''
     fund_house = ""
     amfi_fund_type = ""
     amfi_fund_category = ""
@@ -46,7 +64,7 @@ def get_all_schemes()->dict:
     count = 0
     month_ago = datetime.datetime.today() - datetime.timedelta(days=30)
     month_ago = month_ago.date()
-    for scheme_data in data:
+    for scheme_data in lines:
         if ";INF" in scheme_data:
             try:
                 scheme = scheme_data.rstrip().split(";")
@@ -57,19 +75,20 @@ def get_all_schemes()->dict:
                     isin2 = ''
                     if scheme[2] and scheme[2] != '' and scheme[2] != '-':
                         isin2 = scheme[2]
-                    scheme_info[scheme[0]] = {'isin': isin,
-                                            'isin2':isin2,
-                                            'name':scheme[3],
-                                            'nav':scheme[4],
-                                            'date':scheme[5],
-                                            'amfi_fund_type':amfi_fund_type,
-                                            'amfi_category':amfi_fund_category}
+                    details = {'isin': isin,
+                               'isin2':isin2,
+                               'name':scheme[3],
+                               'nav':scheme[4],
+                               'date':scheme[5],
+                               'amfi_fund_type':amfi_fund_type,
+                               'amfi_category':amfi_fund_category}
                     if not 'open ended' in fund_house.lower() and fund_house != '':
-                        scheme_info[scheme[0]]['fund_house'] = fund_house
+                        details['fund_house'] = fund_house
                     dt = get_date_or_none_from_string(scheme[5], '%d-%b-%Y')
                     if dt and dt < month_ago:
-                        scheme_info[scheme[0]]['end_date'] = dt.strftime('%d-%m-%Y')
+                        details['end_date'] = dt.strftime('%d-%m-%Y')
                     count += 1
+                    yield scheme[0], details
             except Exception as e:
                 print(f'ERROR: exception processing scheme data {scheme_data}: {e}')
                 
@@ -81,16 +100,9 @@ def get_all_schemes()->dict:
                     fund_house = scheme_data.strip()
     print(f'found {count} funds. ignored {ignored_zero_nav} zero nav funds and {ignored_no_isin} no isin funds')
 
-    return scheme_info
-
 
 def get_schemes_alternate():
-    url = "https://portal.amfiindia.com/spages/NAVAll.txt"
-    _session = requests.Session()
-    _session.verify = False
-    response = _session.get(url)
-    data = response.text.split("\n")
-    return data
+    return cached_iter_lines(NAV_ALL_ALTERNATE_URL, verify=False)
 
 def get_details_amfi(code):
         """
@@ -100,34 +112,45 @@ def get_details_amfi(code):
         :return: dict or None
         :raises: HTTPError, URLError
         """
-        code = str(code)
-        scheme_info = {}
-        url = f"https://api.mfapi.in/mf/{code}"
-        _session = requests.Session()
-        _session.verify = False
-        response = _session.get(url).json()
-        # close the session after use
-        _session.close()
-        scheme_data = response['meta']
-        scheme_info['fund_house'] = scheme_data['fund_house']
-        splits = scheme_data['scheme_category'].split('-')
-        fund_type = splits[0].strip() if splits else ''
-        fund_category = splits[1].strip() if len(splits) > 1 else ''
-        fund_type, fund_category = apply_known_amfi_aliases(fund_type, fund_category)
-        scheme_info['amfi_fund_type'] = fund_type
-        scheme_info['amfi_fund_category'] = fund_category
-        scheme_info['scheme_code'] = scheme_data['scheme_code']
-        scheme_info['name'] = scheme_data['scheme_name']
-        last_day = response['data'][int(len(response['data']) -1)]
-        scheme_info['scheme_start_date'] = last_day['date']
-        first_date = get_date_or_none_from_string(response['data'][0]['date'], '%d-%m-%Y')
-        month_ago = datetime.datetime.today() - datetime.timedelta(days=30)
-        month_ago = month_ago.date()
-        if first_date and first_date < month_ago:
-            scheme_info['scheme_end_date'] = response['data'][0]['date']
-        else:            
-            scheme_info['scheme_end_date'] = ''
-        return scheme_info
+        response = cached_get(get_details_amfi_url(code), verify=False).json()
+        return parse_details_amfi(response)
+
+
+async def get_details_amfi_async(fetcher, code):
+    '''
+    get_details_amfi_async is get_details_amfi for the asyncio enrichment
+    engine; fetcher is the AsyncFetcher handed to the worker.
+    '''
+    response = await fetcher.get(get_details_amfi_url(code))
+    return parse_details_amfi(response.json())
+
+
+def get_details_amfi_url(code):
+    return f"https://api.mfapi.in/mf/{code}"
+
+
+def parse_details_amfi(response):
+    scheme_info = {}
+    scheme_data = response['meta']
+    scheme_info['fund_house'] = scheme_data['fund_house']
+    splits = scheme_data['scheme_category'].split('-')
+    fund_type = splits[0].strip() if splits else ''
+    fund_category = splits[1].strip() if len(splits) > 1 else ''
+    fund_type, fund_category = apply_known_amfi_aliases(fund_type, fund_category)
+    scheme_info['amfi_fund_type'] = fund_type
+    scheme_info['amfi_fund_category'] = fund_category
+    scheme_info['scheme_code'] = scheme_data['scheme_code']
+    scheme_info['name'] = scheme_data['scheme_name']
+    last_day = response['data'][int(len(response['data']) -1)]
+    scheme_info['scheme_start_date'] = last_day['date']
+    first_date = get_date_or_none_from_string(response['data'][0]['date'], '%d-%m-%Y')
+    month_ago = datetime.datetime.today() - datetime.timedelta(days=30)
+    month_ago = month_ago.date()
+    if first_date and first_date < month_ago:
+        scheme_info['scheme_end_date'] = response['data'][0]['date']
+    else:            
+        scheme_info['scheme_end_date'] = ''
+    return scheme_info
 
 
 def check_amfi_entry_complete(entry):
@@ -1,4 +1,4 @@
-from .mf_entry import get_mf_entries, get_new_entry, write_entries, get_path_to_csv
+from .mf_entry import get_mf_entries, get_new_entry, get_path_to_csv, EntryChanges
 
 
 def update_multiple_entries(csv_file=None):
@@ -34,6 +34,7 @@ def update_single_code_in_csv(code, csv_file=None):
     from helpers.mf_kuvera import Kuvera
 
     kuvera = Kuvera()
+    changes = EntryChanges()
 
     for code_value in codes:
         if str(code_value) in data:
@@ -69,8 +70,10 @@ def update_single_code_in_csv(code, csv_file=None):
                 entry['kuvera_fund_category'] = kuvera_data.get('fund_category', entry.get('kuvera_fund_category', ''))
                 entry['kuvera_code'] = kuvera_data.get('kuvera_code', entry.get('kuvera_code', ''))
 
+        changes.update(str(code_value), existing=str(code_value) in data)
         data[str(code_value)] = entry
-        write_entries(data, f'updating code {code_value}', csv_file)
+
+    changes.flush(data, f'updating codes {", ".join(codes)}', csv_file)
 
     if len(codes) == 1:
         return data[str(codes[0])]
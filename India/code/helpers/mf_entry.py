@@ -2,10 +2,19 @@ import csv
 import os
 import pathlib
 import re
+import threading
+try:
+    from .atomic_io import atomic_write
+except ImportError:
+    # imported as a top level module by verify_file_content run as a script
+    from atomic_io import atomic_write
 
 
 ISIN_RE = re.compile(r'^[A-Z]{2}[A-Z0-9]{9}[0-9]$')
 
+# columns of mf.csv, in file order
+MF_CSV_FIELDS = ['code','name','isin','isin2','fund_house', 'inception_date','end_date','amfi_fund_type','amfi_category','ms_name','ms_category','ms_investment_style','ms_id', 'kuvera_name', 'kuvera_fund_category', 'kuvera_code']
+
 
 def get_path_to_csv():
     '''
@@ -29,9 +38,47 @@ def find_malformed_rows(csv_file):
 
     Returns a list of (line_number, raw_line) tuples for offending rows.
     '''
-    problems = []
     if not os.path.exists(csv_file):
-        return problems
+        return []
+    _, problems = read_mf_csv(csv_file)
+    return problems
+
+
+def find_malformed_in_rows(rows):
+    '''
+    find_malformed_in_rows is find_malformed_rows over the already parsed
+    rows of mf.csv, header first
+    '''
+    if not rows:
+        return []
+    header = rows[0]
+    isin_idx = header.index('isin') if 'isin' in header else None
+    return [(lineno, ','.join(row)) for lineno, row in enumerate(rows[1:], start=2)
+            if is_malformed_row(row, len(header), isin_idx)]
+
+
+def is_malformed_row(row, expected_len, isin_idx):
+    '''
+    is_malformed_row is the per row check of find_malformed_rows
+    '''
+    if len(row) != expected_len:
+        return True
+    if isin_idx is not None and isin_idx < len(row):
+        value = row[isin_idx].strip()
+        if value and value != '-' and not ISIN_RE.match(value):
+            return True
+    return False
+
+
+def read_mf_csv(csv_file):
+    '''
+    read_mf_csv parses mf.csv once, checking every row as find_malformed_rows
+    does while building the entries get_mf_entries returns.
+
+    Returns (data, problems).  data holds the well formed rows only.
+    '''
+    data = dict()
+    problems = []
     with open(csv_file, 'r', newline='') as f:
         reader = csv.reader(f)
         header = next(reader, [])
@@ -40,28 +87,45 @@ def find_malformed_rows(csv_file):
             isin_idx = header.index('isin')
         except ValueError:
             isin_idx = None
+        columns = [(i, field) for i, field in enumerate(header) if field != 'code']
+        code_idx = header.index('code') if 'code' in header else 0
         for lineno, row in enumerate(reader, start=2):
-            if len(row) != expected_len:
+            if is_malformed_row(row, expected_len, isin_idx):
                 problems.append((lineno, ','.join(row)))
                 continue
-            if isin_idx is not None and isin_idx < len(row):
-                value = row[isin_idx].strip()
-                if value and value != '-' and not ISIN_RE.match(value):
-                    problems.append((lineno, ','.join(row)))
-    return problems
+            entry = get_new_entry()
+            for i, field in columns:
+                entry[field] = row[i]
+            data[row[code_idx]] = entry
+    return data, problems
+
+
+# get_mf_entries results by path, valid while the file's (mtime, size) is unchanged
+_entries_cache = dict()
+_entries_cache_lock = threading.Lock()
 
 
 def get_mf_entries(csv_file=None):
     '''
     get_mf_entries reads mf.csv file and return entries in dict format
 
+    The file is parsed and validated in one pass, and only again once it
+    changes on disk; repeat calls get a fresh copy of the cached entries.
+
     :param csv_file: Provide location of mf.csv.  If not provided, gets path using get_path_to_csv function
     '''
     if not csv_file:
         csv_file = get_path_to_csv()
-    data = dict()
-    if os.path.exists(csv_file):
-        problems = find_malformed_rows(csv_file)
+    if not os.path.exists(csv_file):
+        return dict()
+    stat = os.stat(csv_file)
+    key = (stat.st_mtime_ns, stat.st_size)
+    with _entries_cache_lock:
+        cached = _entries_cache.get(csv_file)
+    if cached and cached[0] == key:
+        data = cached[1]
+    else:
+        data, problems = read_mf_csv(csv_file)
         if problems:
             lines = ', '.join(str(lineno) for lineno, _ in problems)
             raise ValueError(
@@ -70,27 +134,20 @@ def get_mf_entries(csv_file=None):
                 'misalign isin/isin2/fund_house on read. Fix these rows (see '
                 'code/fix_mf_csv.py) before reading/writing this file.'
             )
-        with open(csv_file, 'r') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                code = row.get('code')
-                data[code] = get_new_entry()
-                data[code]['name'] = row.get('name')
-                data[code]['isin'] = row.get('isin') 
-                data[code]['isin2'] = row.get('isin2')
-                data[code]['fund_house'] = row.get('fund_house')
-                data[code]['ms_name'] = row.get('ms_name')
-                data[code]['ms_category'] = row.get('ms_category')
-                data[code]['ms_investment_style'] = row.get('ms_investment_style')
-                data[code]['ms_id'] = row.get('ms_id')
-                data[code]['kuvera_name'] = row.get('kuvera_name')
-                data[code]['kuvera_fund_category'] = row.get('kuvera_fund_category')
-                data[code]['kuvera_code'] = row.get('kuvera_code')
-                data[code]['inception_date'] = row.get('inception_date', '')
-                data[code]['end_date'] = row.get('end_date', '')
-                data[code]['amfi_fund_type'] = row.get('amfi_fund_type', '')
-                data[code]['amfi_category'] = row.get('amfi_category', '')
-    return data
+        with _entries_cache_lock:
+            _entries_cache[csv_file] = (key, data)
+    return {code: dict(entry) for code, entry in data.items()}
+
+
+def forget_mf_entries(csv_file=None):
+    '''
+    forget_mf_entries drops the cached entries of csv_file, or of every file
+    '''
+    with _entries_cache_lock:
+        if csv_file:
+            _entries_cache.pop(csv_file, None)
+        else:
+            _entries_cache.clear()
 
 def get_new_entry():
     '''
@@ -114,9 +171,89 @@ def get_new_entry():
         'end_date': ''
     }
 
+class IsinIndex:
+    '''
+    IsinIndex maps an ISIN to the scheme codes in mf.csv that carry it in
+    either their isin or isin2 column, so callers that match upstream rows
+    by ISIN (e.g. Morningstar) can do a dict lookup instead of scanning
+    every entry.  More than one code can share an ISIN; codes are kept in
+    the order they were added, which matches iteration order over the
+    entries the index was built from.
+    '''
+    def __init__(self, data=None):
+        self._codes = dict()
+        self._isins = dict()
+        if data:
+            for code, entry in data.items():
+                self.add(code, entry)
+
+    def add(self, code, entry):
+        '''
+        add indexes entry's isin and isin2 under code.  Call again after an
+        entry's ISINs change; stale ISINs for code are dropped first.
+        '''
+        self.remove(code)
+        isins = list()
+        for field in ['isin', 'isin2']:
+            isin = (entry.get(field) or '').strip()
+            if not isin or isin == '-' or isin in isins:
+                continue
+            isins.append(isin)
+            self._codes.setdefault(isin, []).append(code)
+        if isins:
+            self._isins[code] = isins
+
+    def remove(self, code):
+        for isin in self._isins.pop(code, []):
+            self._codes[isin].remove(code)
+            if not self._codes[isin]:
+                del self._codes[isin]
+
+    def get_codes(self, isin):
+        '''
+        get_codes returns all scheme codes carrying isin (possibly empty)
+        '''
+        return list(self._codes.get(isin, []))
+
+    def get_first_code(self, isin):
+        '''
+        get_first_code returns the earliest added scheme code carrying isin, or None
+        '''
+        codes = self._codes.get(isin)
+        return codes[0] if codes else None
+
+    def __contains__(self, isin):
+        return isin in self._codes
+
+    def __len__(self):
+        return len(self._codes)
+
+
+def get_row(code, entry):
+    '''
+    get_row returns the mf.csv row of entry, in MF_CSV_FIELDS order
+    '''
+    return [code, entry['name'],
+            entry['isin'],
+            entry['isin2'],
+            entry['fund_house'],
+            entry.get('inception_date', ''),
+            entry.get('end_date', ''),
+            entry.get('amfi_fund_type', ''),
+            entry.get('amfi_category', ''),
+            entry.get('ms_name', ''),
+            entry.get('ms_category', ''),
+            entry.get('ms_investment_style', ''),
+            entry.get('ms_id', ''),
+            entry.get('kuvera_name', ''),
+            entry.get('kuvera_fund_category', ''),
+            entry.get('kuvera_code', '')]
+
+
 def write_entries(data, phase, csv_file=None):
     '''
-    write_entries writes provided data to mf.csv file
+    write_entries writes provided data to mf.csv file.  The file is replaced
+    atomically, so an interrupted write leaves the previous copy in place.
     
     :param data: data to write to mf.csv file
     :param phase: phase after which this write is being done
@@ -125,23 +262,106 @@ def write_entries(data, phase, csv_file=None):
     print(f'writing data to csv after {phase}')
     if not csv_file:
         csv_file = get_path_to_csv()
-    fields = ['code','name','isin','isin2','fund_house', 'inception_date','end_date','amfi_fund_type','amfi_category','ms_name','ms_category','ms_investment_style','ms_id', 'kuvera_name', 'kuvera_fund_category', 'kuvera_code']
-    with open(csv_file, 'w', newline='') as csvfile:
+    forget_mf_entries(csv_file)
+    with atomic_write(csv_file, 'w', newline='') as csvfile:
         csvwriter = csv.writer(csvfile, lineterminator='\n')
-        csvwriter.writerow(fields)
+        csvwriter.writerow(MF_CSV_FIELDS)
         for i in sorted (data.keys()):
-            csvwriter.writerow([i, data[i]['name'],
-                                data[i]['isin'],
-                                data[i]['isin2'],
-                                data[i]['fund_house'],
-                                data[i].get('inception_date', ''),
-                                data[i].get('end_date', ''),
-                                data[i].get('amfi_fund_type', ''),
-                                data[i].get('amfi_category', ''),
-                                data[i].get('ms_name', ''),
-                                data[i].get('ms_category', ''),
-                                data[i].get('ms_investment_style', ''),
-                                data[i].get('ms_id', ''),
-                                data[i].get('kuvera_name', ''),
-                                data[i].get('kuvera_fund_category', ''),
-                                data[i].get('kuvera_code', '')])
+            csvwriter.writerow(get_row(i, data[i]))
+
+
+class EntryChanges:
+    '''
+    EntryChanges collects the codes added, modified and deleted over a
+    session so they can be written to mf.csv with one
+    write_changed_entries call instead of a full rewrite per change.
+    '''
+    def __init__(self):
+        self.added = set()
+        self.modified = set()
+        self.deleted = set()
+
+    def update(self, code, existing=True):
+        '''
+        update records that code was modified, or added if it wasn't in the file
+        '''
+        self.deleted.discard(code)
+        if code in self.added or not existing:
+            self.added.add(code)
+        else:
+            self.modified.add(code)
+
+    def delete(self, code):
+        if code in self.added:
+            self.added.discard(code)
+        else:
+            self.modified.discard(code)
+            self.deleted.add(code)
+
+    def clear(self):
+        self.added.clear()
+        self.modified.clear()
+        self.deleted.clear()
+
+    def __bool__(self):
+        return bool(self.added or self.modified or self.deleted)
+
+    def __len__(self):
+        return len(self.added) + len(self.modified) + len(self.deleted)
+
+    def flush(self, data, phase, csv_file=None):
+        '''
+        flush writes the collected changes of data to csv_file and starts over
+        '''
+        if self:
+            write_changed_entries(data, self, phase, csv_file)
+            self.clear()
+
+
+def get_line_code(line):
+    if line.startswith('"'):
+        return next(csv.reader([line]))[0]
+    return line.split(',', 1)[0]
+
+
+def write_changed_entries(data, changes, phase, csv_file=None):
+    '''
+    write_changed_entries writes only the rows of `changes` (an EntryChanges)
+    to mf.csv: unchanged lines are copied through as they are, changed
+    and added rows are spliced in at their sorted position and deleted
+    rows are dropped.  The file written is the same as write_entries(data)
+    would write, as long as mf.csv was last written by write_entries (sorted
+    by code).  Like write_entries, the file is replaced atomically.
+
+    :param data: entries holding the current values of every changed code
+    :param changes: EntryChanges of the codes to write
+    :param phase: phase after which this write is being done
+    :param csv_file: location of mf.csv.  If not provided, path is obtained from get_path_to_csv function
+    '''
+    if not csv_file:
+        csv_file = get_path_to_csv()
+    if not os.path.exists(csv_file):
+        write_entries(data, phase, csv_file)
+        return
+    print(f'writing {len(changes)} changed entries to csv after {phase}')
+    forget_mf_entries(csv_file)
+    pending = sorted(changes.added | changes.modified)
+    removed = changes.deleted | changes.modified
+    next_pending = 0
+    with open(csv_file, 'r', newline='') as src, atomic_write(csv_file, 'w', newline='') as dst:
+        csvwriter = csv.writer(dst, lineterminator='\n')
+        header = src.readline()
+        if header:
+            dst.write(header)
+        else:
+            csvwriter.writerow(MF_CSV_FIELDS)
+        for line in src:
+            code = get_line_code(line)
+            while next_pending < len(pending) and pending[next_pending] <= code:
+                csvwriter.writerow(get_row(pending[next_pending], data[pending[next_pending]]))
+                next_pending += 1
+            if code in removed or code in changes.added:
+                continue
+            dst.write(line if line.endswith('\n') else line + '\n')
+        for code in pending[next_pending:]:
+            csvwriter.writerow(get_row(code, data[code]))
@@ -1,9 +1,18 @@
-import requests
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+import httpx
+import json
+import os
+import threading
+import time
+from .http_cache import cached_get, CACHE_ROOT
+from .async_enrich import enrich, MAX_IN_FLIGHT
+from .single_flight import SingleFlight
+from . import http_client
+
+
+# scheme info of every Kuvera code, resolved in bulk by Kuvera.resolve_isin_mapping
+ISIN_MAP_PATH = os.path.join(CACHE_ROOT, 'kuvera_isin_map.json')
+# a resolved code is fetched again once its entry is older than this
+ISIN_MAP_MAX_AGE = 7 * 24 * 60 * 60
 
 
 class Kuvera:
@@ -12,13 +21,32 @@ class Kuvera:
         self.sub_categories = set()
         self.get_fund_schemes()
         self.get_fund_mapping_per_fund_house()
+        self.reset_lookups()
+
+    def reset_lookups(self):
+        '''
+        reset_lookups forgets every scheme info and probable fund name looked
+        up so far.  get_fund_info runs from many workers at once; lookups go
+        through SingleFlight memos so no Kuvera URL is requested twice in a
+        run, and the ISIN mapping they fill is guarded by a lock.
+        '''
         self.isin_to_kuvera_code_mapping = dict()
+        self.isin_mapping_lock = threading.Lock()
+        self.scheme_info_memo = SingleFlight()
+        self.probable_fund_name_memo = SingleFlight()
+        # set once resolve_isin_mapping has looked up every code in fund_schemes
+        self.isin_mapping_resolved = False
 
     def get_sub_categories(self):
         return self.sub_categories
     
     def get_known_isin_mapping(self):
-        return self.isin_to_kuvera_code_mapping
+        with self.isin_mapping_lock:
+            return dict(self.isin_to_kuvera_code_mapping)
+
+    def get_lookup_stats(self):
+        return {'scheme_info': self.scheme_info_memo.stats(),
+                'probable_fund_name': self.probable_fund_name_memo.stats()}
 
     def reset_fund_house_name_change(self, current_data, fund_house_name_changes):
         """Reset stale Kuvera mappings only when the renamed fund house cannot be found.
@@ -63,95 +91,256 @@ class Kuvera:
         return changed
     
     def get_fund_schemes(self):
-        att = 0
-        while att < 5:
-            try:
-                url = "https://api.kuvera.in/mf/api/v4/fund_schemes/list.json"
-                att += 1
-                print(f'getting funds from {url}')
-                page_list_funds = requests.get(url, timeout=15)
-                if page_list_funds.status_code == 200:
-                    page_list_funds_json = page_list_funds.json()
-                    for category,v in page_list_funds_json.items():
-                        self.fund_schemes[category] = dict()
-                        for sub_category, sub_category_details in v.items():
-                            #print('sub category is ', sub_category)
-                            self.sub_categories.add(sub_category)
-                            self.fund_schemes[category][sub_category] = dict()
-                            for fund_house, fund_details in sub_category_details.items():
-                                amfi_fund_house = Kuvera.get_amfi_kuvera_fund_house_mapping().get(fund_house)
-                                self.fund_schemes[category][sub_category][amfi_fund_house] = dict()
-                                for fund in fund_details:
-                                    code = fund['c']
-                                    self.fund_schemes[category][sub_category][amfi_fund_house][code] = {
-                                        'name': fund['n'],
-                                        'nav': fund['v']
-                                    }
-                    break
-            except Exception as ex:
-                print(f'exception {ex} getting {url} attempt {att}')
+        url = "https://api.kuvera.in/mf/api/v4/fund_schemes/list.json"
+        try:
+            print(f'getting funds from {url}')
+            page_list_funds = cached_get(url, timeout=15, retries=5)
+            if page_list_funds.status_code != 200:
+                print(f'status {page_list_funds.status_code} getting {url}')
+                return
+            page_list_funds_json = page_list_funds.json()
+            for category,v in page_list_funds_json.items():
+                self.fund_schemes[category] = dict()
+                for sub_category, sub_category_details in v.items():
+                    #print('sub category is ', sub_category)
+                    self.sub_categories.add(sub_category)
+                    self.fund_schemes[category][sub_category] = dict()
+                    for fund_house, fund_details in sub_category_details.items():
+                        amfi_fund_house = Kuvera.get_amfi_kuvera_fund_house_mapping().get(fund_house)
+                        self.fund_schemes[category][sub_category][amfi_fund_house] = dict()
+                        for fund in fund_details:
+                            code = fund['c']
+                            self.fund_schemes[category][sub_category][amfi_fund_house][code] = {
+                                'name': fund['n'],
+                                'nav': fund['v']
+                            }
+        except Exception as ex:
+            print(f'exception {ex} getting {url}')
     
     def get_fund_info(self, name, isin, amfi_fund_type, amfi_fund_category, fund_house):
         # Not sure how to process non direct plans.
         if not 'direct' in name.lower():
             return None
-        if isin in self.isin_to_kuvera_code_mapping:
-            return self.isin_to_kuvera_code_mapping[isin]
-        fund_type = Kuvera.get_amfi_kuvera_fund_type_mapping().get(amfi_fund_type.replace(' Scheme', '').strip())
+        known = self.get_known_scheme_info(isin)
+        if known:
+            return known
+        fund_type, fund_categories = Kuvera.get_kuvera_fund_type_and_categories(amfi_fund_type, amfi_fund_category)
+        if not fund_type:
+            print(f'found no fund type for {amfi_fund_type}')
+            return None
+        try:
+            for code in self.get_unresolved_fund_house_codes(fund_type, fund_categories, fund_house):
+                scheme_info = self.lookup_scheme_info(code)
+                if self.add_known_scheme_info(scheme_info) == isin:
+                    return scheme_info
+            for fund_details in self.lookup_probable_fund_name(name):
+                scheme_info = self.lookup_scheme_info(fund_details['kuvera_code'])
+                if self.add_known_scheme_info(scheme_info) == isin:
+                    return scheme_info
+        except Exception as e:
+            print(f'exception {e} getting fund info for name {name} isin {isin} fund type {fund_type} fund categories {fund_categories} amfi fund category {amfi_fund_category} fund house {fund_house}')
+        return None
+
+    async def get_fund_info_async(self, fetcher, name, isin, amfi_fund_type, amfi_fund_category, fund_house):
+        '''
+        get_fund_info_async is get_fund_info for the asyncio enrichment engine;
+        fetcher is the AsyncFetcher handed to the worker.
+        '''
+        if not 'direct' in name.lower():
+            return None
+        known = self.get_known_scheme_info(isin)
+        if known:
+            return known
+        fund_type, fund_categories = Kuvera.get_kuvera_fund_type_and_categories(amfi_fund_type, amfi_fund_category)
         if not fund_type:
             print(f'found no fund type for {amfi_fund_type}')
             return None
+        try:
+            for code in self.get_unresolved_fund_house_codes(fund_type, fund_categories, fund_house):
+                scheme_info = await self.lookup_scheme_info_async(fetcher, code)
+                if self.add_known_scheme_info(scheme_info) == isin:
+                    return scheme_info
+            for fund_details in await self.lookup_probable_fund_name_async(fetcher, name):
+                scheme_info = await self.lookup_scheme_info_async(fetcher, fund_details['kuvera_code'])
+                if self.add_known_scheme_info(scheme_info) == isin:
+                    return scheme_info
+        except httpx.TransportError:
+            # a failed request is not the same as Kuvera having no such fund
+            raise
+        except Exception as e:
+            print(f'exception {e} getting fund info for name {name} isin {isin} fund type {fund_type} fund categories {fund_categories} amfi fund category {amfi_fund_category} fund house {fund_house}')
+        return None
+
+    @staticmethod
+    def get_kuvera_fund_type_and_categories(amfi_fund_type, amfi_fund_category):
+        fund_type = Kuvera.get_amfi_kuvera_fund_type_mapping().get(amfi_fund_type.replace(' Scheme', '').strip())
         fund_categories = Kuvera.get_amfi_kuvera_fund_category_mapping().get(amfi_fund_category)
         if isinstance(fund_categories, str):
             fund_categories = [fund_categories]
+        return fund_type, fund_categories
+
+    def get_fund_house_codes(self, fund_type, fund_categories, fund_house):
+        '''
+        get_fund_house_codes returns the Kuvera codes listed under fund_type,
+        any of fund_categories and fund_house.  Raises KeyError if Kuvera has
+        no such fund type or sub category.
+        '''
+        funds_of_type = self.fund_schemes[fund_type]
+        funds_of_sub_category = list()
+        for sub_category in fund_categories:
+            funds_of_sub_category.append(funds_of_type[sub_category])
+        codes = list()
+        for sub_category_funds in funds_of_sub_category:
+            for fund_house_k, fund_details in sub_category_funds.items():
+                if fund_house_k == fund_house:
+                    codes.extend(fund_details.keys())
+        return codes
+
+    def get_unresolved_fund_house_codes(self, fund_type, fund_categories, fund_house):
+        '''
+        get_unresolved_fund_house_codes is get_fund_house_codes, except that
+        once resolve_isin_mapping has run every such code is already in
+        isin_to_kuvera_code_mapping and there is nothing left to look up
+        '''
+        if self.isin_mapping_resolved:
+            return []
+        return self.get_fund_house_codes(fund_type, fund_categories, fund_house)
+
+    def get_all_codes(self):
+        '''
+        get_all_codes returns every Kuvera code in fund_schemes once, in the
+        order first seen, however many fund type/sub category/fund house
+        buckets list it
+        '''
+        codes = dict()
+        for sub_categories in self.fund_schemes.values():
+            for fund_houses in sub_categories.values():
+                for funds in fund_houses.values():
+                    for code in funds:
+                        codes[code] = None
+        return list(codes)
+
+    def resolve_isin_mapping(self, path=ISIN_MAP_PATH, max_age=ISIN_MAP_MAX_AGE, max_in_flight=MAX_IN_FLIGHT):
+        '''
+        resolve_isin_mapping fetches scheme info once for every unique code in
+        fund_schemes, in parallel, and fills isin_to_kuvera_code_mapping from
+        it so that get_fund_info becomes a lookup.  Results are kept in path
+        with the time each code was resolved; codes resolved within max_age
+        are not fetched again.
+
+        Returns the number of codes fetched.
+        '''
+        resolved = Kuvera.load_isin_map(path)
+        now = time.time()
+        codes = [code for code in self.get_all_codes()
+                 if code not in resolved or now - resolved[code]['resolved_at'] > max_age]
+        print(f'resolving isin for {len(codes)} of {len(self.get_all_codes())} kuvera codes')
+
+        async def fetch(fetcher, code, _):
+            return await self.lookup_scheme_info_async(fetcher, code)
+
+        # a code with no info resolves to None; only fetches that raised fail
+        failed = list()
+        def apply_result(code, scheme_info):
+            resolved[code] = {'resolved_at': time.time(), 'scheme_info': scheme_info}
+
+        if codes:
+            enrich(((code, None) for code in codes), fetch, apply_result, max_in_flight=max_in_flight,
+                   on_error=lambda code, ex: failed.append(code))
+            Kuvera.save_isin_map(resolved, path)
+        for code in self.get_all_codes():
+            if code in resolved:
+                self.scheme_info_memo.put(code, resolved[code]['scheme_info'])
+                self.add_known_scheme_info(resolved[code]['scheme_info'])
+        # codes that failed to resolve keep the per fund bucket scan as fallback
+        self.isin_mapping_resolved = not failed
+        if failed:
+            print(f'failed to resolve {len(failed)} kuvera codes')
+        return len(codes)
+
+    @staticmethod
+    def load_isin_map(path=ISIN_MAP_PATH):
         try:
-            # filter by fund_type
-            funds_of_type = self.fund_schemes[fund_type]
-            funds_of_sub_category = list()
-            for sub_category in fund_categories:
-                funds_of_sub_category.append(funds_of_type[sub_category])
-            fund_house_funds = list()
-            for sub_category_funds in funds_of_sub_category:
-                for fund_house_k, fund_details in sub_category_funds.items():
-                    if fund_house_k == fund_house:
-                        fund_house_funds.append(fund_details)
-            for fund_details in fund_house_funds:
-                for code, details in fund_details.items():
-                    scheme_info = Kuvera.get_scheme_info(code)
-                    if scheme_info and scheme_info.get('isin', '') != '':
-                        self.isin_to_kuvera_code_mapping[scheme_info.get('isin')] = scheme_info
-                        if scheme_info.get('isin') == isin:
-                            return scheme_info
-            for fund_details in self.find_probable_fund_name(name):
-                scheme_info = Kuvera.get_scheme_info(fund_details['kuvera_code'])
-                if scheme_info and scheme_info.get('isin', '') != '':
-                    self.isin_to_kuvera_code_mapping[scheme_info.get('isin')] = scheme_info
-                    if scheme_info.get('isin') == isin:
-                        return scheme_info
-        except Exception as e:
-            print(f'exception {e} getting fund info for name {name} isin {isin} fund type {fund_type} fund categories {fund_categories} amfi fund category {amfi_fund_category} fund house {fund_house}')
+            with open(path, 'r') as f:
+                return json.load(f).get('schemes', dict())
+        except (OSError, ValueError):
+            return dict()
+
+    @staticmethod
+    def save_isin_map(resolved, path=ISIN_MAP_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'updated_at': time.time(), 'schemes': resolved}, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, path)
+
+    def add_known_scheme_info(self, scheme_info):
+        '''
+        add_known_scheme_info remembers scheme_info under its ISIN and returns
+        that ISIN, or None if scheme_info has none
+        '''
+        if scheme_info and scheme_info.get('isin', '') != '':
+            with self.isin_mapping_lock:
+                self.isin_to_kuvera_code_mapping[scheme_info.get('isin')] = scheme_info
+            return scheme_info.get('isin')
         return None
 
+    def get_known_scheme_info(self, isin):
+        with self.isin_mapping_lock:
+            return self.isin_to_kuvera_code_mapping.get(isin)
+
+    def lookup_scheme_info(self, code):
+        return self.scheme_info_memo.get(code, Kuvera.get_scheme_info)
+
+    async def lookup_scheme_info_async(self, fetcher, code):
+        return await self.scheme_info_memo.get_async(code, lambda c: Kuvera.get_scheme_info_async(fetcher, c))
+
+    def lookup_probable_fund_name(self, name):
+        return self.probable_fund_name_memo.get(name, Kuvera.find_probable_fund_name)
+
+    async def lookup_probable_fund_name_async(self, fetcher, name):
+        return await self.probable_fund_name_memo.get_async(
+            name, lambda n: Kuvera.find_probable_fund_name_async(fetcher, n))
+
+    @staticmethod
+    def get_scheme_info_url(code):
+        return f"https://api.kuvera.in/mf/api/v5/fund_schemes/{code}.json?v=1.230.10"
+
     @staticmethod
     def get_scheme_info(code):
+        scheme_url = Kuvera.get_scheme_info_url(code)
+        # a request that fails raises, so the memo doesn't keep it as no info
+        response = cached_get(scheme_url, timeout=15, retries=1)
         try:
-            scheme_url = f"https://api.kuvera.in/mf/api/v5/fund_schemes/{code}.json?v=1.230.10"
-            response = requests.get(scheme_url, timeout=15)
             if response.status_code == 200:
-                j = response.json()
-                entry = j[0]
-                return {
-                    'name': entry['name'],
-                    'short_name': entry['short_name'],
-                    'fund_category': entry['fund_category'],
-                    'fund_type': entry['fund_type'],
-                    'fund_house': entry['fund_house'],
-                    'isin': entry['ISIN'],
-                    'kuvera_code': code
-                }
+                return Kuvera.parse_scheme_info(code, response.json())
         except Exception as ex:
             print(f'exception {ex} getting {scheme_url}')
 
+    @staticmethod
+    async def get_scheme_info_async(fetcher, code):
+        scheme_url = Kuvera.get_scheme_info_url(code)
+        # a request that fails raises, rather than pass for a code with no info
+        response = await fetcher.get(scheme_url)
+        try:
+            if response.status_code == 200:
+                return Kuvera.parse_scheme_info(code, response.json())
+        except Exception as ex:
+            print(f'exception {ex!r} getting {scheme_url}')
+
+    @staticmethod
+    def parse_scheme_info(code, j):
+        entry = j[0]
+        return {
+            'name': entry['name'],
+            'short_name': entry['short_name'],
+            'fund_category': entry['fund_category'],
+            'fund_type': entry['fund_type'],
+            'fund_house': entry['fund_house'],
+            'isin': entry['ISIN'],
+            'kuvera_code': code
+        }
+
     @staticmethod
     def get_amfi_kuvera_fund_type_mapping():
         return {
@@ -301,31 +490,52 @@ class Kuvera:
             return True
         return False
     
+    @staticmethod
+    def get_probable_fund_name_url(amfi_fund_name):
+        return f'https://api.kuvera.in/insight/api/v1/global_search.json?query={amfi_fund_name.replace(" ", "%20")}&exclude_assets='+'{%22SKIP_ASSETS%22:[%22us_stocks%22]}&v=1.239.11'
+
     @staticmethod
     def find_probable_fund_name(amfi_fund_name):
-        url = f'https://api.kuvera.in/insight/api/v1/global_search.json?query={amfi_fund_name.replace(" ", "%20")}&exclude_assets='+'{%22SKIP_ASSETS%22:[%22us_stocks%22]}&v=1.239.11'
+        url = Kuvera.get_probable_fund_name_url(amfi_fund_name)
         try:
             print(f'getting funds from {url}')
-            page_list_funds = requests.get(url, timeout=15)
+            page_list_funds = http_client.get(url, timeout=15, retries=1)
             if page_list_funds.status_code != 200:
                 return []
-            page_list_funds_json = page_list_funds.json()
-            if page_list_funds_json['status'] != 'success' or len(page_list_funds_json['data']['funds']) == 0:
-                return None
-            probables = list()
-            for fund in page_list_funds_json['data']['funds'].get('mutual_funds', []):
-                probables.append({
-                    'name': fund['name'],
-                    'kuvera_code': fund['unique_fund_code'],
-                    'fund_house': fund['amc'],
-                    'category': fund['category'],
-                    'sub_category': fund['sub_category'],
-                    'current_nav': fund['current_nav']
-                })
-            return probables
+            return Kuvera.parse_probable_fund_names(page_list_funds.json())
         except Exception as e:
             print(f'exception {e} getting probable fund name for {amfi_fund_name} with url {url}')
         return []
+
+    @staticmethod
+    async def find_probable_fund_name_async(fetcher, amfi_fund_name):
+        url = Kuvera.get_probable_fund_name_url(amfi_fund_name)
+        print(f'getting funds from {url}')
+        # a request that fails raises, rather than pass for a search with no match
+        page_list_funds = await fetcher.get(url)
+        try:
+            if page_list_funds.status_code != 200:
+                return []
+            return Kuvera.parse_probable_fund_names(page_list_funds.json())
+        except Exception as e:
+            print(f'exception {e!r} getting probable fund name for {amfi_fund_name} with url {url}')
+        return []
+
+    @staticmethod
+    def parse_probable_fund_names(page_list_funds_json):
+        if page_list_funds_json['status'] != 'success' or len(page_list_funds_json['data']['funds']) == 0:
+            return None
+        probables = list()
+        for fund in page_list_funds_json['data']['funds'].get('mutual_funds', []):
+            probables.append({
+                'name': fund['name'],
+                'kuvera_code': fund['unique_fund_code'],
+                'fund_house': fund['amc'],
+                'category': fund['category'],
+                'sub_category': fund['sub_category'],
+                'current_nav': fund['current_nav']
+            })
+        return probables
     
     def get_fund_mapping_per_fund_house(self):
         fund_houses = self.get_supported_fund_houses()
@@ -334,7 +544,7 @@ class Kuvera:
                 url = f'https://api.kuvera.in/insight/api/v1/mutual_fund_search.json?query={fh.split(" ")[0]}&limit=1000&sort_by=one_year_return&order_by=desc&scheme_plan={scheme_plan}&v=1.239.11'
                 try:
                     print(f'getting funds from {url}')
-                    page_list_funds = requests.get(url, timeout=15)
+                    page_list_funds = http_client.get(url, timeout=15, retries=1)
                     if page_list_funds.status_code == 200:
                         page_list_funds_json = page_list_funds.json()
                     for fund_details in page_list_funds_json['data']['funds']:
@@ -356,59 +566,6 @@ class Kuvera:
                     print(f'exception {e} getting fund mapping for fund house {fh} with url {url}')
     
     def get_supported_fund_houses(self):
-        driver = None
-        try:
-            options = Options()
-            options.add_argument('--headless')
-            options.add_argument('--no-sandbox')
-            options.add_argument('--disable-dev-shm-usage')
-            driver = webdriver.Chrome(options=options)
-
-            # Open the page
-            driver.get("https://kuvera.in/mutual-funds/all")
-            from selenium.webdriver.common.action_chains import ActionChains
-
-            # Dismiss the security-awareness popup ("Getting messages from Kuvera?")
-            # that appears on every fresh page load before any interaction is possible.
-            wait = WebDriverWait(driver, 10)
-            okay_button = wait.until(EC.element_to_be_clickable(
-                (By.XPATH, "//button[normalize-space(text())='Okay']")
-            ))
-            okay_button.click()
-
-            # 1. Find the body to reset the mouse to the top-left corner
-            body = driver.find_element(By.TAG_NAME, 'body')
-
-            # 2. Move to (0,0) and then offset to where you want to click (e.g., 100, 100)
-            actions = ActionChains(driver)
-            actions.move_to_element_with_offset(body, 0, 0)
-            actions.move_by_offset(100, 100).click().perform()
-
-            # Wait for the footer links to be present (Mutual Fund Companies section)
-            # The links are typically within a section containing 'Mutual Fund Companies' text
-            wait = WebDriverWait(driver, 10)
-            fund_house_elements = wait.until(EC.presence_of_all_elements_located(
-                (By.XPATH, "//div[contains(text(), 'Mutual Fund Companies')]/following-sibling::a | //p[contains(text(), 'Mutual Fund Companies')]/following-sibling::a")
-            ))
-
-            # If the footer layout is a flat list of links:
-            fund_houses = []
-            for element in fund_house_elements:
-                name = element.text.strip()
-                link = element.get_attribute('href')
-                if name:
-                    fund_houses.append({"name": name, "link": link})
-
-            # Display Results
-            print(f"{'Fund House':<35} | {'URL'}")
-            print("-" * 70)
-            for fund in fund_houses:
-                print(f"{fund['name']:<35} | {fund['link']}")
-        except Exception as e:
-            print(f'exception {e} getting supported fund houses from kuvera')
-        finally:
-            if driver:
-                driver.quit()
         return ['Axis Mutual Funds',
                 'Kotak Mutual Funds',
                 'SBI Mutual Funds',
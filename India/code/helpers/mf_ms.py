@@ -1,9 +1,14 @@
-import requests
-from .mf_entry import get_mf_entries, get_new_entry, write_entries
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from .mf_entry import get_mf_entries, get_new_entry, write_entries, IsinIndex
+from .http_cache import cached_get
+from .http_client import get_client, MAX_WORKERS
 
 
+# screener pages fetched at once across all categories
+MS_MAX_WORKERS = MAX_WORKERS
 
-def get_json(page, category):
+
+def get_json(page, category, session=None):
     funds_url = 'https://lt.morningstar.com/api/rest.svc/dk7pkae7kl/security/screener?page=' + str(page) + \
                 '&pageSize=50&sortOrder=LegalName%20asc&outputType=json&version=1&languageId=en-GB&currencyId=INR'+ \
                 '&universeIds=FOIND%24%24ALL%7CFCIND%24%24ALL&securityDataPoints=SecId%7CName%7CPriceCurrency'+ \
@@ -14,128 +19,136 @@ def get_json(page, category):
                 '%7CFundTNAV%7CEquityStyleBox%7CBondStyleBox%7CAverageMarketCapital%7CAverageCreditQualityCode%7CEffectiveDuration'+ \
                 '%7CMorningstarRiskM255%7CAlphaM36%7CBetaM36%7CR2M36%7CStandardDeviationM36%7CSharpeM36%7CTrackRecordExtension%7CISIN'+ \
                 '&filters=CategoryId%3AIN%3A' + category + '&term=&subUniverseId='
-    att = 0
-    while att < 5:
-        att += 1
-        try:
-            print(f'getting funds from {funds_url}')
-            page_list_funds = requests.get(funds_url, timeout=15)
-            if page_list_funds.status_code == 200:
-                page_list_funds_json = page_list_funds.json()
-                return page_list_funds_json
-        except Exception as ex:
-            print(f'exception {ex} getting {funds_url} attempt {att}')
+    try:
+        print(f'getting funds from {funds_url}')
+        page_list_funds = cached_get(funds_url, session, timeout=15, retries=5)
+        if page_list_funds.status_code == 200:
+            page_list_funds_json = page_list_funds.json()
+            return page_list_funds_json
+        print(f'status {page_list_funds.status_code} getting {funds_url}')
+    except Exception as ex:
+        print(f'exception {ex} getting {funds_url}')
+
+def get_number_of_pages(page_list_funds_json):
+    return page_list_funds_json['total'] // page_list_funds_json['pageSize'] + 1
+
+def fetch_ms_pages(categories, session=None, max_workers=MS_MAX_WORKERS):
+    '''
+    fetch_ms_pages fetches every screener page of the given categories with
+    a bounded pool of workers sharing one session (the shared HttpClient by
+    default).  The first page of each
+    category is fetched up front to learn total/pageSize, after which the
+    remaining pages of all categories are fetched in parallel.
+
+    Yields (category, page, page_json) in category order, then page order,
+    regardless of the order the requests complete in.  page_json is None
+    for a page that could not be fetched.
+    '''
+    if not session:
+        session = get_client()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        first_pages = {executor.submit(get_json, 1, cat, session): cat for cat in categories}
+        first_page_results = dict()
+        other_pages = dict()
+        for future in as_completed(first_pages):
+            cat = first_pages[future]
+            page_list_funds_json = future.result()
+            first_page_results[cat] = page_list_funds_json
+            other_pages[cat] = list()
+            if page_list_funds_json:
+                for page in range(2, get_number_of_pages(page_list_funds_json) + 1):
+                    other_pages[cat].append((page, executor.submit(get_json, page, cat, session)))
+        # ordered merge: hand pages over in a deterministic order
+        for cat in categories:
+            yield cat, 1, first_page_results[cat]
+            for page, future in other_pages[cat]:
+                yield cat, page, future.result()
 
 def update_ms_details(data):
     added = 0
     modified = 0
     ic = get_investment_categories()
     b = blend_mapping()
-    a_schemes = data
-    for cat,cat_name in ic.items():
-        print("getting a list of funds for: " + cat)
-        a, m = update_ms_details_category(cat, cat_name, a_schemes, data, b)
+    # built once per run; every category resolves Morningstar ISINs through it
+    isin_index = IsinIndex(data)
+    for cat, page, page_list_funds_json in fetch_ms_pages(list(ic.keys())):
+        print(f"processing funds for {cat} page {page}")
+        a, m = apply_ms_page(cat, page_list_funds_json, ic[cat], isin_index, data, b)
         added += a
         modified += m
 
     print(f'added {added} modified {modified}')
     if added >0 or modified > 0:
-        write_entries(data)
+        write_entries(data, 'populating morningstar details')
+
+def update_ms_details_category(cat, cat_name, isin_index, data, b, session=None):
+    added = 0
+    modified = 0
+    for _, page, page_list_funds_json in fetch_ms_pages([cat], session):
+        print(f"processing funds for {cat} page {page}")
+        a, m = apply_ms_page(cat, page_list_funds_json, cat_name, isin_index, data, b)
+        added += a
+        modified += m
+    return added, modified
 
-def update_ms_details_category(cat, cat_name, a_schemes, data, b):
+def apply_ms_page(cat, page_list_funds_json, cat_name, isin_index, data, b):
     added = 0
     modified = 0
-    page = 1
-    while True:
-        
-        print(f"getting a list of funds for {cat} page {page}")
-        number_of_loops = None
-        
-        page_list_funds_json = get_json(page, cat)
-        if page_list_funds_json:
-            if not number_of_loops:
-                number_of_loops = page_list_funds_json['total'] // page_list_funds_json['pageSize'] + 1
-                        
-            for row in page_list_funds_json['rows']:
-                if type(row) is list:
-                    for subrow in row:
-                        if not 'ISIN' in subrow:
-                            continue
-                        isin = subrow['ISIN']
-                        for code,det in a_schemes.items():
-                            if det['isin'] == isin or det['isin2'] == isin:
-                                if code in data:
-                                    m = False
-                                    prev = data[code]
-                                    if data[code]['ms_name'] != subrow['LegalName']:
-                                        data[code]['ms_name'] = subrow['LegalName']
-                                        m = True
-                                    if data[code]['ms_category'] != cat_name:
-                                        data[code]['ms_category'] = cat_name
-                                        m = True
-                                    if 'EquityStyleBox' in subrow:
-                                        if data[code]['ms_investment_style'] != b[subrow['EquityStyleBox']]:
-                                            data[code]['ms_investment_style'] = b[subrow['EquityStyleBox']]
-                                            m = True
-                                    if data[code]['ms_id'] != subrow['SecId']:
-                                        data[code]['ms_id'] = subrow['SecId']
-                                        m = True
-                                    if m:
-                                        modified += 1
-                                        print(f'before {prev} after {data[code]}')
-                                else:
-                                    mis = ''
-                                    if 'EquityStyleBox' in row:
-                                        mis = b[subrow['EquityStyleBox']]
-                                    data[code] = get_new_entry()
-                                    data[code]['ms_name'] = subrow['Name']
-                                    data[code]['ms_category'] = cat_name
-                                    data[code]["ms_investment_style"] = mis
-                                    data[code]['ms_id'] = subrow['SecId']
-                                    added += 1
-                                break
-                else:
-                    #print(row)
-                    if not 'ISIN' in row:
-                        continue
-                    isin = row['ISIN']
-                    for code,det in a_schemes.items():
-                        if det['isin'] == isin or det['isin2'] == isin:
-                            if code in data:
-                                m = False
-                                if data[code]['ms_name'] != row['LegalName']:
-                                    data[code]['ms_name'] = row['LegalName']
-                                    m = True
-                                if data[code]['ms_category'] != cat_name:
-                                    data[code]['ms_category'] = cat_name
-                                    m = True
-                                if 'EquityStyleBox' in row:
-                                    if data[code]['ms_investment_style'] != b[row['EquityStyleBox']]:
-                                        data[code]['ms_investment_style'] = b[row['EquityStyleBox']]
-                                        m = True
-                                if data[code]['ms_id'] != row['SecId']:
-                                    data[code]['ms_id'] = row['SecId']
-                                    m = True
-                                if m:
-                                    modified += 1
-                            else:
-                                mis = ''
-                                if 'EquityStyleBox' in row:
-                                    mis = b[row['EquityStyleBox']]
-                                data[code] = get_new_entry()
-                                data[code]['ms_name'] = row['Name']
-                                data[code]['ms_category'] = cat_name
-                                data[code]["ms_investment_style"] = mis
-                                data[code]['ms_id'] = row['SecId']
-                                added += 1
-                            break
-            page += 1
-            if page > number_of_loops:
-                break
-        else:
-            print(f'issue with getting results for category {cat}')                
+    if not page_list_funds_json:
+        print(f'issue with getting results for category {cat}')
+        return added, modified
+    for row in page_list_funds_json['rows']:
+        subrows = row if type(row) is list else [row]
+        for subrow in subrows:
+            res = apply_ms_row(subrow, cat_name, isin_index, data, b)
+            if res == 'added':
+                added += 1
+            elif res == 'modified':
+                modified += 1
     return added, modified
 
+def apply_ms_row(row, cat_name, isin_index, data, b):
+    '''
+    apply_ms_row copies Morningstar details of one screener row onto the
+    entry whose isin or isin2 matches the row's ISIN.
+
+    Returns 'added', 'modified' or None when nothing changed.
+    '''
+    if not 'ISIN' in row:
+        return None
+    code = isin_index.get_first_code(row['ISIN'])
+    if code is None:
+        return None
+    if code in data:
+        m = False
+        prev = dict(data[code])
+        if data[code]['ms_name'] != row['LegalName']:
+            data[code]['ms_name'] = row['LegalName']
+            m = True
+        if data[code]['ms_category'] != cat_name:
+            data[code]['ms_category'] = cat_name
+            m = True
+        if 'EquityStyleBox' in row:
+            if data[code]['ms_investment_style'] != b[row['EquityStyleBox']]:
+                data[code]['ms_investment_style'] = b[row['EquityStyleBox']]
+                m = True
+        if data[code]['ms_id'] != row['SecId']:
+            data[code]['ms_id'] = row['SecId']
+            m = True
+        if m:
+            print(f'before {prev} after {data[code]}')
+            return 'modified'
+        return None
+    mis = ''
+    if 'EquityStyleBox' in row:
+        mis = b[row['EquityStyleBox']]
+    data[code] = get_new_entry()
+    data[code]['ms_name'] = row['Name']
+    data[code]['ms_category'] = cat_name
+    data[code]["ms_investment_style"] = mis
+    data[code]['ms_id'] = row['SecId']
+    return 'added'
+
 def blend_mapping():
     return {
         1:'Large Value',
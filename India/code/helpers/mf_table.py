@@ -0,0 +1,195 @@
+import csv
+import io
+import os
+import pandas as pd
+from .mf_entry import get_path_to_csv, MF_CSV_FIELDS, ISIN_RE
+
+
+# entry fields of mf.csv (every column but code)
+ENTRY_FIELDS = MF_CSV_FIELDS[1:]
+
+# low cardinality columns kept as pandas categoricals: ~50 fund houses and
+# ~40 categories across ~16k rows
+CATEGORICAL_FIELDS = ['fund_house', 'amfi_fund_type', 'amfi_category', 'ms_category', 'kuvera_fund_category']
+
+AMFI_REQUIRED_FIELDS = ['name', 'fund_house', 'inception_date', 'amfi_fund_type', 'amfi_category']
+KUVERA_REQUIRED_FIELDS = ['kuvera_name', 'kuvera_fund_category', 'kuvera_code']
+
+
+class MFTable:
+    '''
+    MFTable is a columnar view of mf.csv: one pandas DataFrame indexed by
+    scheme code, with every field a string column ('' when blank) and the
+    low cardinality ones categorical.  It answers the questions update_mf
+    asks of every row (is the AMFI/Kuvera part complete, what changed
+    against another copy) with vectorized masks instead of Python loops.
+
+    get_mf_entries/write_entries remain the dict based API; from_entries
+    and to_entries convert between the two.
+    '''
+    def __init__(self, df):
+        self.df = df
+
+    @classmethod
+    def read_csv(cls, csv_file=None):
+        '''
+        read_csv loads mf.csv into an MFTable.  Like get_mf_entries, malformed
+        rows raise ValueError and a missing file gives an empty table.
+
+        The rows are checked as find_malformed_rows does, within the one
+        parse: a row with too many columns is kept with its last column
+        blanked out to None, so it shows up with the short (and blank) rows
+        as a row with a missing value, and the isin column is matched
+        against ISIN_RE as a whole.
+        '''
+        if not csv_file:
+            csv_file = get_path_to_csv()
+        if not os.path.exists(csv_file):
+            return cls.from_entries(dict())
+        with open(csv_file, 'r', newline='') as f:
+            header_len = len(next(csv.reader(f), []))
+        df = pd.read_csv(csv_file, dtype=str, keep_default_na=False, na_values=[], skip_blank_lines=False,
+                         engine='python', on_bad_lines=lambda fields: fields[:header_len - 1] + [None])
+        malformed = df.isna().any(axis=1)
+        if 'isin' in df.columns:
+            isin = df['isin'].fillna('').str.strip()
+            malformed |= (isin != '') & (isin != '-') & ~isin.str.match(ISIN_RE.pattern)
+        if malformed.any():
+            # row i of the frame is line i + 2 of the file, after the header
+            lines = ', '.join(str(i + 2) for i in malformed.to_numpy().nonzero()[0])
+            raise ValueError(f'{csv_file} has {int(malformed.sum())} malformed row(s) at line(s) {lines}')
+        return cls._from_frame(df.set_index('code'))
+
+    @classmethod
+    def from_csv_text(cls, text):
+        '''
+        from_csv_text builds an MFTable from the content of an mf.csv (e.g.
+        a copy from git), without checking for malformed rows
+        '''
+        df = pd.read_csv(io.StringIO(text), dtype=str, keep_default_na=False, na_filter=False)
+        return cls._from_frame(df.set_index('code'))
+
+    @classmethod
+    def from_entries(cls, data):
+        '''
+        from_entries builds an MFTable from get_mf_entries style data
+        '''
+        df = pd.DataFrame.from_dict(data, orient='index', dtype=object)
+        df.index.name = 'code'
+        return cls._from_frame(df)
+
+    @classmethod
+    def _from_frame(cls, df):
+        # a code listed twice keeps its last row, as get_mf_entries does
+        df = df[~df.index.duplicated(keep='last')]
+        df = df.reindex(columns=ENTRY_FIELDS)
+        if df.isna().to_numpy().any():
+            df = df.fillna('')
+        df.index = df.index.astype(str)
+        for field in ENTRY_FIELDS:
+            if field in CATEGORICAL_FIELDS:
+                df[field] = df[field].astype(str).astype('category')
+            else:
+                df[field] = df[field].astype(str)
+        return cls(df)
+
+    def to_entries(self):
+        '''
+        to_entries returns the table in get_mf_entries format
+        '''
+        return self.df.astype(str).to_dict(orient='index')
+
+    def get_entry(self, code):
+        '''
+        get_entry returns the entry of code in get_mf_entries format
+        '''
+        return {field: str(value) for field, value in self.df.loc[code].items()}
+
+    def __len__(self):
+        return len(self.df)
+
+    def __contains__(self, code):
+        return code in self.df.index
+
+    def codes(self, mask=None):
+        '''
+        codes returns the scheme codes, optionally only those where mask is True
+        '''
+        index = self.df.index if mask is None else self.df.index[mask.to_numpy()]
+        return list(index)
+
+    def _filled(self, fields):
+        return pd.concat([self.df[field].astype(str) != '' for field in fields], axis=1).all(axis=1)
+
+    def amfi_complete_mask(self):
+        '''
+        amfi_complete_mask is check_amfi_entry_complete for every row
+        '''
+        has_isin = (self.df['isin'].astype(str) != '') | (self.df['isin2'].astype(str) != '')
+        return self._filled(AMFI_REQUIRED_FIELDS) & has_isin
+
+    def kuvera_complete_mask(self):
+        '''
+        kuvera_complete_mask is Kuvera.check_kuvera_entry_complete for every row
+        '''
+        return self._filled(KUVERA_REQUIRED_FIELDS)
+
+    def kuvera_skip_mask(self):
+        '''
+        kuvera_skip_mask is Kuvera.check_kuvera_skip_entry for every row
+        '''
+        no_isin = (self.df['isin'].astype(str) == '') & (self.df['isin2'].astype(str) == '')
+        return no_isin | (self.df['amfi_fund_type'].astype(str) == 'Income') | (self.df['end_date'] != '')
+
+    def diff(self, other):
+        '''
+        diff compares this table (the new copy) with other (the old copy)
+        '''
+        return MFTableDiff(other, self)
+
+
+class MFTableDiff:
+    '''
+    MFTableDiff holds what changed from old to new: codes added and
+    removed, and `changed`, a boolean DataFrame over the codes in both
+    tables with one column per field, True where the values differ.
+    '''
+    def __init__(self, old, new):
+        self.old = old
+        self.new = new
+        old_codes = old.df.index
+        new_codes = new.df.index
+        self.added = sorted(new_codes.difference(old_codes))
+        self.removed = sorted(old_codes.difference(new_codes))
+        common = new_codes.intersection(old_codes).sort_values()
+        fields = [f for f in new.df.columns if f in old.df.columns]
+        old_values = old.df.loc[common, fields].astype(str).to_numpy()
+        new_values = new.df.loc[common, fields].astype(str).to_numpy()
+        self.changed = pd.DataFrame(old_values != new_values, index=common, columns=fields)
+        self._changed_mask = self.changed.to_numpy()
+        self._old_values = old_values
+        self._new_values = new_values
+
+    def changed_codes(self):
+        '''
+        changed_codes returns the codes in both tables with any field changed
+        '''
+        return list(self.changed.index[self.changed.any(axis=1).to_numpy()])
+
+    def get_field_changes(self, code):
+        '''
+        get_field_changes returns [(field, old value, new value)] for every
+        field of code (a code in both tables) that changed
+        '''
+        row = self.changed.index.get_loc(code)
+        return [(field, self._old_values[row, i], self._new_values[row, i])
+                for i, field in enumerate(self.changed.columns) if self._changed_mask[row, i]]
+
+    def field_change_counts(self):
+        return {field: int(count) for field, count in self.changed.sum(axis=0).items()}
+
+    def changed_codes_by_field(self):
+        return {field: list(self.changed.index[self.changed[field].to_numpy()]) for field in self.changed.columns}
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.changed.to_numpy().any())
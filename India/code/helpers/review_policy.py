@@ -0,0 +1,204 @@
+import json
+import os
+import re
+import time
+from .atomic_io import write_json
+from .mf_entry import get_mf_entries, get_new_entry, get_path_to_csv, EntryChanges
+
+
+ACCEPT = 'accept'
+REJECT = 'reject'
+DEFER = 'defer'
+
+# kinds of change a rule can match on
+NEW_ENTRY = 'new_entry'
+BLANK_TO_VALUE = 'blank_to_value'
+VALUE_TO_BLANK = 'value_to_blank'
+VALUE_CHANGE = 'value_change'
+
+DEFAULT_CHANGES_FILE = os.path.join(os.path.expanduser('~'), '.cache', 'portfoliomanager-data', 'mf_changes.json')
+
+# Used by unattended runs without a rules file.  Filling in a blank field
+# from upstream and AMFI marking a scheme as ended are taken as is; new
+# schemes, renames and anything that clears or rewrites a value are left
+# for a person.
+DEFAULT_RULES = [
+    {'action': ACCEPT, 'change': BLANK_TO_VALUE},
+    {'action': DEFER},
+]
+
+
+def get_change_type(old_value, new_value):
+    if not old_value:
+        return BLANK_TO_VALUE
+    if not new_value:
+        return VALUE_TO_BLANK
+    return VALUE_CHANGE
+
+
+class ReviewRule:
+    '''
+    ReviewRule decides a change it matches.  Every condition given must hold:
+
+    :param action: accept, reject or defer
+    :param fields: field names the change must be to (ignored for new entries)
+    :param change: new_entry, blank_to_value, value_to_blank or value_change
+    :param match: regex the new value (the name, for new entries) must match
+    :param old_match: regex the old value must match
+    '''
+    def __init__(self, action, fields=None, change=None, match=None, old_match=None):
+        if action not in (ACCEPT, REJECT, DEFER):
+            raise ValueError(f'unknown review action {action}')
+        self.action = action
+        self.fields = set(fields) if fields else None
+        self.change = change
+        self.match = re.compile(match) if match else None
+        self.old_match = re.compile(old_match) if old_match else None
+
+    def matches(self, change, field, old_value, new_value):
+        if self.change and self.change != change:
+            return False
+        if self.fields and change != NEW_ENTRY and field not in self.fields:
+            return False
+        if self.match and not self.match.search(new_value or ''):
+            return False
+        if self.old_match and not self.old_match.search(old_value or ''):
+            return False
+        return True
+
+
+class ReviewPolicy:
+    '''
+    ReviewPolicy decides changes found by review_data_changes without
+    asking: the first rule that matches a change decides it, and a change
+    no rule matches is deferred.
+    '''
+    def __init__(self, rules=None):
+        self.rules = [rule if isinstance(rule, ReviewRule) else ReviewRule(**rule)
+                      for rule in (DEFAULT_RULES if rules is None else rules)]
+
+    @classmethod
+    def load(cls, path):
+        '''
+        load reads rules from a JSON file holding a list of ReviewRule arguments
+        '''
+        with open(path, 'r') as f:
+            return cls(json.load(f))
+
+    def decide(self, change, field, old_value, new_value):
+        for rule in self.rules:
+            if rule.matches(change, field, old_value, new_value):
+                return rule.action
+        return DEFER
+
+    def decide_new_entry(self, entry):
+        return self.decide(NEW_ENTRY, None, '', entry.get('name', ''))
+
+    def review(self, original_data, updated_data):
+        '''
+        review returns (reviewed_data, deferred): updated_data with accepted
+        changes applied and everything else as in original_data, and the
+        list of changes no rule accepted or rejected, for a person to decide
+        '''
+        reviewed_data = dict()
+        deferred = list()
+        for code in sorted(set(original_data.keys()) | set(updated_data.keys())):
+            original_entry = original_data.get(code, {}) or {}
+            updated_entry = updated_data.get(code, {}) or {}
+            if code not in original_data:
+                action = self.decide_new_entry(updated_entry)
+                if action == ACCEPT:
+                    reviewed_data[code] = updated_entry
+                elif action == DEFER:
+                    deferred.append({'code': code, 'change': NEW_ENTRY, 'entry': updated_entry, 'action': DEFER})
+                continue
+            if code not in updated_data:
+                reviewed_data[code] = original_entry
+                continue
+            reviewed_entry = dict(original_entry)
+            for field in sorted(set(original_entry.keys()) | set(updated_entry.keys())):
+                old_value = original_entry.get(field, '') or ''
+                new_value = updated_entry.get(field, '') or ''
+                if old_value == new_value:
+                    continue
+                change = get_change_type(old_value, new_value)
+                action = self.decide(change, field, old_value, new_value)
+                if action == ACCEPT:
+                    reviewed_entry[field] = new_value
+                elif action == DEFER:
+                    deferred.append({'code': code, 'change': change, 'field': field,
+                                     'old': old_value, 'new': new_value, 'action': DEFER})
+            reviewed_data[code] = reviewed_entry
+        return reviewed_data, deferred
+
+
+def load_change_file(path=DEFAULT_CHANGES_FILE):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'changes': list()}
+
+
+def save_deferred_changes(deferred, phase, path=DEFAULT_CHANGES_FILE):
+    '''
+    save_deferred_changes adds deferred changes to the change file at path,
+    replacing any earlier change to the same code and field.  Decide each
+    by setting its action to accept or reject, then run apply_change_file.
+    '''
+    if not deferred:
+        return
+    content = load_change_file(path)
+    keys = {(item['code'], item.get('field')) for item in deferred}
+    changes = [item for item in content.get('changes', list()) if (item['code'], item.get('field')) not in keys]
+    for item in deferred:
+        changes.append(dict(item, phase=phase))
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    write_json(path, {'updated_at': time.ctime(), 'changes': changes}, indent=1)
+    print(f'{len(deferred)} changes after {phase} need review in {path}')
+
+
+def apply_change_file(path=DEFAULT_CHANGES_FILE, csv_file=None):
+    '''
+    apply_change_file applies the changes marked accept in the change file
+    to mf.csv in one write, and drops those marked accept or reject.  A
+    field change is skipped (and kept for review) if the field no longer
+    holds the old value it was reviewed against.
+
+    Returns the number of changes applied.
+    '''
+    if not csv_file:
+        csv_file = get_path_to_csv()
+    content = load_change_file(path)
+    data = get_mf_entries(csv_file)
+    entry_changes = EntryChanges()
+    remaining = list()
+    applied = 0
+    for item in content.get('changes', list()):
+        action = item.get('action', DEFER)
+        code = item['code']
+        if action == REJECT:
+            continue
+        if action != ACCEPT:
+            remaining.append(item)
+            continue
+        if item['change'] == NEW_ENTRY:
+            if code in data:
+                print(f'skipping new entry {code}: already in {csv_file}')
+                continue
+            entry = get_new_entry()
+            entry.update(item['entry'])
+            data[code] = entry
+            entry_changes.update(code, existing=False)
+        else:
+            if code not in data or (data[code].get(item['field'], '') or '') != item['old']:
+                print(f'skipping change to {code} {item["field"]}: no longer {item["old"]!r}')
+                remaining.append(item)
+                continue
+            data[code][item['field']] = item['new']
+            entry_changes.update(code)
+        applied += 1
+    entry_changes.flush(data, f'applying reviewed changes from {path}', csv_file)
+    write_json(path, {'updated_at': time.ctime(), 'changes': remaining}, indent=1)
+    print(f'applied {applied} changes; {len(remaining)} left to review in {path}')
+    return applied
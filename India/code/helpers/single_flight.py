@@ -0,0 +1,108 @@
+import asyncio
+import threading
+
+
+class SingleFlight:
+    '''
+    SingleFlight memoizes lookups by key for the life of a run, and makes
+    sure concurrent callers asking for the same key share one call instead
+    of each making their own.  It can be used from threads (get) and from
+    asyncio coroutines (get_async); both share the memoized results.
+
+    hits counts keys answered from memo, misses the calls actually made and
+    coalesced the callers that waited on someone else's call in flight.
+    '''
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._results = dict()
+        self._pending = dict()
+        self._pending_async = dict()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def put(self, key, value):
+        with self._lock:
+            self._results[key] = value
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'coalesced': self.coalesced}
+
+    def get(self, key, fn):
+        '''
+        get returns fn(key), calling fn at most once per key however many
+        threads ask.  If fn raises, the exception reaches every waiting
+        caller and nothing is memoized.
+        '''
+        with self._lock:
+            if key in self._results:
+                self.hits += 1
+                return self._results[key]
+            waiting = self._pending.get(key)
+            if waiting:
+                self.coalesced += 1
+                leader = False
+            else:
+                waiting = self._pending[key] = {'event': threading.Event()}
+                self.misses += 1
+                leader = True
+        if not leader:
+            waiting['event'].wait()
+            if 'error' in waiting:
+                raise waiting['error']
+            return waiting['result']
+        try:
+            result = fn(key)
+        except Exception as ex:
+            with self._lock:
+                waiting['error'] = ex
+                del self._pending[key]
+            waiting['event'].set()
+            raise
+        with self._lock:
+            self._results[key] = result
+            waiting['result'] = result
+            del self._pending[key]
+        waiting['event'].set()
+        return result
+
+    async def get_async(self, key, coro_fn):
+        '''
+        get_async is get for coroutines: returns `await coro_fn(key)`,
+        awaited at most once per key however many tasks ask.
+        '''
+        with self._lock:
+            if key in self._results:
+                self.hits += 1
+                return self._results[key]
+            future = self._pending_async.get(key)
+            if future:
+                self.coalesced += 1
+                leader = False
+            else:
+                future = self._pending_async[key] = asyncio.get_running_loop().create_future()
+                self.misses += 1
+                leader = True
+        if not leader:
+            return await asyncio.shield(future)
+        try:
+            result = await coro_fn(key)
+        except asyncio.CancelledError:
+            with self._lock:
+                del self._pending_async[key]
+            # the waiters see the cancellation rather than hang on the future
+            future.cancel()
+            raise
+        except Exception as ex:
+            with self._lock:
+                del self._pending_async[key]
+            future.set_exception(ex)
+            # mark retrieved so a failure nobody else waited on isn't reported twice
+            future.exception()
+            raise
+        with self._lock:
+            self._results[key] = result
+            del self._pending_async[key]
+        future.set_result(result)
+        return result
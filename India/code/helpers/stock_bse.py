@@ -1,68 +1,51 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 import csv
 import json
 import os
-import time
-from .utils import get_files_in_dir, get_new_files_added
+from .download_watcher import DownloadWatcher
+from .browser_pool import browser_tab
 
 bse_url = 'https://www.bseindia.com/corporates/List_Scrips.aspx'
+# seconds to wait for each page element, and for the download once clicked
+ELEMENT_TIMEOUT = 10
+DOWNLOAD_TIMEOUT = 60
 
 
 def pull_bse(download_dir):
-    existing_files = get_files_in_dir(download_dir)
-
-    chrome_options = webdriver.ChromeOptions()
-    prefs = {'download.default_directory' : download_dir}
-    chrome_options.add_experimental_option('prefs', prefs)
-    #chrome_options.add_argument("--headless")
-    service = Service()
-
-    driver = webdriver.Chrome(service=service, options=chrome_options)
-    driver.get(bse_url)
-    timeout = 10
+    watcher = DownloadWatcher(download_dir)
     try:
-        time.sleep(3)
-        WebDriverWait(driver, timeout).until(EC.visibility_of_element_located((By.ID, "ddlsegment")))
-        print('select element located')
-        time.sleep(3)
-        driver.find_element("xpath", "//select[@id='ddlsegment']/option[text()='Equity T+1']").click()
-        print('select element clicked')
-        time.sleep(3)
-        driver.find_element("xpath", "//input[@id='btnSubmit']").click()
-        print('submit element clicked')
-        time.sleep(3)
-        dload = WebDriverWait(driver, timeout).until(EC.visibility_of_element_located((By.ID,'lnkDownload')))
-        print('download element located')
-        time.sleep(3)
-        dload.click()
-        print('download element clicked')
-        time.sleep(3)
-        dload_file_name = None
-        for _ in range(5):
-            time.sleep(5)
-            new_file_list = get_new_files_added(download_dir, existing_files)        
+        with browser_tab(download_dir) as driver:
+            driver.get(bse_url)
+            wait = WebDriverWait(driver, ELEMENT_TIMEOUT)
+            wait.until(EC.element_to_be_clickable((By.XPATH, "//select[@id='ddlsegment']/option[text()='Equity T+1']"))).click()
+            print('select element clicked')
+            wait.until(EC.element_to_be_clickable((By.ID, 'btnSubmit'))).click()
+            print('submit element clicked')
+            dload = wait.until(EC.element_to_be_clickable((By.ID, 'lnkDownload')))
+            print('download element located')
+            dload.click()
+            print('download element clicked')
+            # the tab stays open until the download completes
+            new_file_list = watcher.wait(DOWNLOAD_TIMEOUT)
             if len(new_file_list) == 1:
-                dload_file_name = new_file_list[0]
-                break
+                os.rename(new_file_list[0], bse_eq_file_path(download_dir))
             elif len(new_file_list) > 1:
                 description = ''
                 for fil in new_file_list:
                     description = description + fil
-                
+            
                 summary='Failure to get bse equity list.  More than one file found;' + description
                 print(summary)
                 exit(1)
-        if dload_file_name:
-            os.rename(dload_file_name, bse_eq_file_path(download_dir))
+            else:
+                print(f'bse equity list not downloaded in {DOWNLOAD_TIMEOUT}s')
 
     except Exception as ex:
         print('Exception during pulling from bse', ex)
-    driver.close()
-    driver.quit()
+    finally:
+        watcher.close()
 
 def bse_eq_file_path(download_dir):
     full_file_path = os.path.join(download_dir, 'bse_eq.csv')
@@ -1,8 +1,12 @@
+from concurrent.futures import ThreadPoolExecutor
 import csv
+import io
 import json
 import os
 import webbrowser
 import time
+import requests
+from .http_client import get_client
 
 
 nse_url = 'https://nsearchives.nseindia.com/content/equities/EQUITY_L.csv'
@@ -11,15 +15,24 @@ nse_largecap_url = 'https://nsearchives.nseindia.com/content/indices/ind_nifty10
 nse_smallcap_url = 'https://nsearchives.nseindia.com/content/indices/ind_niftysmallcap250list.csv'
 nse_microcap_url = 'https://nsearchives.nseindia.com/content/indices/ind_niftymicrocap250_list.csv'
 
+# (url, file name) of the equity list and of the Nifty constituent list for each cap
+NSE_EQ_FILE = (nse_url, 'EQUITY_L.csv')
+NSE_CAP_FILES = {
+    'Large': (nse_largecap_url, 'ind_nifty100list.csv'),
+    'Mid': (nse_midcap_url, 'ind_niftymidcap150list.csv'),
+    'Small': (nse_smallcap_url, 'ind_niftysmallcap250list.csv'),
+    'Micro': (nse_microcap_url, 'ind_niftymicrocap250_list.csv'),
+}
+
 
 def nse_headers():
     """
     Headers required for requesting http://nseindia.com
     :return: a dict with http headers
     """
+    # no Host: requests sets the right one for nsearchives.nseindia.com
     return {'Accept': '*/*',
             'Accept-Language': 'en-US,en;q=0.5',
-            'Host': 'www1.nseindia.com',
             'User-Agent': 'Mozilla/5.0 (Windows NT 6.1; WOW64; rv:28.0) Gecko/20100101 Firefox/28.0',
             'X-Requested-With': 'XMLHttpRequest'
             }
@@ -32,49 +45,86 @@ def remove_file_if_exists(full_file_path):
     if os.path.exists(full_file_path):
         os.remove(full_file_path)
 
-def pull_nse(download_dir):
-    full_file_path = nse_eq_file_path(download_dir)
-    remove_file_if_exists(full_file_path)
-    webbrowser.open(nse_url)
-    time.sleep(3)
 
-    for i in range(10):
-        if os.path.exists(full_file_path):
-            break
-        time.sleep(3)
+class NseHttpSource:
+    """
+    Reads NSE files straight from nsearchives.nseindia.com into memory,
+    sharing the pooled, retrying HttpClient session
+    """
+    max_workers = 1 + len(NSE_CAP_FILES)
 
+    def __init__(self, client=None):
+        self.client = client or get_client()
 
-def pull_nse_cap_file(cap, download_dir, delete_downloaded_files):
-    if cap == 'Large':
-        url = nse_largecap_url
-        f = 'ind_nifty100list.csv'
-    elif cap == 'Mid':
-        url = nse_midcap_url
-        f = 'ind_niftymidcap150list.csv'
-    elif cap == 'Small':
-        url = nse_smallcap_url
-        f = 'ind_niftysmallcap250list.csv'
-    else:
-        url = nse_microcap_url
-        f = 'ind_niftymicrocap250_list.csv'
-    full_file_path = os.path.join(download_dir, f)
-    remove_file_if_exists(full_file_path)
-    webbrowser.open(url)
-    time.sleep(3)
-    
-    for i in range(10):
-        if os.path.exists(full_file_path):
-            break
+    def read(self, url, file_name):
+        response = self.client.get(url, headers=nse_headers())
+        if response.status_code != 200:
+            raise requests.HTTPError(f'status {response.status_code} getting {url}', response=response)
+        text = response.content.decode('utf-8-sig', errors='replace')
+        # a blocked request gets a 200 with an HTML page; every NSE list has an ISIN column
+        content_type = response.headers.get('Content-Type', '')
+        if 'html' in content_type.lower() or 'ISIN' not in text.partition('\n')[0].upper():
+            raise requests.RequestException(f'got {content_type or "no content type"} instead of a csv getting {url}',
+                                            response=response)
+        return text
+
+
+class NseLocalSource:
+    """
+    Reads NSE files already saved in a directory, e.g. test fixtures or a manual download
+    """
+    max_workers = 1
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def read(self, url, file_name):
+        with open(os.path.join(self.directory, file_name), mode='r', encoding='utf-8-sig') as f:
+            return f.read()
+
+
+class NseBrowserSource:
+    """
+    Opens each NSE file in the desktop browser and waits for it to show up in download_dir.
+    The fallback for when NSE refuses the direct download.
+    """
+    max_workers = 1
+
+    def __init__(self, download_dir, delete_downloaded_files):
+        self.download_dir = download_dir
+        self.delete_downloaded_files = delete_downloaded_files
+
+    def read(self, url, file_name):
+        full_file_path = os.path.join(self.download_dir, file_name)
+        remove_file_if_exists(full_file_path)
+        webbrowser.open(url)
         time.sleep(3)
-    ret = None
-    with open(full_file_path, mode='r', encoding='utf-8-sig') as csv_file:
-        csv_reader = csv.DictReader(csv_file)
-        ret = list()
-        for row in csv_reader:
-            #print(row)
-            ret.append({'isin':row['ISIN Code'], 'symbol':row['Symbol'], 'industry':row['Industry']})
-    if delete_downloaded_files:
-        os.remove(full_file_path)
+
+        for i in range(10):
+            if os.path.exists(full_file_path):
+                break
+            time.sleep(3)
+        with open(full_file_path, mode='r', encoding='utf-8-sig') as csv_file:
+            text = csv_file.read()
+        if self.delete_downloaded_files:
+            os.remove(full_file_path)
+        return text
+
+
+def fetch_nse_files(source):
+    """
+    Reads the equity list and the cap constituent lists from source, in parallel where the source allows
+    :return: (equity list csv text, {cap: constituent list csv text})
+    """
+    files = [NSE_EQ_FILE] + list(NSE_CAP_FILES.values())
+    with ThreadPoolExecutor(max_workers=source.max_workers) as executor:
+        texts = list(executor.map(lambda f: source.read(*f), files))
+    return texts[0], dict(zip(NSE_CAP_FILES.keys(), texts[1:]))
+
+def parse_cap_file(text):
+    ret = list()
+    for row in csv.DictReader(io.StringIO(text)):
+        ret.append({'isin':row['ISIN Code'], 'symbol':row['Symbol'], 'industry':row['Industry']})
     return ret
 
 def is_nse_eq_file_exists(download_dir):
@@ -107,15 +157,18 @@ def clean(d):
         res[k.strip()] = v
     return res
 
-def update_nse(download_dir, delete_downloaded_files, delete_processed_files):
-    n_path = nse_eq_file_path(download_dir)
+def update_nse(download_dir, delete_downloaded_files, delete_processed_files, source=None):
     n_b_path = nse_bse_eq_file_path(download_dir)
-    
-    if os.path.exists(n_path):
-        print(f'Removing {n_path}')
-        os.remove(n_path)
-    pull_nse(download_dir)
-    print(f'Downloaded NSE data to {n_path}')
+
+    if source is None:
+        try:
+            eq_text, cap_texts = fetch_nse_files(NseHttpSource())
+        except requests.RequestException as ex:
+            print(f'exception {ex} downloading NSE files. falling back to the browser')
+            eq_text, cap_texts = fetch_nse_files(NseBrowserSource(download_dir, delete_downloaded_files))
+    else:
+        eq_text, cap_texts = fetch_nse_files(source)
+    print('Downloaded NSE data')
 
     stocks = dict()
 
@@ -132,7 +185,7 @@ def update_nse(download_dir, delete_downloaded_files, delete_processed_files):
             v['suspension_date'] = ''
     
 
-    with open(n_path, mode='r', encoding='utf-8-sig') as nse_csv_file:
+    with io.StringIO(eq_text) as nse_csv_file:
         csv_reader = csv.DictReader(nse_csv_file)
         for temp in csv_reader:
             row = clean(temp)
@@ -169,8 +222,7 @@ def update_nse(download_dir, delete_downloaded_files, delete_processed_files):
                 stocks[isin]['nse_symbol'] = row['SYMBOL']
       
     for cap in ['Large','Mid','Small','Micro']:
-        ret = pull_nse_cap_file(cap, download_dir, delete_downloaded_files)
-        for entry in ret:
+        for entry in parse_cap_file(cap_texts[cap]):
             if entry['isin'] in stocks:
                 stocks[entry['isin']]['cap'] = cap+'-Cap'
                 if stocks[entry['isin']]['industry'] == '':
@@ -180,5 +232,3 @@ def update_nse(download_dir, delete_downloaded_files, delete_processed_files):
 
     with open(n_b_path, 'w') as json_file:
         json.dump(stocks, json_file, indent=1)
-    if delete_downloaded_files:
-        os.remove(n_path)
@@ -0,0 +1,96 @@
+import re
+
+
+# fields that identify a listing, each with the field holding its earlier values
+SYMBOL_FIELDS = {
+    'bse_security_id': 'old_bse_security_id',
+    'bse_security_code': 'old_bse_security_code',
+    'nse_symbol': 'old_nse_symbol',
+}
+
+
+def split_symbols(value):
+    '''
+    split_symbols returns the symbols in an old_* field, which stock_bse and
+    stock_nse join with ';' (older entries use ',')
+    '''
+    if not value:
+        return []
+    return [symbol.strip() for symbol in re.split('[;,]', value) if symbol.strip()]
+
+
+class SymbolIndex:
+    '''
+    SymbolIndex maps the current and historical BSE security ids, BSE
+    security codes and NSE symbols of nse_bse_eq.json style entries to
+    their ISINs, so finding the entry a renamed or re-issued listing
+    belongs to is a few dict lookups instead of a scan over every ISIN.
+
+    add has to be called again whenever an indexed entry's symbols change;
+    it replaces what was indexed for that ISIN.  ISINs keep the position of
+    their first add, and find returns the earliest added match, as a scan
+    over the entries in insertion order would.
+
+    With old_symbols=False only the current symbols are indexed.
+    '''
+    def __init__(self, data=None, old_symbols=True):
+        self.old_symbols = old_symbols
+        self._keys = dict()
+        self._isins = dict()
+        self._positions = dict()
+        for isin, entry in (data or dict()).items():
+            self.add(isin, entry)
+
+    def get_keys(self, entry):
+        keys = set()
+        for field, old_field in SYMBOL_FIELDS.items():
+            current = (entry.get(field) or '').strip()
+            if current:
+                keys.add((field, current))
+            if self.old_symbols:
+                for symbol in split_symbols(entry.get(old_field)):
+                    keys.add((field, symbol))
+        return keys
+
+    def add(self, isin, entry):
+        self.remove(isin)
+        self._positions.setdefault(isin, len(self._positions))
+        keys = self.get_keys(entry)
+        self._keys[isin] = keys
+        for key in keys:
+            self._isins.setdefault(key, set()).add(isin)
+
+    def remove(self, isin):
+        for key in self._keys.pop(isin, set()):
+            isins = self._isins[key]
+            isins.discard(isin)
+            if not isins:
+                del self._isins[key]
+
+    def __contains__(self, isin):
+        return isin in self._keys
+
+    def _candidates(self, entry, fields):
+        candidates = set()
+        for field in fields:
+            value = (entry.get(field) or '').strip()
+            if value:
+                candidates |= self._isins.get((field, value), set())
+        return candidates
+
+    def find(self, entry, fields=('bse_security_id', 'nse_symbol')):
+        '''
+        find returns the ISIN of the earliest added entry that has (or had)
+        one of entry's current symbols in fields, or None
+        '''
+        candidates = self._candidates(entry, fields)
+        if not candidates:
+            return None
+        return min(candidates, key=self._positions.get)
+
+    def find_all(self, entry, fields=tuple(SYMBOL_FIELDS)):
+        '''
+        find_all returns the ISINs of every entry sharing one of entry's
+        current symbols in fields, in the order they were added
+        '''
+        return sorted(self._candidates(entry, fields), key=self._positions.get)
@@ -32,21 +32,6 @@ def get_date_or_none_from_string(input, format='%Y-%m-%d', printout=True):
                 print('error converting ', input, ' to date. returning none' + str(e))
     return None
 
-def get_files_in_dir(dir):
-    file_list = list()
-    for file in os.listdir(dir):
-        path = os.path.join(dir, file)
-        file_list.append(path)
-    return file_list
-
-def get_new_files_added(dir, existing_list):
-    new_file_list = list()
-    for file in os.listdir(dir):
-        path = os.path.join(dir, file)
-        if path not in existing_list:
-            new_file_list.append(path)
-    return new_file_list
-
 def get_path_to_chrome_driver():
     path = pathlib.Path(__file__).parent.parent.parent.parent.absolute()
     for file in os.listdir(path):
@@ -1,8 +1,21 @@
 import json
 import csv
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import io
 import os
+import sys
 from pathlib import Path
-from typing import Tuple, List, Dict
+from typing import Tuple, List, Dict, Optional
+
+
+CACHE_FILE = os.path.join(os.path.expanduser('~'), '.cache', 'portfoliomanager-data', 'verify_file_content.json')
+HELPERS_DIR = os.path.dirname(os.path.abspath(__file__))
+TAXONOMY_FILE = os.path.join(os.path.dirname(HELPERS_DIR), 'known_amfi_taxonomy.json')
+# The code the checks are made of.  A cached pass only stands while these
+# are unchanged too, so changing a check verifies every file again.
+CHECKS_SOURCES = [os.path.join(HELPERS_DIR, 'verify_file_content.py')]
+MF_CSV_CHECKS_SOURCES = [os.path.join(HELPERS_DIR, 'mf_entry.py'), os.path.join(HELPERS_DIR, 'amfi_taxonomy.py')]
 
 
 def verify_json_file(file_path: str) -> Tuple[bool, str]:
@@ -27,6 +40,83 @@ def verify_json_file(file_path: str) -> Tuple[bool, str]:
         return False, f"✗ Error reading {file_path}: {str(e)}"
 
 
+def import_mf_csv_checks():
+    """
+    Import the mf.csv specific row checks, whether this module was imported
+    as part of helpers or run as a standalone script (no parent package),
+    e.g. `python helpers/verify_file_content.py`.
+
+    Returns:
+        Tuple of (find_malformed_in_rows, find_unapproved_taxonomy_in_rows)
+    """
+    try:
+        from .mf_entry import find_malformed_in_rows
+        from .amfi_taxonomy import find_unapproved_taxonomy_in_rows
+    except ImportError:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        from mf_entry import find_malformed_in_rows
+        from amfi_taxonomy import find_unapproved_taxonomy_in_rows
+    return find_malformed_in_rows, find_unapproved_taxonomy_in_rows
+
+
+def verify_csv_rows(file_path: str, rows: List[List[str]]) -> Tuple[bool, str]:
+    """
+    Run every check of verify_csv_file over the already parsed rows of a
+    CSV file, so each file is parsed only once however many checks apply.
+
+    Args:
+        file_path: Path the rows were read from
+        rows: The parsed rows, header first
+
+    Returns:
+        Tuple of (is_valid: bool, message: str)
+    """
+    row_count = len(rows)
+
+    if row_count == 0:
+        return False, f"✗ Empty CSV file: {file_path}"
+
+    header_len = len(rows[0])
+    ragged = [i for i, row in enumerate(rows[1:], start=2) if len(row) != header_len]
+    if ragged:
+        sample = ', '.join(str(n) for n in ragged[:10])
+        return False, (
+            f"✗ Invalid CSV in {file_path}: {len(ragged)} row(s) don't match "
+            f"the header's {header_len} columns (likely an unquoted comma in a "
+            f"field) at line(s) {sample}"
+        )
+
+    if os.path.basename(file_path) == 'mf.csv':
+        find_malformed_in_rows, find_unapproved_taxonomy_in_rows = import_mf_csv_checks()
+
+        problems = find_malformed_in_rows(rows)
+        if problems:
+            sample = ', '.join(str(lineno) for lineno, _ in problems[:10])
+            return False, (
+                f"✗ Invalid CSV in {file_path}: {len(problems)} row(s) have a "
+                f"misaligned isin column (unquoted comma in `name` shifted "
+                f"columns without changing row length) at line(s) {sample}"
+            )
+
+        taxonomy_problems = find_unapproved_taxonomy_in_rows(rows)
+        if taxonomy_problems:
+            sample = ', '.join(
+                f"line {lineno} {field}={value!r}"
+                for lineno, field, value in taxonomy_problems[:10]
+            )
+            return False, (
+                f"✗ Invalid CSV in {file_path}: {len(taxonomy_problems)} row(s) use "
+                f"an amfi_fund_type/amfi_category not in known_amfi_taxonomy.json "
+                f"({sample}). If this is a legitimate new or changed category, add "
+                f"it to known_amfi_taxonomy.json to approve it explicitly; if it's "
+                f"upstream drift, add a correction to AMFI_FUND_TYPE_ALIASES/"
+                f"AMFI_CATEGORY_ALIASES in "
+                f"helpers/amfi_taxonomy.py instead."
+            )
+
+    return True, f"✓ Valid CSV: {file_path} ({row_count} rows)"
+
+
 def verify_csv_file(file_path: str) -> Tuple[bool, str]:
     """
     Verify if a CSV file is valid and well-formed.
@@ -47,65 +137,12 @@ def verify_csv_file(file_path: str) -> Tuple[bool, str]:
         Tuple of (is_valid: bool, message: str)
     """
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            # Try to read the CSV file with different delimiters
-            csv.Sniffer().sniff(f.read(1024))
-            f.seek(0)
-            reader = csv.reader(f)
-            rows = list(reader)
-            row_count = len(rows)
-
-            if row_count == 0:
-                return False, f"✗ Empty CSV file: {file_path}"
-
-            header_len = len(rows[0])
-            ragged = [i for i, row in enumerate(rows[1:], start=2) if len(row) != header_len]
-            if ragged:
-                sample = ', '.join(str(n) for n in ragged[:10])
-                return False, (
-                    f"✗ Invalid CSV in {file_path}: {len(ragged)} row(s) don't match "
-                    f"the header's {header_len} columns (likely an unquoted comma in a "
-                    f"field) at line(s) {sample}"
-                )
-
-            if os.path.basename(file_path) == 'mf.csv':
-                try:
-                    from .mf_entry import find_malformed_rows
-                    from .amfi_taxonomy import find_unapproved_taxonomy_rows
-                except ImportError:
-                    # Running as a standalone script (no parent package),
-                    # e.g. `python helpers/verify_file_content.py`.
-                    import sys
-                    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-                    from mf_entry import find_malformed_rows
-                    from amfi_taxonomy import find_unapproved_taxonomy_rows
-
-                problems = find_malformed_rows(file_path)
-                if problems:
-                    sample = ', '.join(str(lineno) for lineno, _ in problems[:10])
-                    return False, (
-                        f"✗ Invalid CSV in {file_path}: {len(problems)} row(s) have a "
-                        f"misaligned isin column (unquoted comma in `name` shifted "
-                        f"columns without changing row length) at line(s) {sample}"
-                    )
-
-                taxonomy_problems = find_unapproved_taxonomy_rows(file_path)
-                if taxonomy_problems:
-                    sample = ', '.join(
-                        f"line {lineno} {field}={value!r}"
-                        for lineno, field, value in taxonomy_problems[:10]
-                    )
-                    return False, (
-                        f"✗ Invalid CSV in {file_path}: {len(taxonomy_problems)} row(s) use "
-                        f"an amfi_fund_type/amfi_category not in known_amfi_taxonomy.json "
-                        f"({sample}). If this is a legitimate new or changed category, add "
-                        f"it to known_amfi_taxonomy.json to approve it explicitly; if it's "
-                        f"upstream drift, add a correction to AMFI_FUND_TYPE_ALIASES/"
-                        f"AMFI_CATEGORY_ALIASES in "
-                        f"helpers/amfi_taxonomy.py instead."
-                    )
-
-            return True, f"✓ Valid CSV: {file_path} ({row_count} rows)"
+        with open(file_path, 'r', encoding='utf-8', newline='') as f:
+            text = f.read()
+        # Try to read the CSV file with different delimiters
+        csv.Sniffer().sniff(text[:1024])
+        rows = list(csv.reader(io.StringIO(text, newline='')))
+        return verify_csv_rows(file_path, rows)
     except csv.Error as e:
         return False, f"✗ Invalid CSV in {file_path}: {str(e)}"
     except FileNotFoundError:
@@ -114,13 +151,163 @@ def verify_csv_file(file_path: str) -> Tuple[bool, str]:
         return False, f"✗ Error reading {file_path}: {str(e)}"
 
 
-def main(repository_root: str = None) -> Dict[str, List[Dict]]:
+def verify_file(file_path: str) -> Tuple[bool, str]:
+    """
+    Verify a JSON or CSV file, by its extension.
+
+    Args:
+        file_path: Path to the file to verify
+
+    Returns:
+        Tuple of (is_valid: bool, message: str)
+    """
+    if file_path.endswith('.csv'):
+        return verify_csv_file(file_path)
+    return verify_json_file(file_path)
+
+
+def get_content_hash(file_path: str) -> Optional[str]:
+    """
+    Hash what a file's verdict depends on: its content and the source of
+    the checks, plus for mf.csv the source of the mf.csv specific checks
+    and the approved taxonomy it is checked against.
+
+    Args:
+        file_path: Path to the file
+
+    Returns:
+        The hex digest, or None if the file can't be read
+    """
+    h = hashlib.sha256()
+    paths = [file_path] + CHECKS_SOURCES
+    if os.path.basename(file_path) == 'mf.csv':
+        paths += MF_CSV_CHECKS_SOURCES + [TAXONOMY_FILE]
+    try:
+        for path in paths:
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    h.update(chunk)
+            h.update(b'\0')
+    except OSError:
+        return None
+    return h.hexdigest()
+
+
+class VerdictCache:
+    """
+    VerdictCache remembers, per file, the content hash it last passed
+    verification with and the message it passed with, so a file unchanged
+    since is not parsed again.  Only passes are kept; an invalid file is
+    verified on every run until it is fixed.
+    """
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or CACHE_FILE
+        self.entries = dict()
+        self.hits = 0
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    def get(self, file_path: str, content_hash: Optional[str]) -> Optional[str]:
+        entry = self.entries.get(os.path.abspath(file_path))
+        if content_hash and entry and entry.get('sha256') == content_hash:
+            self.hits += 1
+            return entry.get('message')
+        return None
+
+    def put(self, file_path: str, content_hash: Optional[str], is_valid: bool, message: str):
+        file_path = os.path.abspath(file_path)
+        if content_hash and is_valid:
+            self.entries[file_path] = {'sha256': content_hash, 'message': message}
+        else:
+            self.entries.pop(file_path, None)
+
+    def save(self):
+        # files since deleted (or test trees since removed) are dropped
+        self.entries = {k: v for k, v in self.entries.items() if os.path.exists(k)}
+        try:
+            from .atomic_io import write_json
+        except ImportError:
+            sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+            from atomic_io import write_json
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            write_json(self.path, self.entries, encoding='utf-8', indent=1, sort_keys=True)
+        except OSError as e:
+            print(f"could not save verification cache {self.path}: {e}")
+
+
+def get_verdict_cache(cache_path: Optional[str]) -> Optional[VerdictCache]:
+    """
+    Get the verdict cache kept in cache_path, or None if there is no
+    cache_path or PM_VERIFY_CACHE=0.
+    """
+    if not cache_path or os.environ.get('PM_VERIFY_CACHE', '1') == '0':
+        return None
+    return VerdictCache(cache_path)
+
+
+def verify_files(file_paths: List[str], jobs: Optional[int] = None,
+                 cache: Optional[VerdictCache] = None) -> Dict[str, Tuple[bool, str]]:
+    """
+    Verify files in a pool of processes, skipping those the cache has seen
+    pass with the same content.
+
+    Args:
+        file_paths: Paths of the JSON and CSV files to verify
+        jobs: Number of processes; defaults to the number of CPUs
+        cache: VerdictCache to consult and update, or None to verify everything
+
+    Returns:
+        {file_path: (is_valid, message)}
+    """
+    results = dict()
+    hashes = dict()
+    pending = list()
+    for file_path in file_paths:
+        message = None
+        if cache is not None:
+            hashes[file_path] = get_content_hash(file_path)
+            message = cache.get(file_path, hashes[file_path])
+        if message:
+            results[file_path] = (True, message)
+        else:
+            pending.append(file_path)
+
+    jobs = min(jobs or os.cpu_count() or 1, len(pending))
+    if jobs > 1:
+        # largest first, so the big files don't start last
+        pending.sort(key=lambda path: os.path.getsize(path) if os.path.exists(path) else 0, reverse=True)
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            verdicts = list(executor.map(verify_file, pending))
+    else:
+        verdicts = [verify_file(file_path) for file_path in pending]
+
+    for file_path, verdict in zip(pending, verdicts):
+        results[file_path] = verdict
+        if cache is not None:
+            cache.put(file_path, hashes[file_path], *verdict)
+    if cache is not None:
+        cache.save()
+    return results
+
+
+def main(repository_root: str = None, jobs: Optional[int] = None, cache_path: Optional[str] = None) -> Dict[str, List[Dict]]:
     """
     Verify all JSON and CSV files in the repository.
+
+    Files are verified in parallel processes, and a file that passed with
+    the same content on an earlier run is not verified again when a
+    cache_path is given (see VerdictCache; PM_VERIFY_CACHE=0 verifies
+    everything).
     
     Args:
         repository_root: Root directory of the repository. 
                         If None, uses the parent directory of this script's location
+        jobs: Number of processes to verify with; defaults to the number of CPUs
+        cache_path: File to keep the verdict cache in; None verifies everything
                         
     Returns:
         Dictionary with validation results containing:
@@ -148,23 +335,26 @@ def main(repository_root: str = None) -> Dict[str, List[Dict]]:
         excluded_dirs = {'.venv', 'venv', '.env', '__pycache__', 'node_modules', '.git', '.pytest_cache', 'dist', 'build', '.egg-info'}
         return any(part.startswith('.') or part in excluded_dirs for part in path.parts)
     
-    # Find and verify all JSON files
+    json_files = sorted(str(f) for f in repository_root.rglob("*.json") if not should_exclude_path(f))
+    csv_files = sorted(str(f) for f in repository_root.rglob("*.csv") if not should_exclude_path(f))
+    cache = get_verdict_cache(cache_path)
+    verdicts = verify_files(json_files + csv_files, jobs=jobs, cache=cache)
+
+    # Report all JSON files
     print("JSON Files:")
     print("-" * 80)
-    json_files = [f for f in repository_root.rglob("*.json") if not should_exclude_path(f)]
-    for json_file in sorted(json_files):
-        is_valid, message = verify_json_file(str(json_file))
+    for json_file in json_files:
+        is_valid, message = verdicts[json_file]
         json_results.append({"file": str(json_file), "valid": is_valid})
         print(message)
     
     print(f"\n")
     
-    # Find and verify all CSV files
+    # Report all CSV files
     print("CSV Files:")
     print("-" * 80)
-    csv_files = [f for f in repository_root.rglob("*.csv") if not should_exclude_path(f)]
-    for csv_file in sorted(csv_files):
-        is_valid, message = verify_csv_file(str(csv_file))
+    for csv_file in csv_files:
+        is_valid, message = verdicts[csv_file]
         csv_results.append({"file": str(csv_file), "valid": is_valid})
         print(message)
     
@@ -191,6 +381,8 @@ def main(repository_root: str = None) -> Dict[str, List[Dict]]:
     print(f"JSON Files: {json_valid} valid, {json_invalid} invalid (Total: {len(json_results)})")
     print(f"CSV Files:  {csv_valid} valid, {csv_invalid} invalid (Total: {len(csv_results)})")
     print(f"Overall:    {summary['overall']['valid']} valid, {summary['overall']['invalid']} invalid (Total: {summary['overall']['total']})")
+    if cache is not None and cache.hits:
+        print(f"Unchanged:  {cache.hits} file(s) passed before with the same content and were not verified again")
     print(f"{'='*80}\n")
     
     return {
@@ -201,9 +393,10 @@ def main(repository_root: str = None) -> Dict[str, List[Dict]]:
 
 
 if __name__ == "__main__":
-    import sys
     repo_root_arg = sys.argv[1] if len(sys.argv) > 1 else None
-    results = main(repo_root_arg)
+    # the command line keeps its verdicts in CACHE_FILE unless
+    # PM_VERIFY_CACHE_FILE says otherwise
+    results = main(repo_root_arg, cache_path=os.environ.get('PM_VERIFY_CACHE_FILE') or CACHE_FILE)
     if results["summary"]["overall"]["invalid"] > 0:
         sys.exit(1)
 
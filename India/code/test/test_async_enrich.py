@@ -0,0 +1,109 @@
+import os
+import sys
+import json
+import asyncio
+import unittest
+from unittest.mock import patch
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers.async_enrich import run_enrichment
+from helpers.mf_amfi import get_details_amfi_async
+
+
+def mfapi_payload(code):
+    return {
+        'meta': {
+            'fund_house': 'Some Mutual Fund',
+            'scheme_category': 'Equity Scheme - Large Cap Fund',
+            'scheme_code': int(code),
+            'scheme_name': f'Fund {code} - Direct Plan - Growth',
+        },
+        'data': [{'date': '01-01-2099'}, {'date': '01-01-2020'}],
+    }
+
+
+class TestRunEnrichment(unittest.TestCase):
+    def run_enrichment(self, items, worker, handler, **kwargs):
+        results = {}
+
+        def on_result(key, result):
+            results[key] = result
+
+        transport = httpx.MockTransport(handler)
+        asyncio.run(run_enrichment(items, worker, on_result, transport=transport, **kwargs))
+        return results
+
+    def test_streams_every_result_to_on_result(self):
+        def handler(request):
+            code = request.url.path.rsplit('/', 1)[-1]
+            return httpx.Response(200, content=json.dumps(mfapi_payload(code)).encode())
+
+        async def worker(fetcher, code, details):
+            return await get_details_amfi_async(fetcher, code)
+
+        codes = [str(100000 + i) for i in range(25)]
+        results = self.run_enrichment([(code, {}) for code in codes], worker, handler, max_in_flight=5)
+        self.assertEqual(sorted(results), codes)
+        self.assertEqual(results['100003']['name'], 'Fund 100003 - Direct Plan - Growth')
+        self.assertEqual(results['100003']['amfi_fund_category'], 'Large Cap Fund')
+
+    def test_in_flight_requests_are_bounded(self):
+        state = {'in_flight': 0, 'peak': 0}
+
+        async def handler(request):
+            state['in_flight'] += 1
+            state['peak'] = max(state['peak'], state['in_flight'])
+            await asyncio.sleep(0.01)
+            state['in_flight'] -= 1
+            return httpx.Response(200, content=b'{}')
+
+        async def worker(fetcher, key, value):
+            return (await fetcher.get(f'https://example.com/{key}')).json()
+
+        self.run_enrichment([(i, None) for i in range(40)], worker, handler, max_in_flight=20, per_host=4)
+        self.assertLessEqual(state['peak'], 4)
+        self.assertGreater(state['peak'], 1)
+
+    @patch('helpers.async_enrich.asyncio.sleep')
+    def test_retries_retryable_status(self, sleep_mock):
+        responses = [httpx.Response(503), httpx.Response(200, content=b'"ok"')]
+
+        async def no_sleep(seconds):
+            return None
+        sleep_mock.side_effect = no_sleep
+
+        async def worker(fetcher, key, value):
+            return (await fetcher.get('https://example.com/x')).json()
+
+        results = self.run_enrichment([('x', None)], worker, lambda request: responses.pop(0))
+        self.assertEqual(results, {'x': 'ok'})
+
+    def test_failing_worker_does_not_stop_the_others(self):
+        async def worker(fetcher, key, value):
+            if key == 'bad':
+                raise ValueError('boom')
+            return key
+
+        results = self.run_enrichment([('a', None), ('bad', None), ('b', None)], worker,
+                                      lambda request: httpx.Response(200))
+        self.assertEqual(results, {'a': 'a', 'bad': None, 'b': 'b'})
+
+    def test_failing_worker_goes_to_on_error(self):
+        errors = {}
+
+        async def worker(fetcher, key, value):
+            if key == 'bad':
+                raise httpx.ConnectError('unreachable')
+            return key
+
+        results = self.run_enrichment([('a', None), ('bad', None)], worker, lambda request: httpx.Response(200),
+                                      on_error=lambda key, ex: errors.setdefault(key, ex))
+        self.assertEqual(results, {'a': 'a'})
+        self.assertIsInstance(errors['bad'], httpx.ConnectError)
+
+
+if __name__ == '__main__':
+    unittest.main()
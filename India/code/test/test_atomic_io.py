@@ -0,0 +1,143 @@
+import json
+import os
+import sys
+import shutil
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers.atomic_io import atomic_write, write_json, Journal, Checkpoint, run_step
+
+
+class TestAtomicWrite(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'data.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_write_json(self):
+        write_json(self.path, {'a': 1}, indent=1)
+        with open(self.path) as f:
+            self.assertEqual(json.load(f), {'a': 1})
+        self.assertEqual(os.listdir(self.temp_dir), ['data.json'])
+
+    def test_failed_write_leaves_previous_file(self):
+        write_json(self.path, {'a': 1})
+        with self.assertRaises(RuntimeError):
+            with atomic_write(self.path) as f:
+                f.write('{"a": ')
+                raise RuntimeError('interrupted')
+        with open(self.path) as f:
+            self.assertEqual(json.load(f), {'a': 1})
+        self.assertEqual(os.listdir(self.temp_dir), ['data.json'])
+
+    def test_keeps_file_mode(self):
+        write_json(self.path, {'a': 1})
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o644)
+        os.chmod(self.path, 0o600)
+        write_json(self.path, {'a': 2})
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o600)
+
+    def test_concurrent_writes_to_one_path(self):
+        import threading
+        errors = list()
+        def write(i):
+            try:
+                for _ in range(20):
+                    write_json(self.path, {'a': i})
+            except Exception as ex:
+                errors.append(ex)
+        threads = [threading.Thread(target=write, args=(i,)) for i in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(errors, [])
+        with open(self.path) as f:
+            self.assertIn(json.load(f)['a'], range(4))
+        self.assertEqual(os.listdir(self.temp_dir), ['data.json'])
+
+    def test_usa_helpers_use_this_module(self):
+        import importlib.util
+        from helpers import atomic_io
+        usa_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))),
+                                'code', 'helpers', 'atomic_io.py')
+        spec = importlib.util.spec_from_file_location('usa_atomic_io', usa_path)
+        usa_atomic_io = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(usa_atomic_io)
+        for name in ['fsync_dir', 'atomic_write', 'write_json']:
+            self.assertEqual(getattr(usa_atomic_io, name).__code__, getattr(atomic_io, name).__code__)
+
+
+class TestJournal(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_completed_steps_are_skipped_on_rerun(self):
+        calls = list()
+        journal = Journal('run', self.temp_dir)
+        run_step(journal, 'download', calls.append, 'download')
+        # interrupted here; the next run skips the download
+        journal = Journal('run', self.temp_dir)
+        self.assertTrue(journal.is_done('download'))
+        run_step(journal, 'download', calls.append, 'download')
+        run_step(journal, 'merge', calls.append, 'merge')
+        self.assertEqual(calls, ['download', 'merge'])
+        self.assertEqual(journal.completed(), ['download', 'merge'])
+        journal.clear()
+        self.assertEqual(Journal('run', self.temp_dir).completed(), [])
+
+    def test_truncated_record_is_ignored(self):
+        journal = Journal('run', self.temp_dir)
+        journal.record('download', files=['a.csv'])
+        with open(journal.path, 'a') as f:
+            f.write('{"step": "mer')
+        journal = Journal('run', self.temp_dir)
+        self.assertEqual(journal.completed(), ['download'])
+        self.assertEqual(journal.records[0]['files'], ['a.csv'])
+
+    def test_old_journal_is_started_over(self):
+        journal = Journal('run', self.temp_dir)
+        journal.record('download')
+        past = time.time() - 10
+        with open(journal.path, 'w') as f:
+            f.write(json.dumps({'step': 'download', 'at': past}) + '\n')
+        self.assertEqual(Journal('run', self.temp_dir, max_age=5).completed(), [])
+
+
+class TestCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_results_are_flushed_in_batches_and_resumed(self):
+        checkpoint = Checkpoint('phase', journal_dir=self.temp_dir, flush_every=2, flush_interval=3600)
+        checkpoint.add('1', {'name': 'a'})
+        self.assertEqual(Checkpoint('phase', resume=True, journal_dir=self.temp_dir).results, {})
+        checkpoint.add('2', None)
+        checkpoint.add('3', {'name': 'c'})
+        # '3' is still buffered when the run dies
+        resumed = Checkpoint('phase', resume=True, journal_dir=self.temp_dir)
+        self.assertEqual(resumed.results, {'1': {'name': 'a'}, '2': None})
+        self.assertIn('2', resumed)
+        self.assertNotIn('3', resumed)
+
+    def test_without_resume_old_results_are_discarded(self):
+        checkpoint = Checkpoint('phase', journal_dir=self.temp_dir)
+        checkpoint.add('1', 'a')
+        checkpoint.flush()
+        self.assertEqual(Checkpoint('phase', journal_dir=self.temp_dir).results, {})
+        self.assertEqual(Checkpoint('phase', resume=True, journal_dir=self.temp_dir).results, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
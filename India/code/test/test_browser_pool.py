@@ -0,0 +1,88 @@
+import os
+import sys
+import unittest
+from unittest.mock import patch, MagicMock
+
+# Add parent directory to path to import helpers
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from helpers.browser_pool import BrowserPool, needs_no_sandbox
+
+
+def make_driver():
+    driver = MagicMock()
+    driver.current_window_handle = 'home'
+    return driver
+
+
+class TestBrowserPool(unittest.TestCase):
+    def test_starts_chrome_once_for_many_tabs(self):
+        driver = make_driver()
+        with patch('helpers.browser_pool.webdriver.Chrome', return_value=driver) as chrome:
+            pool = BrowserPool(service=MagicMock())
+            self.assertFalse(pool.started)
+            for _ in range(3):
+                with pool.tab() as tab:
+                    self.assertIs(tab, driver)
+                    tab.get('https://example.com')
+            self.assertEqual(chrome.call_count, 1)
+            options = chrome.call_args.kwargs['options']
+            self.assertIn('--headless=new', options.arguments)
+            self.assertEqual(driver.switch_to.new_window.call_count, 3)
+            self.assertEqual(driver.close.call_count, 3)
+            driver.switch_to.window.assert_called_with('home')
+            pool.close()
+        driver.quit.assert_called_once()
+        self.assertFalse(pool.started)
+
+    def test_sandbox_kept_unless_needed(self):
+        with patch.dict(os.environ, {'PM_CHROME_NO_SANDBOX': '0'}, clear=True), \
+             patch('helpers.browser_pool.os.geteuid', return_value=1000, create=True):
+            self.assertFalse(needs_no_sandbox())
+            with patch('helpers.browser_pool.webdriver.Chrome', return_value=make_driver()) as chrome:
+                with BrowserPool(headless=False, service=MagicMock()).tab():
+                    pass
+            self.assertNotIn('--no-sandbox', chrome.call_args.kwargs['options'].arguments)
+            with patch('helpers.browser_pool.os.geteuid', return_value=0, create=True):
+                self.assertTrue(needs_no_sandbox())
+        with patch.dict(os.environ, {'CI': 'true'}, clear=True), \
+             patch('helpers.browser_pool.os.geteuid', return_value=1000, create=True):
+            self.assertTrue(needs_no_sandbox())
+        with patch.dict(os.environ, {'PM_CHROME_NO_SANDBOX': '1'}, clear=True), \
+             patch('helpers.browser_pool.os.geteuid', return_value=1000, create=True):
+            self.assertTrue(needs_no_sandbox())
+
+    def test_download_dir(self):
+        driver = make_driver()
+        with patch('helpers.browser_pool.webdriver.Chrome', return_value=driver):
+            pool = BrowserPool(headless=False, service=MagicMock())
+            with pool.tab('/tmp/downloads'):
+                pass
+        driver.execute_cdp_cmd.assert_called_once_with('Browser.setDownloadBehavior',
+                                                       {'behavior': 'allow', 'downloadPath': '/tmp/downloads'})
+
+    def test_tab_closed_when_scraper_raises(self):
+        driver = make_driver()
+        with patch('helpers.browser_pool.webdriver.Chrome', return_value=driver):
+            pool = BrowserPool(service=MagicMock())
+            with self.assertRaises(ValueError):
+                with pool.tab():
+                    raise ValueError('no table')
+        driver.close.assert_called_once()
+        self.assertTrue(pool.started)
+
+    def test_restarts_after_broken_tab(self):
+        first, second = make_driver(), make_driver()
+        first.close.side_effect = RuntimeError('browser gone')
+        with patch('helpers.browser_pool.webdriver.Chrome', side_effect=[first, second]) as chrome:
+            pool = BrowserPool(service=MagicMock())
+            with pool.tab():
+                pass
+            self.assertFalse(pool.started)
+            with pool.tab() as tab:
+                self.assertIs(tab, second)
+        self.assertEqual(chrome.call_count, 2)
+        first.quit.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+# Add parent directory to path to import helpers
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from helpers.download_watcher import DownloadWatcher, is_partial_download
+
+
+def download(directory, name, delay=0.1):
+    # write the file under a partial name and rename it once complete, as Chrome does
+    def run():
+        partial = os.path.join(directory, name + '.crdownload')
+        with open(partial, 'w') as f:
+            f.write('Security Code,Security Id\n')
+            time.sleep(delay)
+            f.write('500002,ABB\n')
+        os.rename(partial, os.path.join(directory, name))
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+class TestDownloadWatcher(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        with open(os.path.join(self.temp_dir, 'old.csv'), 'w') as f:
+            f.write('already here\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def check_download(self, use_inotify):
+        with DownloadWatcher(self.temp_dir, use_inotify=use_inotify) as watcher:
+            thread = download(self.temp_dir, 'Equity.csv')
+            started = time.monotonic()
+            new_files = watcher.wait(10)
+            elapsed = time.monotonic() - started
+            thread.join()
+        self.assertEqual(new_files, [os.path.join(self.temp_dir, 'Equity.csv')])
+        self.assertLess(elapsed, 2)
+
+    def test_inotify(self):
+        self.check_download(use_inotify=True)
+
+    def test_snapshots(self):
+        with patch('helpers.download_watcher.POLL_INTERVAL', 0.05):
+            self.check_download(use_inotify=False)
+
+    def test_times_out_without_download(self):
+        for use_inotify in [True, False]:
+            with DownloadWatcher(self.temp_dir, use_inotify=use_inotify) as watcher:
+                with open(os.path.join(self.temp_dir, f'{use_inotify}.csv.crdownload'), 'w') as f:
+                    f.write('partial')
+                self.assertEqual(watcher.wait(0.3), [])
+
+    def test_is_partial_download(self):
+        self.assertTrue(is_partial_download('Equity.csv.crdownload'))
+        self.assertTrue(is_partial_download('.com.google.Chrome.abc123'))
+        self.assertFalse(is_partial_download('Equity.csv'))
+
+
+if __name__ == '__main__':
+    unittest.main()
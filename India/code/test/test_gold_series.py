@@ -0,0 +1,95 @@
+import os
+import sys
+import json
+import shutil
+import datetime
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# Add parent directory to path to import helpers
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from helpers.gold_series import GoldSeries, get_year_files
+
+
+def write_year(gold_dir, year, prices):
+    with open(os.path.join(gold_dir, f'{year}.json'), 'w') as f:
+        json.dump({'date_format': 'dd/mm/yyyy', 'currency': 'INR', 'weight': 'gram', 'prices': prices}, f)
+
+
+class TestGoldSeries(unittest.TestCase):
+    def setUp(self):
+        self.gold_dir = tempfile.mkdtemp()
+        write_year(self.gold_dir, 2024, {
+            '01/12/2024': {'24K': 7700.0, '22K': 7050.0, 'digital': 7900.0},
+            '01/11/2024': {'24K': 7800.0, '22K': 7150.0},
+        })
+        write_year(self.gold_dir, 2025, {
+            '01/01/2025': {'24K': 7658.0, '22K': 7015.0, 'digital': 7916.76},
+            '01/02/2025': {'24K': 8300.0, '22K': 7600.0, 'digital': 8500.0},
+        })
+        with open(os.path.join(self.gold_dir, 'sgb_tranche.json'), 'w') as f:
+            json.dump({'tranches': []}, f)
+        self.series = GoldSeries(self.gold_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.gold_dir)
+
+    def test_year_files(self):
+        self.assertEqual(sorted(get_year_files(self.gold_dir).keys()), [2024, 2025])
+
+    def test_sorted_across_years(self):
+        self.assertEqual(self.series.dates(), [datetime.date(2024, 11, 1), datetime.date(2024, 12, 1),
+                                               datetime.date(2025, 1, 1), datetime.date(2025, 2, 1)])
+
+    def test_get(self):
+        self.assertEqual(self.series.get(datetime.date(2025, 1, 1)), {'24K': 7658.0, '22K': 7015.0, 'digital': 7916.76})
+        self.assertEqual(self.series.get('01/11/2024'), {'24K': 7800.0, '22K': 7150.0})
+        self.assertIsNone(self.series.get(datetime.date(2025, 1, 2)))
+
+    def test_as_of(self):
+        dt, prices = self.series.as_of(datetime.datetime(2025, 1, 20, 10, 30))
+        self.assertEqual(dt, datetime.date(2025, 1, 1))
+        self.assertEqual(prices['24K'], 7658.0)
+        self.assertEqual(self.series.as_of(datetime.date(2024, 12, 1))[0], datetime.date(2024, 12, 1))
+        self.assertEqual(self.series.as_of(datetime.date(2030, 1, 1))[0], datetime.date(2025, 2, 1))
+        self.assertEqual(self.series.as_of(datetime.date(2024, 10, 31)), (None, None))
+
+    def test_range(self):
+        rows = self.series.range(datetime.date(2024, 12, 1), datetime.date(2025, 1, 1))
+        self.assertEqual(list(rows['24K']), [7700.0, 7658.0])
+        self.assertEqual(len(self.series.range(start=datetime.date(2025, 1, 15))), 1)
+        self.assertEqual(len(self.series.range(end=datetime.date(2024, 11, 30))), 1)
+        self.assertEqual(len(self.series.range()), 4)
+
+    def test_refresh_reloads_changed_files(self):
+        self.assertIsNone(self.series.get(datetime.date(2025, 3, 1)))
+        self.assertFalse(self.series.refresh())
+        write_year(self.gold_dir, 2025, {'01/03/2025': {'24K': 8700.0, '22K': 7970.0, 'digital': 8900.0}})
+        # lookups keep to what was read until refresh
+        self.assertIsNone(self.series.get(datetime.date(2025, 3, 1)))
+        self.assertTrue(self.series.refresh())
+        self.assertEqual(self.series.get(datetime.date(2025, 3, 1))['digital'], 8900.0)
+        self.assertIsNone(self.series.get(datetime.date(2025, 1, 1)))
+
+    def test_lookups_do_not_touch_files(self):
+        self.series.get(datetime.date(2025, 1, 1))
+        with patch('helpers.gold_series.os.listdir') as listdir, patch('helpers.gold_series.os.stat') as stat:
+            for day in range(1, 29):
+                self.series.as_of(datetime.date(2025, 2, day))
+            self.series.range(datetime.date(2024, 12, 1))
+        listdir.assert_not_called()
+        stat.assert_not_called()
+
+    def test_repo_gold_files(self):
+        series = GoldSeries()
+        dates = series.dates()
+        self.assertEqual(dates, sorted(dates))
+        self.assertEqual(len(dates), len(set(dates)))
+        dt, prices = series.as_of(dates[-1])
+        self.assertEqual(dt, dates[-1])
+        self.assertIn('24K', prices)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,161 @@
+import os
+import sys
+import time
+import shutil
+import unittest
+import tempfile
+from unittest.mock import patch
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers.http_cache import HttpCache, cached_get
+from helpers.http_client import HttpClient
+
+URL = 'https://api.mfapi.in/mf/100001'
+
+
+class FakeResponse:
+    def __init__(self, status_code, content=b'', headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+        self.encoding = 'utf-8'
+
+    def iter_lines(self):
+        return iter(self.content.splitlines())
+
+    def close(self):
+        pass
+
+
+class FakeSession:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def get(self, url, **kwargs):
+        self.calls.append((url, kwargs))
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+class TestHttpCache(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache = HttpCache(self.temp_dir, ttls=[('https://api.mfapi.in/', 60)])
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_fresh_response_is_served_from_disk(self):
+        session = FakeSession(FakeResponse(200, b'{"meta": 1}'))
+        first = self.cache.get(URL, session, timeout=15)
+        second = self.cache.get(URL, session, timeout=15)
+        self.assertEqual(len(session.calls), 1)
+        self.assertFalse(first.from_cache)
+        self.assertTrue(second.from_cache)
+        self.assertEqual(second.json(), {'meta': 1})
+        self.assertEqual(session.calls[0][1]['timeout'], 15)
+
+    def test_body_is_stored_compressed(self):
+        self.cache.get(URL, FakeSession(FakeResponse(200, b'x' * 10000)))
+        sizes = [os.path.getsize(os.path.join(self.temp_dir, f)) for f in os.listdir(self.temp_dir) if f.endswith('.gz')]
+        self.assertEqual(len(sizes), 1)
+        self.assertLess(sizes[0], 10000)
+
+    def test_stale_response_is_revalidated_with_etag(self):
+        session = FakeSession(
+            FakeResponse(200, b'"v1"', {'ETag': '"abc"', 'Last-Modified': 'Mon, 01 Jan 2024 00:00:00 GMT'}),
+            FakeResponse(304),
+        )
+        self.cache.get(URL, session)
+        time.sleep(0.01)
+        response = self.cache.get(URL, session, ttl=0.001)
+        self.assertEqual(response.json(), 'v1')
+        self.assertTrue(response.from_cache)
+        headers = session.calls[1][1]['headers']
+        self.assertEqual(headers['If-None-Match'], '"abc"')
+        self.assertEqual(headers['If-Modified-Since'], 'Mon, 01 Jan 2024 00:00:00 GMT')
+
+    def test_stale_copy_is_served_when_upstream_is_unreachable(self):
+        session = FakeSession(FakeResponse(200, b'"v1"'), requests.ConnectionError('down'))
+        self.cache.get(URL, session)
+        time.sleep(0.01)
+        response = self.cache.get(URL, session, ttl=0.001)
+        self.assertEqual(response.json(), 'v1')
+
+    def test_error_responses_are_not_cached(self):
+        session = FakeSession(FakeResponse(500, b'oops'), FakeResponse(200, b'"ok"'))
+        self.assertEqual(self.cache.get(URL, session).status_code, 500)
+        self.assertEqual(self.cache.get(URL, session).json(), 'ok')
+        self.assertEqual(len(session.calls), 2)
+
+    def test_urls_without_ttl_always_go_upstream(self):
+        url = 'https://example.com/data.json'
+        session = FakeSession(FakeResponse(200, b'1'), FakeResponse(200, b'2'))
+        self.assertEqual(self.cache.get(url, session).json(), 1)
+        self.assertEqual(self.cache.get(url, session).json(), 2)
+
+    def test_iter_lines_streams_and_caches_body(self):
+        session = FakeSession(FakeResponse(200, b'header\r\n1;INF1\r\n\r\n2;INF2\r\n'))
+        first = list(self.cache.iter_lines(URL, session))
+        second = list(self.cache.iter_lines(URL, session))
+        self.assertEqual(first, ['header', '1;INF1', '', '2;INF2'])
+        self.assertEqual(second, first)
+        self.assertEqual(len(session.calls), 1)
+        self.assertTrue(session.calls[0][1]['stream'])
+
+    def test_iter_lines_abandoned_part_way_is_not_cached(self):
+        session = FakeSession(FakeResponse(200, b'a\nb\nc'), FakeResponse(200, b'a\nb\nc'))
+        lines = self.cache.iter_lines(URL, session)
+        next(lines)
+        lines.close()
+        self.assertEqual([f for f in os.listdir(self.temp_dir)], [])
+        self.assertEqual(list(self.cache.iter_lines(URL, session)), ['a', 'b', 'c'])
+        self.assertEqual(len(session.calls), 2)
+
+    def test_iter_lines_raises_on_error_status(self):
+        session = FakeSession(FakeResponse(503, b'busy'))
+        with self.assertRaises(requests.HTTPError):
+            list(self.cache.iter_lines(URL, session))
+
+    def test_least_recently_used_responses_are_evicted(self):
+        cache = HttpCache(self.temp_dir, ttls=[('https://api.mfapi.in/', 60)])
+        cache.get(f'{URL}x', FakeSession(FakeResponse(200, b'"x"')))
+        body_size = os.path.getsize(cache._paths(f'{URL}x')[0])
+        cache.clear()
+        # room for three bodies, so a fourth forces one out
+        cache.max_bytes = body_size * 3.5
+        urls = [f'{URL}{i}' for i in range(3)]
+        for i, url in enumerate(urls):
+            cache.get(url, FakeSession(FakeResponse(200, b'"%d"' % i)))
+            past = time.time() - 100 + i
+            body = cache._paths(url)[0]
+            os.utime(body, (past, past))
+        # touching the first url makes the second the least recently used
+        cache.get(urls[0], FakeSession())
+        cache.get(f'{URL}9', FakeSession(FakeResponse(200, b'"9"')))
+        self.assertTrue(os.path.exists(cache._paths(urls[0])[0]))
+        self.assertFalse(os.path.exists(cache._paths(urls[1])[0]))
+
+
+    def test_cached_get_passes_retries_to_http_client_only(self):
+        class FakeClient(HttpClient):
+            def __init__(self, *responses):
+                FakeSession.__init__(self, *responses)
+            get = FakeSession.get
+        session = FakeSession(FakeResponse(200, b'"a"'))
+        client = FakeClient(FakeResponse(200, b'"b"'))
+        with patch('helpers.http_cache.get_default_cache', return_value=self.cache):
+            cached_get(f'{URL}a', session, timeout=15, retries=5)
+            cached_get(f'{URL}b', client, timeout=15, retries=5)
+        self.assertNotIn('retries', session.calls[0][1])
+        self.assertEqual(client.calls[0][1]['retries'], 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+
+from helpers.http_client import HttpClient, TokenBucket, MAX_WORKERS, POOL_HOSTS, get_backoff, is_unreachable
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeSession:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def get(self, url, **kwargs):
+        self.calls.append((url, kwargs))
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+class TestHttpClient(unittest.TestCase):
+    def make_client(self, *responses, **kwargs):
+        client = HttpClient(rate_limits={}, **kwargs)
+        client.session = FakeSession(*responses)
+        return client
+
+    def test_pool_is_sized_for_worker_threads(self):
+        adapter = HttpClient().session.get_adapter('https://api.kuvera.in/')
+        self.assertEqual(adapter._pool_maxsize, MAX_WORKERS)
+        self.assertEqual(adapter._pool_connections, POOL_HOSTS)
+
+    def test_default_timeout_is_applied(self):
+        client = self.make_client(FakeResponse(200))
+        client.get('https://api.kuvera.in/x', verify=False)
+        self.assertEqual(client.session.calls[0][1], {'timeout': (5, 15), 'verify': False})
+
+    def test_short_timeout_is_kept_for_connect(self):
+        client = self.make_client(FakeResponse(200))
+        client.get('https://api.kuvera.in/x', timeout=2)
+        self.assertEqual(client.session.calls[0][1], {'timeout': (2, 2)})
+
+    @patch('helpers.http_client.time.sleep')
+    def test_retries_retryable_status_then_succeeds(self, sleep_mock):
+        responses = [FakeResponse(503), FakeResponse(429, {'Retry-After': '2'}), FakeResponse(200)]
+        client = self.make_client(*responses)
+        response = client.get('https://api.kuvera.in/x')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(client.session.calls), 3)
+        self.assertEqual([r.closed for r in responses], [True, True, False])
+        self.assertEqual(sleep_mock.call_args_list[1].args[0], 2.0)
+
+    @patch('helpers.http_client.time.sleep')
+    def test_returns_last_response_when_attempts_run_out(self, sleep_mock):
+        client = self.make_client(FakeResponse(503), FakeResponse(503), FakeResponse(503))
+        self.assertEqual(client.get('https://api.kuvera.in/x').status_code, 503)
+
+    @patch('helpers.http_client.time.sleep')
+    def test_does_not_retry_client_errors(self, sleep_mock):
+        client = self.make_client(FakeResponse(404))
+        self.assertEqual(client.get('https://api.kuvera.in/x').status_code, 404)
+        sleep_mock.assert_not_called()
+
+    @patch('helpers.http_client.time.sleep')
+    def test_reraises_connection_error_after_last_attempt(self, sleep_mock):
+        client = self.make_client(requests.ConnectionError('a'), requests.ConnectionError('b'), retries=2)
+        with self.assertRaises(requests.ConnectionError):
+            client.get('https://api.kuvera.in/x')
+        self.assertEqual(sleep_mock.call_count, 1)
+
+    @patch('helpers.http_client.time.sleep')
+    def test_unreachable_host_fails_on_first_attempt(self, sleep_mock):
+        refused = requests.ConnectionError(MaxRetryError(None, 'https://api.kuvera.in/x', NewConnectionError(None, 'refused')))
+        client = self.make_client(refused, FakeResponse(200), retries=5)
+        with self.assertRaises(requests.ConnectionError):
+            client.get('https://api.kuvera.in/x')
+        self.assertEqual(len(client.session.calls), 1)
+        sleep_mock.assert_not_called()
+
+    def test_is_unreachable(self):
+        dns = NewConnectionError(None, 'Name or service not known')
+        self.assertTrue(is_unreachable(requests.ConnectionError(MaxRetryError(None, '/x', dns))))
+        self.assertTrue(is_unreachable(requests.ConnectTimeout('connect timed out')))
+        self.assertFalse(is_unreachable(requests.ConnectionError('connection reset by peer')))
+        self.assertFalse(is_unreachable(requests.ReadTimeout('read timed out')))
+
+    def test_backoff_grows_exponentially_with_jitter(self):
+        for attempt in range(1, 6):
+            delays = [get_backoff(attempt, backoff=1) for _ in range(50)]
+            self.assertTrue(all(0 <= d <= 2 ** (attempt - 1) for d in delays))
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_burst_is_free_then_waits_for_refill(self):
+        bucket = TokenBucket(rate=10, capacity=2)
+        with patch('helpers.http_client.time.sleep') as sleep_mock:
+            bucket.acquire()
+            bucket.acquire()
+            sleep_mock.assert_not_called()
+            sleep_mock.side_effect = lambda seconds: setattr(bucket, '_tokens', 1)
+            bucket.acquire()
+            self.assertGreater(sleep_mock.call_args.args[0], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import sys
+import unittest
+
+# Add parent directory to path to import helpers
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from helpers.merge_rules import (MergeRule, merge_entry, merge_entries, count_fired_rules,
+                                 UPDATE_RULES, SELECTED_FIELD_RULES)
+
+
+def make_entry(**fields):
+    entry = {'bse_security_code': '500001', 'bse_security_id': 'ABC', 'bse_name': 'ABC Ltd', 'status': 'Active',
+             'industry': 'Chemicals', 'listing_date': '01-JAN-2000', 'cap': 'Small-Cap', 'face_value': '10.00',
+             'nse_symbol': 'ABC', 'nse_name': 'ABC Limited'}
+    entry.update(fields)
+    return entry
+
+
+class TestMergeRules(unittest.TestCase):
+    def test_update_rules_copy_non_blank_fields(self):
+        entry = make_entry()
+        fired = merge_entry(make_entry(bse_name='ABC India Ltd', cap=' ', status=''), entry, UPDATE_RULES)
+        self.assertEqual(entry['bse_name'], 'ABC India Ltd')
+        self.assertEqual(entry['cap'], 'Small-Cap')
+        self.assertEqual(entry['status'], 'Active')
+        self.assertEqual(fired['bse_name'], 'update')
+        self.assertNotIn('cap', fired)
+
+    def test_same_listing_refreshes_bse_and_nse_details(self):
+        entry = make_entry()
+        new_entry = make_entry(bse_name='ABC India Ltd', status='Suspended', listing_date='', cap='', nse_name='ABC India')
+        fired = merge_entry(new_entry, entry, SELECTED_FIELD_RULES)
+        self.assertEqual(entry['bse_name'], 'ABC India Ltd')
+        self.assertEqual(entry['cap'], 'Small-Cap')
+        # nse_details runs after bse_details and copies listing_date even when blank
+        self.assertEqual(entry['listing_date'], '')
+        self.assertEqual(fired, {'bse_name': 'bse_details', 'status': 'bse_details', 'face_value': 'bse_details',
+                                 'industry': 'nse_details', 'listing_date': 'nse_details', 'nse_name': 'nse_details'})
+
+    def test_new_nse_listing(self):
+        entry = make_entry(nse_symbol='', nse_name='')
+        fired = merge_entry(make_entry(), entry, SELECTED_FIELD_RULES)
+        self.assertEqual(entry['nse_symbol'], 'ABC')
+        self.assertEqual(set(fired.values()), {'nse_listing'})
+
+    def test_new_bse_listing(self):
+        entry = make_entry(bse_security_code='', bse_security_id='', bse_name='')
+        fired = merge_entry(make_entry(), entry, SELECTED_FIELD_RULES)
+        self.assertEqual(entry['bse_security_code'], '500001')
+        self.assertEqual(entry['bse_name'], 'ABC Ltd')
+        self.assertEqual(set(fired.values()), {'bse_listing'})
+
+    def test_merge_entries(self):
+        data = {'INE000A01011': make_entry(), 'INE000B01011': make_entry(nse_symbol='', nse_name='')}
+        new_data = {'INE000A01011': make_entry(nse_symbol='OTHER'), 'INE000B01011': make_entry(),
+                    'INE000C01011': make_entry()}
+        fired = merge_entries(new_data, data, SELECTED_FIELD_RULES)
+        self.assertEqual(list(fired.keys()), ['INE000B01011'])
+        self.assertEqual(count_fired_rules(fired), {'nse_listing': 1})
+        self.assertNotIn('INE000C01011', data)
+
+    def test_when(self):
+        rule = MergeRule('status', when=lambda new_entry, entry: new_entry['status'] == 'Delisted', copy=['status'])
+        entry = make_entry()
+        self.assertEqual(merge_entry(make_entry(status='Suspended'), entry, [rule]), {})
+        self.assertEqual(merge_entry(make_entry(status='Delisted'), entry, [rule]), {'status': 'status'})
+        self.assertEqual(entry['status'], 'Delisted')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,7 +4,7 @@ import unittest
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from helpers.mf_amfi import parse_fund_type_info
+from helpers.mf_amfi import parse_fund_type_info, parse_nav_all
 
 
 class TestParseFundTypeInfo(unittest.TestCase):
@@ -34,3 +34,39 @@ class TestParseFundTypeInfo(unittest.TestCase):
         self.assertEqual(fund_house, 'Open Ended Schemes')
         self.assertEqual(amfi_fund_type, 'Equity Schemes')
         self.assertEqual(amfi_fund_category, 'Value Fund')
+
+
+NAV_ALL_LINES = [
+    'Scheme Code;ISIN Div Payout/ ISIN Growth;ISIN Div Reinvestment;Scheme Name;Net Asset Value;Date',
+    '',
+    'Open Ended Schemes(Equity Scheme - Large Cap Fund)',
+    '',
+    'Axis Mutual Fund',
+    '',
+    '120465;INF846K01DP8;-;Axis Large Cap Fund - Direct Plan - Growth;60.12;01-Jan-2099',
+    '120466;INF846K01DQ6;INF846K01DR4;Axis Large Cap Fund - Direct Plan - IDCW;0;01-Jan-2099',
+    'Baroda BNP Paribas Mutual Fund',
+    '119999;INF955L01AA1;-;Baroda BNP Paribas Large Cap Fund - Direct Growth;10.5;01-Jan-2020',
+]
+
+
+class TestParseNavAll(unittest.TestCase):
+    def test_yields_schemes_with_header_state(self):
+        schemes = list(parse_nav_all(iter(NAV_ALL_LINES)))
+        self.assertEqual([code for code, _ in schemes], ['120465', '119999'])
+        code, details = schemes[0]
+        self.assertEqual(details['isin'], 'INF846K01DP8')
+        self.assertEqual(details['isin2'], '')
+        self.assertEqual(details['fund_house'], 'Axis Mutual Fund')
+        self.assertEqual(details['amfi_fund_type'], 'Equity Scheme')
+        self.assertEqual(details['amfi_category'], 'Large Cap Fund')
+        self.assertNotIn('end_date', details)
+        self.assertEqual(schemes[1][1]['fund_house'], 'Baroda BNP Paribas Mutual Fund')
+        self.assertEqual(schemes[1][1]['end_date'], '01-01-2020')
+
+    def test_is_lazy(self):
+        lines = iter(NAV_ALL_LINES)
+        first_code, _ = next(parse_nav_all(lines))
+        self.assertEqual(first_code, '120465')
+        self.assertEqual(next(lines), NAV_ALL_LINES[7])
+
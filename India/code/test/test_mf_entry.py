@@ -5,7 +5,10 @@ import tempfile
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from helpers.mf_entry import get_mf_entries, find_malformed_rows
+from helpers.mf_entry import (get_mf_entries, find_malformed_rows, write_entries, write_changed_entries,
+                              get_new_entry, EntryChanges, IsinIndex)
+from helpers import mf_entry
+from unittest.mock import patch
 
 HEADER = 'code,name,isin,isin2,fund_house,inception_date,end_date,amfi_fund_type,amfi_category,ms_name,ms_category,ms_investment_style,ms_id,kuvera_name,kuvera_fund_category,kuvera_code\n'
 
@@ -60,6 +63,116 @@ class TestFindMalformedRows(unittest.TestCase):
         self.assertIn('100001', data)
         self.assertEqual(data['100001']['isin'], 'INF123456789')
 
+    def test_get_mf_entries_parses_file_once_until_it_changes(self):
+        self.write_csv(
+            '100001,Some Fund - Direct Plan - Growth,INF123456789,,Some Fund House,01-01-2020,,Equity Scheme,Large Cap Fund,,,,,,,'
+        )
+        with patch('helpers.mf_entry.read_mf_csv', wraps=mf_entry.read_mf_csv) as read_mf_csv:
+            first = get_mf_entries(self.csv_path)
+            first['100001']['name'] = 'changed by caller'
+            second = get_mf_entries(self.csv_path)
+            self.assertEqual(read_mf_csv.call_count, 1)
+            self.assertEqual(second['100001']['name'], 'Some Fund - Direct Plan - Growth')
+            second['100002'] = dict(second['100001'], name='Another Fund')
+            write_entries(second, 'test', self.csv_path)
+            third = get_mf_entries(self.csv_path)
+            self.assertEqual(read_mf_csv.call_count, 2)
+        self.assertEqual(sorted(third), ['100001', '100002'])
+
+
+def make_entry(name, isin=''):
+    entry = get_new_entry()
+    entry['name'] = name
+    entry['isin'] = isin
+    return entry
+
+
+class TestWriteChangedEntries(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.csv_path = os.path.join(self.temp_dir, 'mf.csv')
+        self.expected_path = os.path.join(self.temp_dir, 'expected.csv')
+        self.data = {code: make_entry(f'Fund {code}, Direct', f'INF00000{code}') for code in ['1001', '1003', '1005', '2000']}
+        write_entries(self.data, 'setup', self.csv_path)
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.temp_dir)
+
+    def assert_same_as_full_write(self):
+        write_entries(self.data, 'expected', self.expected_path)
+        with open(self.csv_path, 'rb') as f, open(self.expected_path, 'rb') as g:
+            self.assertEqual(f.read(), g.read())
+
+    def test_splices_added_modified_and_deleted_rows(self):
+        changes = EntryChanges()
+        self.data['1003']['name'] = 'Renamed Fund'
+        changes.update('1003')
+        for code in ['1000', '1004', '3000']:
+            self.data[code] = make_entry(f'New {code}')
+            changes.update(code, existing=False)
+        del self.data['1005']
+        changes.delete('1005')
+        write_changed_entries(self.data, changes, 'test', self.csv_path)
+        self.assert_same_as_full_write()
+        self.assertEqual(get_mf_entries(self.csv_path), self.data)
+        self.assertFalse([f for f in os.listdir(self.temp_dir) if f.endswith('.tmp')])
+
+    def test_batched_changes_flush_once(self):
+        changes = EntryChanges()
+        for code in ['1001', '1003']:
+            self.data[code]['fund_house'] = 'AMC'
+            changes.update(code)
+        self.data['1002'] = make_entry('Added then removed')
+        changes.update('1002', existing=False)
+        del self.data['1002']
+        changes.delete('1002')
+        self.assertEqual((changes.added, changes.modified, changes.deleted), (set(), {'1001', '1003'}, set()))
+        with patch('helpers.mf_entry.write_changed_entries', wraps=mf_entry.write_changed_entries) as write:
+            changes.flush(self.data, 'test', self.csv_path)
+            changes.flush(self.data, 'test', self.csv_path)
+        self.assertEqual(write.call_count, 1)
+        self.assert_same_as_full_write()
+
+
+class TestIsinIndex(unittest.TestCase):
+    def test_maps_isin_and_isin2_to_code(self):
+        index = IsinIndex({
+            '100001': {'isin': 'INF000000011', 'isin2': 'INF000000029'},
+        })
+        self.assertEqual(index.get_codes('INF000000011'), ['100001'])
+        self.assertEqual(index.get_codes('INF000000029'), ['100001'])
+        self.assertEqual(index.get_codes('INF000000037'), [])
+
+    def test_ignores_blank_and_dash_isins(self):
+        index = IsinIndex({'100001': {'isin': '-', 'isin2': ''}})
+        self.assertEqual(len(index), 0)
+        self.assertNotIn('-', index)
+
+    def test_isin_shared_by_several_codes_keeps_insertion_order(self):
+        index = IsinIndex({
+            '200002': {'isin': 'INF000000011', 'isin2': ''},
+            '100001': {'isin': '', 'isin2': 'INF000000011'},
+        })
+        self.assertEqual(index.get_codes('INF000000011'), ['200002', '100001'])
+        self.assertEqual(index.get_first_code('INF000000011'), '200002')
+
+    def test_add_replaces_stale_isins(self):
+        index = IsinIndex({'100001': {'isin': 'INF000000011', 'isin2': ''}})
+        index.add('100001', {'isin': 'INF000000029', 'isin2': ''})
+        self.assertNotIn('INF000000011', index)
+        self.assertEqual(index.get_first_code('INF000000029'), '100001')
+
+    def test_remove_drops_code(self):
+        index = IsinIndex({
+            '100001': {'isin': 'INF000000011', 'isin2': ''},
+            '100002': {'isin': 'INF000000011', 'isin2': ''},
+        })
+        index.remove('100001')
+        self.assertEqual(index.get_codes('INF000000011'), ['100002'])
+        index.remove('100002')
+        self.assertIsNone(index.get_first_code('INF000000011'))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,7 +1,13 @@
+import asyncio
 import unittest
+import httpx
 import requests
 import sys
 import os
+import json
+import tempfile
+import time
+from unittest.mock import patch
 
 # Add parent directory to path to import helpers
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -287,6 +293,140 @@ class TestFundHouseNameChangeReset(unittest.TestCase):
         self.assertEqual(current_data['1']['kuvera_code'], '')
 
 
+def make_offline_kuvera():
+    kuvera = Kuvera.__new__(Kuvera)
+    kuvera.fund_schemes = {
+        'Equity': {
+            'Large Cap Fund': {'HDFC Mutual Fund': {'K1': {}, 'K2': {}}},
+            'Value Fund': {'HDFC Mutual Fund': {'K2': {}, 'K3': {}}},
+        },
+    }
+    kuvera.reset_lookups()
+    return kuvera
+
+
+def fake_enrich(fetched):
+    def run(items, worker, on_result, max_in_flight=None, on_error=None):
+        for code, _ in items:
+            fetched.append(code)
+            on_result(code, {'name': f'Fund {code} Direct', 'isin': f'INF{code}',
+                             'fund_category': 'Large Cap Fund', 'kuvera_code': code})
+    return run
+
+
+class TestResolveIsinMapping(unittest.TestCase):
+    """Tests for the bulk ISIN to Kuvera code map, without network"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'kuvera_isin_map.json')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_get_all_codes_dedupes_across_buckets(self):
+        self.assertEqual(make_offline_kuvera().get_all_codes(), ['K1', 'K2', 'K3'])
+
+    def test_resolve_fetches_each_code_once_and_persists(self):
+        fetched = list()
+        kuvera = make_offline_kuvera()
+        with patch('helpers.mf_kuvera.enrich', fake_enrich(fetched)):
+            self.assertEqual(kuvera.resolve_isin_mapping(path=self.path), 3)
+        self.assertEqual(fetched, ['K1', 'K2', 'K3'])
+        self.assertTrue(kuvera.isin_mapping_resolved)
+        self.assertEqual(kuvera.get_known_isin_mapping()['INFK2']['kuvera_code'], 'K2')
+        with open(self.path) as f:
+            saved = json.load(f)
+        self.assertEqual(sorted(saved['schemes']), ['K1', 'K2', 'K3'])
+        self.assertIn('resolved_at', saved['schemes']['K1'])
+
+    def test_resolve_reuses_fresh_entries_and_refetches_stale(self):
+        fetched = list()
+        with patch('helpers.mf_kuvera.enrich', fake_enrich(fetched)):
+            make_offline_kuvera().resolve_isin_mapping(path=self.path)
+            resolved = Kuvera.load_isin_map(self.path)
+            resolved['K3']['resolved_at'] = time.time() - 30 * 24 * 60 * 60
+            Kuvera.save_isin_map(resolved, self.path)
+            del fetched[:]
+            kuvera = make_offline_kuvera()
+            self.assertEqual(kuvera.resolve_isin_mapping(path=self.path), 1)
+        self.assertEqual(fetched, ['K3'])
+        self.assertEqual(len(kuvera.get_known_isin_mapping()), 3)
+
+    def test_get_fund_info_is_a_lookup_once_resolved(self):
+        kuvera = make_offline_kuvera()
+        with patch('helpers.mf_kuvera.enrich', fake_enrich(list())):
+            kuvera.resolve_isin_mapping(path=self.path)
+        with patch.object(Kuvera, 'get_scheme_info') as get_scheme_info, \
+                patch.object(Kuvera, 'find_probable_fund_name', return_value=[]) as find_probable:
+            info = kuvera.get_fund_info('Fund K1 Direct', 'INFK1', 'Equity', 'Large Cap Fund', 'HDFC Mutual Fund')
+            self.assertEqual(info['kuvera_code'], 'K1')
+            missing = kuvera.get_fund_info('Other Direct', 'INFX', 'Equity', 'Large Cap Fund', 'HDFC Mutual Fund')
+        self.assertIsNone(missing)
+        get_scheme_info.assert_not_called()
+        find_probable.assert_called_once_with('Other Direct')
+
+    def test_lookups_are_memoized_across_funds(self):
+        kuvera = make_offline_kuvera()
+        scheme_info = {'name': 'Fund K2 Direct', 'isin': 'INFK2', 'fund_category': 'Value Fund', 'kuvera_code': 'K2'}
+        with patch.object(Kuvera, 'get_scheme_info', side_effect=lambda code: dict(scheme_info, kuvera_code=code)) as get_scheme_info, \
+                patch.object(Kuvera, 'find_probable_fund_name', return_value=[]) as find_probable:
+            for _ in range(3):
+                kuvera.get_fund_info('Other Direct', 'INFX', 'Equity', 'Large Cap Fund', 'HDFC Mutual Fund')
+        self.assertEqual(get_scheme_info.call_count, 2)
+        find_probable.assert_called_once_with('Other Direct')
+        stats = kuvera.get_lookup_stats()
+        self.assertEqual(stats['scheme_info']['misses'], 2)
+        self.assertEqual(stats['scheme_info']['hits'], 4)
+        self.assertEqual(stats['probable_fund_name']['hits'], 2)
+
+    def test_failed_resolve_falls_back_to_bucket_scan(self):
+        kuvera = make_offline_kuvera()
+        # K1's fetch fails, K3 has no info
+        resolve_results = {'K2': {'name': 'Fund K2 Direct', 'isin': 'INFK2'}, 'K3': None}
+
+        async def get_scheme_info_async(fetcher, code):
+            if code not in resolve_results:
+                raise httpx.ConnectError('unreachable')
+            return resolve_results[code]
+
+        async def run_fetches(items, worker, on_result, on_error):
+            for code, item in items:
+                try:
+                    result = await worker(None, code, item)
+                except httpx.ConnectError as ex:
+                    on_error(code, ex)
+                    continue
+                on_result(code, result)
+
+        def run(items, worker, on_result, max_in_flight=None, on_error=None):
+            asyncio.run(run_fetches(items, worker, on_result, on_error))
+
+        with patch('helpers.mf_kuvera.enrich', run), \
+                patch.object(Kuvera, 'get_scheme_info_async', side_effect=get_scheme_info_async):
+            kuvera.resolve_isin_mapping(path=self.path)
+        self.assertFalse(kuvera.isin_mapping_resolved)
+        scheme_info = {'name': 'Fund K1 Direct', 'isin': 'INFK1', 'fund_category': 'Large Cap Fund', 'kuvera_code': 'K1'}
+        with patch.object(Kuvera, 'get_scheme_info', return_value=scheme_info) as get_scheme_info, \
+                patch.object(Kuvera, 'find_probable_fund_name', return_value=[]):
+            info = kuvera.get_fund_info('Fund K1 Direct', 'INFK1', 'Equity', 'Large Cap Fund', 'HDFC Mutual Fund')
+        self.assertEqual(info['kuvera_code'], 'K1')
+        get_scheme_info.assert_called_once_with('K1')
+        self.assertIsNone(Kuvera.load_isin_map(self.path)['K3']['scheme_info'])
+        self.assertNotIn('K1', Kuvera.load_isin_map(self.path))
+
+    def test_failed_request_raises_from_get_fund_info_async(self):
+        kuvera = make_offline_kuvera()
+
+        async def unreachable(fetcher, code):
+            raise httpx.ConnectError('unreachable')
+
+        with patch.object(Kuvera, 'get_scheme_info_async', side_effect=unreachable):
+            with self.assertRaises(httpx.ConnectError):
+                asyncio.run(kuvera.get_fund_info_async(None, 'Fund K1 Direct', 'INFK1', 'Equity',
+                                                       'Large Cap Fund', 'HDFC Mutual Fund'))
+
+
 class TestIntegration(unittest.TestCase):
     """Integration tests with actual API calls"""
     
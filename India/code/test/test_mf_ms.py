@@ -0,0 +1,95 @@
+import os
+import sys
+import unittest
+from unittest.mock import patch, ANY
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers.mf_entry import get_new_entry, IsinIndex
+from helpers.mf_ms import update_ms_details_category, blend_mapping, fetch_ms_pages
+
+
+def make_entry(isin='', isin2=''):
+    entry = get_new_entry()
+    entry['isin'] = isin
+    entry['isin2'] = isin2
+    return entry
+
+
+def ms_row(isin, sec_id, name, style=None):
+    row = {'ISIN': isin, 'SecId': sec_id, 'LegalName': name, 'Name': name}
+    if style:
+        row['EquityStyleBox'] = style
+    return row
+
+
+class TestUpdateMsDetailsCategory(unittest.TestCase):
+    def test_updates_entries_matched_by_isin_or_isin2(self):
+        data = {
+            '100001': make_entry(isin='INF000000011'),
+            '100002': make_entry(isin2='INF000000029'),
+            '100003': make_entry(isin='INF000000037'),
+        }
+        page = {
+            'total': 2,
+            'pageSize': 50,
+            'rows': [
+                ms_row('INF000000011', 'F0001', 'Fund One', style=3),
+                [ms_row('INF000000029', 'F0002', 'Fund Two')],
+                ms_row('INF999999999', 'F0009', 'Unknown Fund'),
+                {'SecId': 'F0010'},
+            ],
+        }
+        with patch('helpers.mf_ms.get_json', return_value=page) as get_json_mock:
+            added, modified = update_ms_details_category(
+                'INCA000001', 'Large-Cap', IsinIndex(data), data, blend_mapping())
+
+        get_json_mock.assert_called_once_with(1, 'INCA000001', ANY)
+        self.assertEqual((added, modified), (0, 2))
+        self.assertEqual(data['100001']['ms_id'], 'F0001')
+        self.assertEqual(data['100001']['ms_investment_style'], 'Large Growth')
+        self.assertEqual(data['100002']['ms_name'], 'Fund Two')
+        self.assertEqual(data['100002']['ms_category'], 'Large-Cap')
+        self.assertEqual(data['100003']['ms_id'], '')
+
+    def test_unchanged_entry_is_not_counted(self):
+        data = {'100001': make_entry(isin='INF000000011')}
+        data['100001'].update({'ms_name': 'Fund One', 'ms_category': 'Large-Cap', 'ms_id': 'F0001'})
+        page = {'total': 1, 'pageSize': 50, 'rows': [ms_row('INF000000011', 'F0001', 'Fund One')]}
+        with patch('helpers.mf_ms.get_json', return_value=page):
+            added, modified = update_ms_details_category(
+                'INCA000001', 'Large-Cap', IsinIndex(data), data, blend_mapping())
+        self.assertEqual((added, modified), (0, 0))
+
+    def test_shared_isin_updates_first_code_only(self):
+        data = {
+            '100001': make_entry(isin='INF000000011'),
+            '100002': make_entry(isin2='INF000000011'),
+        }
+        page = {'total': 1, 'pageSize': 50, 'rows': [ms_row('INF000000011', 'F0001', 'Fund One')]}
+        with patch('helpers.mf_ms.get_json', return_value=page):
+            update_ms_details_category('INCA000001', 'Large-Cap', IsinIndex(data), data, blend_mapping())
+        self.assertEqual(data['100001']['ms_id'], 'F0001')
+        self.assertEqual(data['100002']['ms_id'], '')
+
+
+class TestFetchMsPages(unittest.TestCase):
+    def test_yields_all_pages_in_category_then_page_order(self):
+        totals = {'CAT1': 120, 'CAT2': 10}
+
+        def fake_get_json(page, category, session=None):
+            return {'total': totals[category], 'pageSize': 50, 'page': page, 'rows': []}
+
+        with patch('helpers.mf_ms.get_json', side_effect=fake_get_json):
+            pages = [(cat, page, res['page']) for cat, page, res in fetch_ms_pages(['CAT1', 'CAT2'], session=object())]
+
+        self.assertEqual(pages, [('CAT1', 1, 1), ('CAT1', 2, 2), ('CAT1', 3, 3), ('CAT2', 1, 1)])
+
+    def test_failed_first_page_is_yielded_as_none(self):
+        with patch('helpers.mf_ms.get_json', return_value=None):
+            pages = list(fetch_ms_pages(['CAT1'], session=object()))
+        self.assertEqual(pages, [('CAT1', 1, None)])
+
+
+if __name__ == '__main__':
+    unittest.main()
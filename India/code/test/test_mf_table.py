@@ -0,0 +1,107 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers.mf_entry import get_mf_entries, get_new_entry, write_entries, find_malformed_rows, MF_CSV_FIELDS
+from helpers.mf_amfi import check_amfi_entry_complete
+from helpers.mf_kuvera import Kuvera
+from helpers.mf_table import MFTable
+
+
+def make_entry(**fields):
+    entry = get_new_entry()
+    entry.update(fields)
+    return entry
+
+
+COMPLETE_AMFI = dict(name='Fund A', isin='INF000000001', fund_house='AMC', inception_date='01-01-2020',
+                     amfi_fund_type='Equity Scheme', amfi_category='Large Cap Fund')
+
+
+class TestMFTable(unittest.TestCase):
+    def setUp(self):
+        self.data = {
+            '100': make_entry(**COMPLETE_AMFI),
+            '101': make_entry(**dict(COMPLETE_AMFI, isin='', isin2='')),
+            '102': make_entry(**dict(COMPLETE_AMFI, isin='', isin2='INF000000002', kuvera_name='K',
+                                     kuvera_fund_category='Large Cap Fund', kuvera_code='K1')),
+            '103': make_entry(**dict(COMPLETE_AMFI, inception_date='', amfi_fund_type='Income', end_date='01-01-2021')),
+        }
+
+    def test_round_trip_entries(self):
+        table = MFTable.from_entries(self.data)
+        self.assertEqual(table.to_entries(), self.data)
+        self.assertEqual(str(table.df['fund_house'].dtype), 'category')
+
+    def test_masks_match_entry_checks(self):
+        table = MFTable.from_entries(self.data)
+        self.assertEqual(table.codes(table.amfi_complete_mask()),
+                         [c for c, d in self.data.items() if check_amfi_entry_complete(d)])
+        self.assertEqual(table.codes(table.kuvera_complete_mask()),
+                         [c for c, d in self.data.items() if Kuvera.check_kuvera_entry_complete(d)])
+        self.assertEqual(table.codes(table.kuvera_skip_mask()),
+                         [c for c, d in self.data.items() if Kuvera.check_kuvera_skip_entry(d)])
+
+    def test_masks_match_entry_checks_on_mf_csv(self):
+        data = get_mf_entries()
+        table = MFTable.read_csv()
+        self.assertEqual(len(table), len(data))
+        self.assertEqual(table.codes(table.amfi_complete_mask()),
+                         [c for c, d in data.items() if check_amfi_entry_complete(d)])
+        self.assertEqual(table.codes(table.kuvera_complete_mask()),
+                         [c for c, d in data.items() if Kuvera.check_kuvera_entry_complete(d)])
+
+    def test_diff(self):
+        old = MFTable.from_entries(self.data)
+        new_data = {code: dict(entry) for code, entry in self.data.items() if code != '101'}
+        new_data['100']['fund_house'] = 'Other AMC'
+        new_data['102']['name'] = 'Fund B'
+        new_data['102']['fund_house'] = 'Other AMC'
+        new_data['104'] = make_entry(name='New')
+        diff = MFTable.from_entries(new_data).diff(old)
+        self.assertTrue(diff)
+        self.assertEqual(diff.added, ['104'])
+        self.assertEqual(diff.removed, ['101'])
+        self.assertEqual(diff.changed_codes(), ['100', '102'])
+        self.assertEqual(diff.field_change_counts()['fund_house'], 2)
+        self.assertEqual(diff.changed_codes_by_field()['name'], ['102'])
+        self.assertEqual(diff.get_field_changes('102'),
+                         [('name', self.data['102']['name'], 'Fund B'),
+                          ('fund_house', self.data['102']['fund_house'], 'Other AMC')])
+        self.assertEqual(diff.old.get_entry('101'), self.data['101'])
+        self.assertFalse(old.diff(MFTable.from_entries(self.data)))
+
+    def test_read_csv_matches_written_entries(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            csv_file = os.path.join(temp_dir, 'mf.csv')
+            write_entries(self.data, 'test', csv_file)
+            self.assertEqual(MFTable.read_csv(csv_file).to_entries(), get_mf_entries(csv_file))
+        finally:
+            shutil.rmtree(temp_dir)
+
+    def test_read_csv_rejects_malformed_rows(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            csv_file = os.path.join(temp_dir, 'mf.csv')
+            write_entries(self.data, 'test', csv_file)
+            with open(csv_file, 'a') as f:
+                f.write('201,Fund, Growth,INF000000201,,AMC' + ',' * (len(MF_CSV_FIELDS) - 6) + '\n')
+                f.write('202,Short\n')
+                f.write('\n')
+                f.write('203,Fund C,not an isin' + ',' * (len(MF_CSV_FIELDS) - 3) + '\n')
+                f.write('204,Fund D,-' + ',' * (len(MF_CSV_FIELDS) - 3) + '\n')
+            lines = ', '.join(str(lineno) for lineno, _ in find_malformed_rows(csv_file))
+            self.assertEqual(lines, ', '.join(str(len(self.data) + i) for i in [2, 3, 4, 5]))
+            with self.assertRaisesRegex(ValueError, f'4 malformed row\\(s\\) at line\\(s\\) {lines}$'):
+                MFTable.read_csv(csv_file)
+        finally:
+            shutil.rmtree(temp_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
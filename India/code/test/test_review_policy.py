@@ -0,0 +1,122 @@
+import json
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from helpers.mf_entry import get_mf_entries, get_new_entry, write_entries
+from helpers.review_policy import (ReviewPolicy, save_deferred_changes, apply_change_file, load_change_file,
+                                   ACCEPT, REJECT, DEFER)
+from update_mf import review_data_changes
+
+
+def make_entry(**fields):
+    entry = get_new_entry()
+    entry.update(fields)
+    return entry
+
+
+class TestReviewPolicy(unittest.TestCase):
+    def setUp(self):
+        self.original = {
+            '1': make_entry(name='Fund A', fund_house='AMC'),
+            '2': make_entry(name='Fund B', fund_house='AMC', kuvera_code='K2'),
+        }
+        self.updated = {
+            '1': make_entry(name='Fund A Renamed', fund_house='AMC', end_date='01-01-2024'),
+            '2': make_entry(name='Fund B', fund_house='AMC', kuvera_code=''),
+            '3': make_entry(name='New Fund - Direct Plan'),
+        }
+
+    def test_default_rules_accept_blank_fields_being_filled(self):
+        reviewed, deferred = ReviewPolicy().review(self.original, self.updated)
+        self.assertEqual(reviewed['1']['end_date'], '01-01-2024')
+        self.assertEqual(reviewed['1']['name'], 'Fund A')
+        self.assertEqual(reviewed['2']['kuvera_code'], 'K2')
+        self.assertNotIn('3', reviewed)
+        self.assertEqual(sorted((d['code'], d['change'], d.get('field')) for d in deferred),
+                         [('1', 'value_change', 'name'), ('2', 'value_to_blank', 'kuvera_code'), ('3', 'new_entry', None)])
+
+    def test_first_matching_rule_wins(self):
+        policy = ReviewPolicy([
+            {'action': ACCEPT, 'change': 'new_entry', 'match': 'Direct'},
+            {'action': REJECT, 'fields': ['kuvera_code']},
+            {'action': ACCEPT, 'fields': ['name'], 'old_match': '^Fund A$'},
+            {'action': REJECT},
+        ])
+        reviewed, deferred = policy.review(self.original, self.updated)
+        self.assertEqual(deferred, [])
+        self.assertEqual(reviewed['1']['name'], 'Fund A Renamed')
+        self.assertEqual(reviewed['1']['end_date'], '')
+        self.assertEqual(reviewed['2']['kuvera_code'], 'K2')
+        self.assertIn('3', reviewed)
+
+    def test_unknown_action_is_an_error(self):
+        with self.assertRaises(ValueError):
+            ReviewPolicy([{'action': 'maybe'}])
+
+    def test_review_data_changes_does_not_prompt_with_policy(self):
+        with patch('builtins.input', side_effect=AssertionError('prompted')), \
+             patch('update_mf.write_entries') as write_mock, \
+             patch('update_mf.save_deferred_changes') as save_mock:
+            result = review_data_changes(self.original, self.updated, 'test-phase', ReviewPolicy())
+        write_mock.assert_called_once()
+        self.assertEqual(len(save_mock.call_args[0][0]), 3)
+        self.assertEqual(result['1']['end_date'], '01-01-2024')
+
+
+class TestChangeFile(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.csv_file = os.path.join(self.temp_dir, 'mf.csv')
+        self.changes_file = os.path.join(self.temp_dir, 'changes.json')
+        self.original = {
+            '1': make_entry(name='Fund A', fund_house='AMC'),
+            '2': make_entry(name='Fund B', fund_house='AMC', kuvera_code='K2'),
+        }
+        write_entries(self.original, 'setup', self.csv_file)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_decided_changes_are_applied_in_bulk(self):
+        updated = {
+            '1': make_entry(name='Fund A Renamed', fund_house='AMC'),
+            '2': make_entry(name='Fund B', fund_house='Other AMC', kuvera_code=''),
+            '3': make_entry(name='New Fund'),
+        }
+        _, deferred = ReviewPolicy().review(self.original, updated)
+        save_deferred_changes(deferred, 'test-phase', self.changes_file)
+        content = load_change_file(self.changes_file)
+        self.assertEqual(len(content['changes']), 4)
+        for item in content['changes']:
+            if item['code'] in ('1', '3'):
+                item['action'] = ACCEPT
+            elif item.get('field') == 'kuvera_code':
+                item['action'] = REJECT
+        with open(self.changes_file, 'w') as f:
+            json.dump(content, f)
+
+        self.assertEqual(apply_change_file(self.changes_file, self.csv_file), 2)
+        data = get_mf_entries(self.csv_file)
+        self.assertEqual(data['1']['name'], 'Fund A Renamed')
+        self.assertEqual(data['3']['name'], 'New Fund')
+        self.assertEqual(data['2']['kuvera_code'], 'K2')
+        remaining = load_change_file(self.changes_file)['changes']
+        self.assertEqual([(item['code'], item['field'], item['action']) for item in remaining],
+                         [('2', 'fund_house', DEFER)])
+
+    def test_change_to_a_field_edited_since_is_kept_for_review(self):
+        save_deferred_changes([{'code': '1', 'change': 'value_change', 'field': 'name',
+                                'old': 'Fund Z', 'new': 'Fund Y', 'action': ACCEPT}], 'test', self.changes_file)
+        self.assertEqual(apply_change_file(self.changes_file, self.csv_file), 0)
+        self.assertEqual(get_mf_entries(self.csv_file)['1']['name'], 'Fund A')
+        self.assertEqual(len(load_change_file(self.changes_file)['changes']), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
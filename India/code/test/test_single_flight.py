@@ -0,0 +1,114 @@
+import asyncio
+import sys
+import os
+import threading
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from helpers.single_flight import SingleFlight
+
+
+async def none_async(key):
+    return None
+
+
+class TestSingleFlight(unittest.TestCase):
+
+    def test_memoizes_results(self):
+        memo = SingleFlight()
+        calls = list()
+        def fn(key):
+            calls.append(key)
+            return key.upper()
+        self.assertEqual(memo.get('a', fn), 'A')
+        self.assertEqual(memo.get('a', fn), 'A')
+        self.assertEqual(memo.get('b', fn), 'B')
+        self.assertEqual(calls, ['a', 'b'])
+        self.assertEqual(memo.stats(), {'hits': 1, 'misses': 2, 'coalesced': 0})
+
+    def test_put_seeds_memo(self):
+        memo = SingleFlight()
+        memo.put('a', None)
+        self.assertIsNone(memo.get('a', lambda key: self.fail('should not be called')))
+
+    def test_concurrent_threads_share_one_call(self):
+        memo = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        calls = list()
+        def fn(key):
+            calls.append(key)
+            started.set()
+            release.wait(5)
+            return 42
+        results = list()
+        threads = [threading.Thread(target=lambda: results.append(memo.get('a', fn))) for _ in range(5)]
+        threads[0].start()
+        started.wait(5)
+        for t in threads[1:]:
+            t.start()
+        # wait for the followers to register before letting the call finish
+        while memo.stats()['coalesced'] < 4:
+            threading.Event().wait(0.01)
+        release.set()
+        for t in threads:
+            t.join()
+        self.assertEqual(calls, ['a'])
+        self.assertEqual(results, [42] * 5)
+
+    def test_exception_is_not_memoized(self):
+        memo = SingleFlight()
+        def fail(key):
+            raise ValueError(key)
+        with self.assertRaises(ValueError):
+            memo.get('a', fail)
+        self.assertEqual(memo.get('a', lambda key: 1), 1)
+
+    def test_none_is_memoized(self):
+        memo = SingleFlight()
+        self.assertIsNone(memo.get('a', lambda key: None))
+        self.assertIsNone(memo.get('a', lambda key: 1))
+        self.assertIsNone(asyncio.run(memo.get_async('b', none_async)))
+        self.assertIsNone(memo.get('b', lambda key: 3))
+
+    def test_concurrent_tasks_share_one_call(self):
+        memo = SingleFlight()
+        calls = list()
+        async def fn(key):
+            calls.append(key)
+            await asyncio.sleep(0.01)
+            return key * 2
+        async def run():
+            return await asyncio.gather(*[memo.get_async(3, fn) for _ in range(10)])
+        self.assertEqual(asyncio.run(run()), [6] * 10)
+        self.assertEqual(calls, [3])
+        self.assertEqual(memo.stats(), {'hits': 0, 'misses': 1, 'coalesced': 9})
+
+    def test_async_exception_reaches_waiters(self):
+        memo = SingleFlight()
+        async def fail(key):
+            await asyncio.sleep(0.01)
+            raise ValueError(key)
+        async def run():
+            return await asyncio.gather(*[memo.get_async('a', fail) for _ in range(3)], return_exceptions=True)
+        results = asyncio.run(run())
+        self.assertTrue(all(isinstance(r, ValueError) for r in results))
+
+    def test_async_cancel_reaches_waiters(self):
+        memo = SingleFlight()
+        async def slow(key):
+            await asyncio.sleep(10)
+        async def run():
+            leader = asyncio.create_task(memo.get_async('a', slow))
+            await asyncio.sleep(0)
+            waiter = asyncio.create_task(memo.get_async('a', slow))
+            await asyncio.sleep(0)
+            leader.cancel()
+            return await asyncio.wait_for(asyncio.gather(leader, waiter, return_exceptions=True), 1)
+        results = asyncio.run(run())
+        self.assertTrue(all(isinstance(r, asyncio.CancelledError) for r in results))
+        self.assertEqual(asyncio.run(memo.get_async('a', none_async)), None)
+
+
+if __name__ == '__main__':
+    unittest.main()
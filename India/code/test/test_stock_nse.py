@@ -0,0 +1,112 @@
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch, MagicMock
+import requests
+
+# Add parent directory to path to import helpers
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from helpers.stock_nse import (NseHttpSource, NseLocalSource, fetch_nse_files, update_nse,
+                               NSE_EQ_FILE, NSE_CAP_FILES)
+
+
+EQUITY_L = '\ufeffSYMBOL,NAME OF COMPANY, SERIES, DATE OF LISTING, PAID UP VALUE, MARKET LOT, ISIN NUMBER, FACE VALUE\n' \
+           'ABC,ABC Limited,EQ,01-JAN-2000,10,1,INE000A01011,10\n' \
+           'XYZ,XYZ Limited,EQ,02-FEB-2002,5,1,INE000B01011,5\n' \
+           'NOISIN,No ISIN Limited,EQ,03-MAR-2003,1,1,NA,1\n'
+
+
+def cap_file(*rows):
+    lines = ['Company Name,Industry,Symbol,Series,ISIN Code']
+    lines += [f'{symbol} Limited,{industry},{symbol},EQ,{isin}' for isin, symbol, industry in rows]
+    return '\n'.join(lines) + '\n'
+
+
+CAP_FILES = {
+    'Large': cap_file(('INE000A01011', 'ABC', 'Chemicals')),
+    'Mid': cap_file(('INE000B01011', 'XYZ', 'Banks')),
+    'Small': cap_file(('INE000Z01011', 'GONE', 'Textiles')),
+    'Micro': cap_file(),
+}
+
+
+class TestNseSources(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.fixture_dir = os.path.join(self.temp_dir, 'fixtures')
+        os.makedirs(self.fixture_dir)
+        with open(os.path.join(self.fixture_dir, NSE_EQ_FILE[1]), 'w', encoding='utf-8') as f:
+            f.write(EQUITY_L)
+        for cap, (_, file_name) in NSE_CAP_FILES.items():
+            with open(os.path.join(self.fixture_dir, file_name), 'w', encoding='utf-8') as f:
+                f.write(CAP_FILES[cap])
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_fetch_from_local_files(self):
+        eq_text, cap_texts = fetch_nse_files(NseLocalSource(self.fixture_dir))
+        self.assertTrue(eq_text.startswith('SYMBOL,'))
+        self.assertEqual(cap_texts, CAP_FILES)
+
+    def test_fetch_over_http(self):
+        contents = {NSE_EQ_FILE[0]: EQUITY_L}
+        contents.update({url: CAP_FILES[cap] for cap, (url, _) in NSE_CAP_FILES.items()})
+        client = MagicMock()
+        client.get.side_effect = lambda url, **kwargs: MagicMock(status_code=200, content=contents[url].encode('utf-8'),
+                                                                 headers={'Content-Type': 'text/csv'})
+        eq_text, cap_texts = fetch_nse_files(NseHttpSource(client))
+        self.assertEqual(eq_text, EQUITY_L[1:])
+        self.assertEqual(cap_texts, CAP_FILES)
+        self.assertEqual(client.get.call_count, 5)
+        self.assertNotIn('Host', client.get.call_args.kwargs['headers'])
+
+    def test_http_error_status_raises(self):
+        client = MagicMock()
+        client.get.return_value = MagicMock(status_code=403, content=b'')
+        with self.assertRaises(requests.HTTPError):
+            NseHttpSource(client).read(*NSE_EQ_FILE)
+
+    def test_html_block_page_raises(self):
+        client = MagicMock()
+        client.get.return_value = MagicMock(status_code=200, content=b'<html><body>Access Denied</body></html>',
+                                            headers={'Content-Type': 'text/html'})
+        with self.assertRaises(requests.RequestException):
+            NseHttpSource(client).read(*NSE_EQ_FILE)
+        client.get.return_value = MagicMock(status_code=200, content=b'<html><body>Access Denied</body></html>',
+                                            headers={})
+        with self.assertRaises(requests.RequestException):
+            NseHttpSource(client).read(*NSE_EQ_FILE)
+
+    def test_update_nse_from_local_files(self):
+        update_nse(self.temp_dir, True, True, source=NseLocalSource(self.fixture_dir))
+        with open(os.path.join(self.temp_dir, 'nse_bse_eq.json')) as f:
+            stocks = json.load(f)
+        self.assertEqual(sorted(stocks.keys()), ['INE000A01011', 'INE000B01011'])
+        self.assertEqual(stocks['INE000A01011']['nse_symbol'], 'ABC')
+        self.assertEqual(stocks['INE000A01011']['cap'], 'Large-Cap')
+        self.assertEqual(stocks['INE000B01011']['industry'], 'Banks')
+        self.assertEqual(stocks['INE000B01011']['listing_date'], '02-FEB-2002')
+
+    def test_update_nse_falls_back_to_browser(self):
+        with patch('helpers.stock_nse.NseHttpSource.read', side_effect=requests.ConnectionError('refused')), \
+             patch('helpers.stock_nse.NseBrowserSource', return_value=NseLocalSource(self.fixture_dir)) as browser:
+            update_nse(self.temp_dir, True, True)
+        browser.assert_called_once_with(self.temp_dir, True)
+        self.assertTrue(os.path.exists(os.path.join(self.temp_dir, 'nse_bse_eq.json')))
+
+
+    def test_update_nse_falls_back_to_browser_on_block_page(self):
+        client = MagicMock()
+        client.get.return_value = MagicMock(status_code=200, content=b'<html></html>', headers={'Content-Type': 'text/html'})
+        with patch('helpers.stock_nse.get_client', return_value=client), \
+             patch('helpers.stock_nse.NseBrowserSource', return_value=NseLocalSource(self.fixture_dir)) as browser:
+            update_nse(self.temp_dir, True, True)
+        browser.assert_called_once_with(self.temp_dir, True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import sys
+import json
+import unittest
+
+# Add parent directory to path to import helpers
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from helpers.symbol_index import SymbolIndex, split_symbols
+
+
+def make_entry(**fields):
+    entry = {'bse_security_code': '', 'bse_security_id': '', 'nse_symbol': '',
+             'old_bse_security_code': '', 'old_bse_security_id': '', 'old_nse_symbol': ''}
+    entry.update(fields)
+    return entry
+
+
+def scan(data, entry):
+    # the linear scan SymbolIndex.find replaces
+    for isin, d in data.items():
+        for field, old_field in [('bse_security_id', 'old_bse_security_id'), ('nse_symbol', 'old_nse_symbol')]:
+            value = entry[field].strip()
+            if value and (d[field].strip() == value or value in split_symbols(d[old_field])):
+                return isin
+    return None
+
+
+class TestSymbolIndex(unittest.TestCase):
+    def setUp(self):
+        self.data = {
+            'INE000A01011': make_entry(bse_security_code='500001', bse_security_id='ABC', nse_symbol='ABC'),
+            'INE000B01011': make_entry(bse_security_code='500002', bse_security_id='XYZ', nse_symbol='',
+                                       old_bse_security_id='OLDXYZ;XYZOLD', old_nse_symbol='XY,XYZN'),
+        }
+
+    def test_split_symbols(self):
+        self.assertEqual(split_symbols('A;B, C'), ['A', 'B', 'C'])
+        self.assertEqual(split_symbols(''), [])
+        self.assertEqual(split_symbols(None), [])
+
+    def test_find_current_and_old_symbols(self):
+        index = SymbolIndex(self.data)
+        self.assertEqual(index.find(make_entry(bse_security_id='ABC ')), 'INE000A01011')
+        self.assertEqual(index.find(make_entry(nse_symbol='XYZN')), 'INE000B01011')
+        self.assertEqual(index.find(make_entry(bse_security_id='XYZOLD')), 'INE000B01011')
+        # old symbols are matched whole, not as substrings
+        self.assertIsNone(index.find(make_entry(nse_symbol='YZN')))
+        self.assertIsNone(index.find(make_entry()))
+        self.assertIsNone(index.find(make_entry(bse_security_code='500002')))
+        self.assertEqual(index.find(make_entry(bse_security_code='500002'), fields=['bse_security_code']), 'INE000B01011')
+
+    def test_earliest_added_wins_and_add_replaces(self):
+        index = SymbolIndex(self.data)
+        index.add('INE000C01011', make_entry(bse_security_id='NEW', nse_symbol='ABC'))
+        self.assertEqual(index.find(make_entry(nse_symbol='ABC')), 'INE000A01011')
+        index.add('INE000A01011', make_entry(bse_security_id='ABC', nse_symbol='ABCNEW'))
+        self.assertEqual(index.find(make_entry(nse_symbol='ABC')), 'INE000C01011')
+        self.assertEqual(index.find(make_entry(nse_symbol='ABCNEW')), 'INE000A01011')
+        index.remove('INE000C01011')
+        self.assertIsNone(index.find(make_entry(nse_symbol='ABC')))
+
+    def test_find_all_current_symbols(self):
+        index = SymbolIndex(self.data, old_symbols=False)
+        index.add('INE000C01011', make_entry(bse_security_code='500002', nse_symbol='ABC'))
+        entry = make_entry(bse_security_id='XYZ', nse_symbol='ABC')
+        self.assertEqual(index.find_all(entry), ['INE000A01011', 'INE000B01011', 'INE000C01011'])
+        self.assertEqual(index.find_all(make_entry(bse_security_code='500002')), ['INE000B01011', 'INE000C01011'])
+        self.assertEqual(index.find_all(make_entry(nse_symbol='XYZN')), [])
+
+    def test_matches_scan_on_nse_bse_eq(self):
+        path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'nse_bse_eq.json')
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        index = SymbolIndex(data)
+        for entry in list(data.values())[::50]:
+            self.assertEqual(index.find(entry), scan(data, entry))
+
+
+if __name__ == '__main__':
+    unittest.main()
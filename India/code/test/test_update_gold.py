@@ -0,0 +1,193 @@
+import os
+import sys
+import json
+import shutil
+import datetime
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# Add parent directory to path to import update_gold
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from helpers.gold_html import parse_physical_gold_html, parse_digital_gold_html
+from helpers.gold_backfill import GoldBackfill, month_starts
+from helpers import atomic_io
+import update_gold
+
+
+# trimmed from gadgets360's gold rate page: a rate table under its heading,
+# plus an unrelated table of city rates
+PHYSICAL_GOLD_HTML = '''
+<html><body>
+<div>
+ <h2>Daily Gold Rate In India (10 grams)</h2>
+ <table>
+  <thead><tr><th>Date</th><th>Pure Gold (24K)</th><th>Standard Gold (22K)</th></tr></thead>
+  <tbody>
+   <tr><td>02 January 2025</td><td>&#8377; 78,100</td><td>&#8377; 71,600</td></tr>
+   <tr><td>01 January 2025</td><td>&#8377; 77,500</td><td>&#8377; 71,050</td></tr>
+   <tr><td>Not a date</td><td>&#8377; 1</td><td>&#8377; 1</td></tr>
+  </tbody>
+ </table>
+</div>
+<table><tr><th>City</th><th>24K</th></tr><tr><td>Delhi</td><td>&#8377; 78,250</td></tr></table>
+</body></html>
+'''
+
+# the digital gold page served without scripts: a Date/Price history table
+DIGITAL_GOLD_HTML = '''
+<html><body>
+<div>
+ <h2>Digital Gold Price for Last 10 Days</h2>
+ <table>
+  <tr><td>Date</td><td>Price</td></tr>
+  <tr><td>02 January 2025</td><td>&#8377; 7,950.12</td></tr>
+  <tr><td>01 January 2025</td><td>&#8377; 7,890.50</td></tr>
+  <tr></tr>
+ </table>
+</div>
+</body></html>
+'''
+
+# the digital gold page as a browser renders it: open/high/low/close columns
+RENDERED_DIGITAL_GOLD_HTML = '''
+<table>
+ <thead><tr><th>Date</th><th>Open Price</th><th>High Price</th><th>Close Price</th></tr></thead>
+ <tr><td>02 January 2025</td><td>&#8377; 7,900</td><td>&#8377; 7,990</td><td>&#8377; 7,950.12</td></tr>
+</table>
+'''
+
+JAN_1 = datetime.date(2025, 1, 1)
+JAN_2 = datetime.date(2025, 1, 2)
+
+
+class TestGoldHtml(unittest.TestCase):
+    def test_parse_physical_gold(self):
+        self.assertEqual(parse_physical_gold_html(PHYSICAL_GOLD_HTML),
+                         {JAN_2: {'24K': 7810.0, '22K': 7160.0}, JAN_1: {'24K': 7750.0, '22K': 7105.0}})
+
+    def test_parse_digital_gold(self):
+        self.assertEqual(parse_digital_gold_html(DIGITAL_GOLD_HTML), {JAN_2: 7950.12, JAN_1: 7890.50})
+        self.assertEqual(parse_digital_gold_html(RENDERED_DIGITAL_GOLD_HTML), {JAN_2: 7950.12})
+
+    def test_no_table(self):
+        for html in [None, '', '<html><body><p>Access denied</p></body></html>']:
+            self.assertEqual(parse_physical_gold_html(html), {})
+            self.assertEqual(parse_digital_gold_html(html), {})
+
+
+class TestGetGoldPrices(unittest.TestCase):
+    def test_browser_not_started_when_page_parses(self):
+        with patch('update_gold.get_page', return_value=PHYSICAL_GOLD_HTML), \
+             patch('update_gold.get_rendered_page') as rendered:
+            res = update_gold.get_latest_physical_gold_price()
+        self.assertEqual(len(res), 2)
+        rendered.assert_not_called()
+
+    def test_browser_fallback(self):
+        with patch('update_gold.get_page', return_value=None), \
+             patch('update_gold.get_rendered_page', return_value=RENDERED_DIGITAL_GOLD_HTML) as rendered:
+            res = update_gold.get_last_close_digital_gold_price()
+        self.assertEqual(res, {JAN_2: 7950.12})
+        rendered.assert_called_once_with(update_gold.DIGITAL_GOLD_URL)
+
+    def test_browser_failure_gives_no_prices(self):
+        with patch('update_gold.get_page', return_value=None), \
+             patch('update_gold.get_rendered_page', side_effect=RuntimeError('no chrome')):
+            self.assertEqual(update_gold.get_latest_physical_gold_price(), {})
+
+
+def write_year(gold_dir, year, prices):
+    with open(os.path.join(gold_dir, f'{year}.json'), 'w') as f:
+        json.dump({'date_format': 'dd/mm/yyyy', 'currency': 'INR', 'weight': 'gram', 'prices': prices}, f)
+
+
+def read_prices(gold_dir, year):
+    with open(os.path.join(gold_dir, f'{year}.json'), 'r') as f:
+        return json.load(f)['prices']
+
+
+def prices_for(days):
+    physical = {dt: {'24K': 8000.0 + dt.day, '22K': 7300.0 + dt.day} for dt in days}
+    digital = {dt: 8200.0 + dt.day for dt in days}
+    return physical, digital
+
+
+class TestGoldBackfill(unittest.TestCase):
+    def setUp(self):
+        self.gold_dir = tempfile.mkdtemp()
+        write_year(self.gold_dir, 2024, {
+            '01/10/2024': {'24K': 7700.0, '22K': 7050.0, 'digital': 7900.0},
+        })
+        write_year(self.gold_dir, 2025, {
+            '01/01/2025': {'24K': 7658.0, '22K': 7015.0, 'digital': 7916.76},
+            '06/03/2025': {'24K': 8300.0, '22K': 7600.0, 'digital': 8500.0},
+        })
+        with open(os.path.join(self.gold_dir, 'sgb_tranche.json'), 'w') as f:
+            json.dump({'tranches': []}, f)
+        self.today = datetime.date(2025, 4, 10)
+
+    def tearDown(self):
+        shutil.rmtree(self.gold_dir)
+
+    def fill(self, physical, digital):
+        backfill = GoldBackfill(self.gold_dir, today=self.today)
+        with patch('helpers.gold_backfill.write_json', wraps=atomic_io.write_json) as write:
+            written = backfill.fill(physical, digital)
+        return backfill, written, write
+
+    def test_month_starts(self):
+        self.assertEqual(month_starts(datetime.date(2024, 11, 20), datetime.date(2025, 2, 1)),
+                         [datetime.date(2024, 11, 1), datetime.date(2024, 12, 1),
+                          datetime.date(2025, 1, 1), datetime.date(2025, 2, 1)])
+
+    def test_missing_months(self):
+        backfill = GoldBackfill(self.gold_dir, today=self.today)
+        self.assertEqual(backfill.missing, [datetime.date(2024, 11, 1), datetime.date(2024, 12, 1),
+                                            datetime.date(2025, 2, 1), datetime.date(2025, 4, 1)])
+
+    def test_one_write_per_year_file(self):
+        physical, digital = prices_for([datetime.date(2024, 11, 1), datetime.date(2024, 12, 2),
+                                        datetime.date(2024, 12, 3), datetime.date(2025, 2, 1),
+                                        datetime.date(2025, 4, 1)])
+        # 1st of December only has a physical price
+        physical[datetime.date(2024, 12, 1)] = {'24K': 1.0, '22K': 1.0}
+        backfill, written, write = self.fill(physical, digital)
+        self.assertEqual(write.call_count, 2)
+        self.assertEqual(sorted(written), [os.path.join(self.gold_dir, '2024.json'), os.path.join(self.gold_dir, '2025.json')])
+        self.assertEqual(backfill.still_missing, [])
+        self.assertEqual(list(read_prices(self.gold_dir, 2024)), ['01/10/2024', '01/11/2024', '02/12/2024'])
+        self.assertEqual(list(read_prices(self.gold_dir, 2025)), ['01/01/2025', '01/02/2025', '06/03/2025', '01/04/2025'])
+        self.assertEqual(read_prices(self.gold_dir, 2025)['01/04/2025'], {'24K': 8001.0, '22K': 7301.0, 'digital': 8201.0})
+
+    def test_rerun_writes_nothing(self):
+        physical, digital = prices_for([datetime.date(2025, 2, 1), datetime.date(2025, 4, 1)])
+        self.fill(physical, digital)
+        backfill, written, write = self.fill(physical, digital)
+        write.assert_not_called()
+        self.assertEqual(written, [])
+        self.assertEqual(backfill.still_missing, [datetime.date(2024, 11, 1), datetime.date(2024, 12, 1)])
+
+    def test_new_year_file(self):
+        self.today = datetime.date(2026, 1, 5)
+        physical, digital = prices_for([datetime.date(2026, 1, 1), datetime.date(2026, 1, 2)])
+        backfill, written, write = self.fill(physical, digital)
+        self.assertEqual(written, [os.path.join(self.gold_dir, '2026.json')])
+        self.assertEqual(list(read_prices(self.gold_dir, 2026)), ['01/01/2026'])
+        self.assertIn(datetime.date(2025, 12, 1), backfill.still_missing)
+
+    def test_nothing_missing_skips_fetch(self):
+        self.today = datetime.date(2025, 1, 31)
+        write_year(self.gold_dir, 2024, {
+            '01/10/2024': {'24K': 7700.0, '22K': 7050.0, 'digital': 7900.0},
+            '01/11/2024': {'24K': 7700.0, '22K': 7050.0, 'digital': 7900.0},
+            '01/12/2024': {'24K': 7700.0, '22K': 7050.0, 'digital': 7900.0},
+        })
+        with patch('update_gold.GoldBackfill', lambda gold_dir: GoldBackfill(gold_dir, today=self.today)), \
+             patch('update_gold.fetch_gold_prices') as fetch:
+            update_gold.update_gold_price(self.gold_dir)
+        fetch.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
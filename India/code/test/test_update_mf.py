@@ -1,11 +1,16 @@
 import os
 import sys
+import io
+import shutil
+import subprocess
+import tempfile
 import unittest
 from unittest.mock import patch
 
 # Add parent directory to path to import update_mf
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from update_mf import review_data_changes
+from update_mf import review_data_changes, populate_amfi, diff_with_git_head, print_summary_of_changes
+from helpers.mf_entry import get_new_entry, get_mf_entries, write_entries
 from helpers.mf_check import update_single_code_in_csv
 
 
@@ -78,7 +83,7 @@ class TestReviewDataChanges(unittest.TestCase):
                  },
              ]), \
              patch('helpers.mf_kuvera.Kuvera') as kuvera_cls, \
-             patch('helpers.mf_check.write_entries') as write_mock:
+             patch('helpers.mf_check.EntryChanges.flush') as write_mock:
             kuvera_instance = kuvera_cls.return_value
             kuvera_instance.get_fund_info.return_value = {}
 
@@ -86,4 +91,118 @@ class TestReviewDataChanges(unittest.TestCase):
 
         self.assertIn('111', result)
         self.assertIn('222', result)
-        self.assertEqual(write_mock.call_count, 2)
+        # both codes are written together once all are fetched
+        self.assertEqual(write_mock.call_count, 1)
+
+
+class TestPopulateAmfiResume(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def make_data(self):
+        return {code: {'name': '', 'isin': 'INF000000001', 'isin2': '', 'fund_house': ''} for code in ['1', '2', '3']}
+
+    def fake_enrich(self, fetched, fail_after=None):
+        def run(items, worker, on_result, **kwargs):
+            for code, _ in items:
+                if fail_after is not None and len(fetched) == fail_after:
+                    raise RuntimeError('killed')
+                fetched.append(code)
+                on_result(code, {'name': f'Fund {code}'})
+        return run
+
+    def test_resume_skips_codes_fetched_before_interruption(self):
+        fetched = list()
+        with patch('helpers.atomic_io.JOURNAL_DIR', self.temp_dir), \
+             patch('helpers.atomic_io.CHECKPOINT_FLUSH_EVERY', 1), \
+             patch('update_mf.review_data_changes', side_effect=lambda original, updated, phase, policy=None: updated) as review:
+            with patch('update_mf.enrich', self.fake_enrich(fetched, fail_after=2)):
+                with self.assertRaises(RuntimeError):
+                    populate_amfi(self.make_data())
+            self.assertEqual(fetched, ['1', '2'])
+            with patch('update_mf.enrich', self.fake_enrich(fetched)):
+                result = populate_amfi(self.make_data(), resume=True)
+        self.assertEqual(fetched, ['1', '2', '3'])
+        self.assertEqual([result[code]['name'] for code in ['1', '2', '3']], ['Fund 1', 'Fund 2', 'Fund 3'])
+        review.assert_called_once()
+        # the phase finished, so nothing is left to resume
+        self.assertEqual(os.listdir(self.temp_dir), [])
+
+    def test_failed_fetch_is_not_checkpointed(self):
+        fetched = list()
+
+        def fail_then_kill(items, worker, on_result, on_error=None, **kwargs):
+            for code, _ in items:
+                fetched.append(code)
+                if code == '1':
+                    on_error(code, RuntimeError('connect error'))
+                elif code == '2':
+                    on_result(code, {'name': f'Fund {code}'})
+                else:
+                    raise RuntimeError('killed')
+
+        with patch('helpers.atomic_io.JOURNAL_DIR', self.temp_dir), \
+             patch('helpers.atomic_io.CHECKPOINT_FLUSH_EVERY', 1), \
+             patch('update_mf.review_data_changes', side_effect=lambda original, updated, phase, policy=None: updated):
+            with patch('update_mf.enrich', fail_then_kill):
+                with self.assertRaises(RuntimeError):
+                    populate_amfi(self.make_data())
+            with patch('update_mf.enrich', self.fake_enrich(fetched)):
+                result = populate_amfi(self.make_data(), resume=True)
+        self.assertEqual(fetched, ['1', '2', '3', '1', '3'])
+        self.assertEqual([result[code]['name'] for code in ['1', '2', '3']], ['Fund 1', 'Fund 2', 'Fund 3'])
+
+
+class TestDiffWithGitHead(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.csv_file = os.path.join(self.temp_dir, 'mf.csv')
+        self.git('init', '-q')
+        head = {code: self.make_entry(f'Fund {code}') for code in ['1', '2', '3']}
+        write_entries(head, 'test setup', self.csv_file)
+        self.git('add', 'mf.csv')
+        self.git('-c', 'user.name=test', '-c', 'user.email=test@example.com', 'commit', '-q', '-m', 'mf.csv')
+        work = dict(head)
+        del work['2']
+        work['3'] = self.make_entry('Fund 3, renamed')
+        work['4'] = self.make_entry('Fund 4')
+        write_entries(work, 'test setup', self.csv_file)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def git(self, *args):
+        subprocess.run(['git'] + list(args), cwd=self.temp_dir, check=True, stdout=subprocess.DEVNULL)
+
+    def make_entry(self, name):
+        entry = get_new_entry()
+        entry['name'] = name
+        return entry
+
+    def test_summary(self):
+        with patch('sys.stdout', new_callable=io.StringIO) as out:
+            print_summary_of_changes(self.csv_file)
+        summary = out.getvalue()
+        self.assertIn('Added entries: 1\n4\n', summary)
+        self.assertIn('Removed entries: 1\n2\n', summary)
+        self.assertIn('Entries changed: 1\n', summary)
+        self.assertIn('- name: 1\n', summary)
+
+    def test_rejecting_every_change_restores_head(self):
+        with patch('builtins.input', return_value='n'):
+            diff_with_git_head(self.csv_file)
+        data = get_mf_entries(self.csv_file)
+        # the new entry is dropped, the deletion is kept and the rename is reverted
+        self.assertEqual(sorted(data.keys()), ['1', '3'])
+        self.assertEqual(data['3']['name'], 'Fund 3')
+
+    def test_accepting_every_change_restores_deleted_entry(self):
+        with patch('builtins.input', return_value='y'):
+            diff_with_git_head(self.csv_file)
+        data = get_mf_entries(self.csv_file)
+        self.assertEqual(sorted(data.keys()), ['1', '2', '3', '4'])
+        self.assertEqual(data['2']['name'], 'Fund 2')
+        self.assertEqual(data['3']['name'], 'Fund 3, renamed')
@@ -4,11 +4,12 @@ import csv
 import tempfile
 import os
 import sys
-from pathlib import Path
+from unittest.mock import patch
 
 # Add parent directory to path to import helpers
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from helpers.verify_file_content import verify_json_file, verify_csv_file, main
+from helpers.verify_file_content import verify_json_file, verify_csv_file, main, verify_files, VerdictCache, get_content_hash
+from helpers import verify_file_content
 
 
 class TestVerifyJsonFile(unittest.TestCase):
@@ -272,7 +273,9 @@ class TestCliExitCode(unittest.TestCase):
         import subprocess
         return subprocess.run(
             [sys.executable, self.script_path, repo_root],
-            capture_output=True, text=True
+            capture_output=True, text=True,
+            # keep the runs out of the real verdict cache
+            env={**os.environ, 'PM_VERIFY_CACHE': '0'}
         )
 
     def test_exits_zero_when_all_files_valid(self):
@@ -300,5 +303,124 @@ class TestCliExitCode(unittest.TestCase):
         self.assertIn('misaligned isin column', result.stdout)
 
 
+class TestVerifyFiles(unittest.TestCase):
+    """Tests for the parallel, cached verify_files"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache_path = os.path.join(self.cache_dir, 'cache', 'verdicts.json')
+        self.good = os.path.join(self.temp_dir, 'good.json')
+        self.bad = os.path.join(self.temp_dir, 'bad.json')
+        self.table = os.path.join(self.temp_dir, 'table.csv')
+        with open(self.good, 'w') as f:
+            json.dump({'a': 1}, f)
+        with open(self.bad, 'w') as f:
+            f.write('{ not valid json')
+        with open(self.table, 'w') as f:
+            f.write('Col1,Col2\nVal1,Val2\n')
+        self.files = [self.good, self.bad, self.table]
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.temp_dir)
+        shutil.rmtree(self.cache_dir)
+
+    def verify(self):
+        cache = VerdictCache(self.cache_path)
+        with patch('helpers.verify_file_content.verify_file', wraps=verify_file_content.verify_file) as verify:
+            results = verify_files(self.files, jobs=1, cache=cache)
+        return results, sorted(call.args[0] for call in verify.call_args_list), cache
+
+    def test_parallel_matches_serial(self):
+        self.assertEqual(verify_files(self.files, jobs=3), verify_files(self.files, jobs=1))
+
+    def test_unchanged_files_skipped(self):
+        first, verified, _ = self.verify()
+        self.assertEqual(verified, sorted(self.files))
+        second, verified, cache = self.verify()
+        self.assertEqual(second, first)
+        # only passes are remembered
+        self.assertEqual(verified, [self.bad])
+        self.assertEqual(cache.hits, 2)
+
+    def test_changed_file_verified_again(self):
+        self.verify()
+        with open(self.table, 'a') as f:
+            f.write('Val3\n')
+        results, verified, _ = self.verify()
+        self.assertEqual(verified, sorted([self.bad, self.table]))
+        self.assertFalse(results[self.table][0])
+
+    def test_taxonomy_change_invalidates_mf_csv(self):
+        mf_csv = os.path.join(self.temp_dir, 'mf.csv')
+        taxonomy = os.path.join(self.temp_dir, 'taxonomy.json')
+        with open(mf_csv, 'w') as f:
+            f.write('code,name,isin\n1,Fund,INF123456789\n')
+        with open(taxonomy, 'w') as f:
+            json.dump({'amfi_fund_types': [], 'amfi_categories': []}, f)
+        with patch('helpers.verify_file_content.TAXONOMY_FILE', taxonomy):
+            before = get_content_hash(mf_csv)
+            with open(taxonomy, 'w') as f:
+                json.dump({'amfi_fund_types': ['Open Ended Schemes'], 'amfi_categories': []}, f)
+            self.assertNotEqual(get_content_hash(mf_csv), before)
+        self.assertEqual(get_content_hash(self.good), get_content_hash(self.good))
+
+    def test_check_source_change_invalidates(self):
+        checks = os.path.join(self.temp_dir, 'checks.py')
+        mf_checks = os.path.join(self.temp_dir, 'mf_checks.py')
+        mf_csv = os.path.join(self.temp_dir, 'mf.csv')
+        for path in [checks, mf_checks, mf_csv]:
+            with open(path, 'w') as f:
+                f.write('a\n')
+        with patch('helpers.verify_file_content.CHECKS_SOURCES', [checks]), \
+             patch('helpers.verify_file_content.MF_CSV_CHECKS_SOURCES', [mf_checks]):
+            good, mf = get_content_hash(self.good), get_content_hash(mf_csv)
+            with open(mf_checks, 'w') as f:
+                f.write('b\n')
+            self.assertEqual(get_content_hash(self.good), good)
+            self.assertNotEqual(get_content_hash(mf_csv), mf)
+            with open(checks, 'w') as f:
+                f.write('b\n')
+            self.assertNotEqual(get_content_hash(self.good), good)
+
+    def test_main_uses_cache(self):
+        with patch.dict(os.environ, {'PM_VERIFY_CACHE': '1'}):
+            first = main(self.temp_dir, jobs=2, cache_path=self.cache_path)
+            second = main(self.temp_dir, jobs=2, cache_path=self.cache_path)
+        self.assertEqual(first, second)
+        self.assertEqual(VerdictCache(self.cache_path).entries.keys(), {self.good, self.table})
+
+    def test_main_without_cache_path_keeps_no_cache(self):
+        with patch('helpers.verify_file_content.CACHE_FILE', self.cache_path), \
+                patch.dict(os.environ, {'PM_VERIFY_CACHE': '1'}):
+            main(self.temp_dir, jobs=2)
+        self.assertFalse(os.path.exists(self.cache_path))
+
+
+class TestMfCsvParsedOnce(unittest.TestCase):
+    """verify_csv_file runs all mf.csv checks over one parse of the file"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.csv_file = os.path.join(self.temp_dir, 'mf.csv')
+        with open(self.csv_file, 'w') as f:
+            f.write('code,name,isin,amfi_fund_type,amfi_category\n')
+            f.write('1,Fund,INF123456789,Open Ended Schemes,Not A Category\n')
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.temp_dir)
+
+    def test_checks_share_one_parse(self):
+        with patch('helpers.mf_entry.read_mf_csv') as read_mf_csv, \
+             patch('helpers.amfi_taxonomy.find_unapproved_taxonomy_rows') as find_rows:
+            is_valid, message = verify_csv_file(self.csv_file)
+        read_mf_csv.assert_not_called()
+        find_rows.assert_not_called()
+        self.assertFalse(is_valid)
+        self.assertIn("amfi_category='Not A Category'", message)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -1,186 +1,91 @@
 
-import datetime
+from concurrent.futures import ThreadPoolExecutor
 import requests
-import bs4
-import json
-import os
-from helpers.utils import get_float_or_none_from_string, get_date_or_none_from_string
-from selenium import webdriver
+from helpers import http_client
+from helpers.browser_pool import browser_tab
+from helpers.gold_backfill import GoldBackfill
+from helpers.gold_html import parse_physical_gold_html, parse_digital_gold_html
 from selenium.webdriver.common.by import By
-from selenium.common.exceptions import NoSuchElementException
-from selenium.webdriver.chrome.service import Service as ChromeService
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
 
 
-def get_latest_physical_gold_price():
-    url = 'https://www.gadgets360.com/finance/gold-rate-in-india'
-    # Initialize the WebDriver
-    chrome_options = webdriver.ChromeOptions()
-    '''
-    # none of the below options help with headless
-    #chrome_options.add_argument("--headless")
-    chrome_options.add_argument("--disable-blink-features=AutomationControlled")
-    chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
-    chrome_options.add_experimental_option('useAutomationExtension', False) 
-    chrome_options.add_argument("--disable-gpu")
-    chrome_options.add_argument("--no-sandbox")
-    chrome_options.add_argument("--disable-dev-shm-usage")
-    chrome_options.add_argument("--window-size=1920,1080")
-    chrome_options.add_argument("--remote-debugging-port=9222")
-    '''
-    driver = webdriver.Chrome(service=ChromeService(), options=chrome_options)
-    driver.get(url)
-    # Wait for the page to load completely (you can adjust the wait time as needed)
-    driver.implicitly_wait(10)  # Wait for up to 10 seconds for elements to be available
-    # Find the element containing the gold price (you may need to adjust the selector)
-    tables = driver.find_elements(By.TAG_NAME, 'table')
-    res = dict()
-    for table in tables:
+PHYSICAL_GOLD_URL = 'https://www.gadgets360.com/finance/gold-rate-in-india'
+DIGITAL_GOLD_URL = 'https://www.gadgets360.com/finance/digital-gold-price-in-india'
+
+
+def get_page(url):
+    try:
+        r = http_client.get(url, timeout=15, allow_redirects=True)
+    except requests.RequestException as ex:
+        print(f'exception {ex} getting {url}')
+        return None
+    if r.status_code == 200:
+        return r.text
+    print(f"Page not found {r.status_code} {url}")
+    return None
+
+def get_rendered_page(url):
+    # for when the table is only there once the page's scripts have run
+    with browser_tab() as driver:
+        driver.get(url)
         try:
-            # get the heading of the table using thead tag
-            thead = table.find_element(By.TAG_NAME, 'thead')
-            # search for 'Date' and 'Pure Gold (24K)' in the rows of thead
-            if 'Date' in thead.text and 'Pure Gold (24K)' in thead.text and '22K' in thead.text:
-                rows = table.find_elements(By.TAG_NAME, 'tr')
-                for i, row in enumerate(rows):
-                    if i == 0:
-                        continue
-                    cols = row.find_elements(By.TAG_NAME, 'td')
-                    dt = get_date_or_none_from_string(cols[0].text.strip(), "%d %B %Y")
-                    val24k = get_float_or_none_from_string(cols[1].text.replace('₹ ', '').replace(',',''))
-                    val22k = get_float_or_none_from_string(cols[2].text.replace('₹ ', '').replace(',',''))
-                    if dt and val22k and val24k:
-                        res[dt] = {"24K": val24k/10, "22K":val22k/10}
-        except NoSuchElementException:
-            continue
-    driver.quit()
-    if res:
-        return res
-    # If the above method fails, fallback to requests and BeautifulSoup
-    r = requests.get(url, timeout=15, allow_redirects=True)
-    if r.status_code==200:
-        # Creating a bs4 object to store the contents of the requested page
-        soup = bs4.BeautifulSoup(r.content, 'html.parser')
-        h2 = soup.find_all("h2")
-        for item in h2:
-            if 'Daily Gold Rate In India' in item.text:
-                rows = item.parent.find_all('tr')
-                for i, row in enumerate(rows):
-                    if i == 0:
-                        continue
-                    cols = row.find_all('td')
-                    dt = get_date_or_none_from_string(cols[0].text.strip(), "%d %B %Y")
-                    val24k = get_float_or_none_from_string(cols[1].text.replace('₹ ', '').replace(',',''))
-                    val22k = get_float_or_none_from_string(cols[2].text.replace('₹ ', '').replace(',',''))
-                    if dt and val22k and val24k:
-                        res[dt] = {"24K": val24k/10, "22K":val22k/10}
-        return res
-    else:
-        print(f"Page not found {r.status_code} {url}")
-    print('failed to get any price for latest physical gold price')
-    return res   
+            # Wait for up to 10 seconds for a table to be available
+            WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.TAG_NAME, 'table')))
+        except TimeoutException:
+            print(f'no table found in {url}')
+        return driver.page_source
 
-def get_last_close_digital_gold_price():
-    url = 'https://www.gadgets360.com/finance/digital-gold-price-in-india'
-    # Initialize the WebDriver
-    chrome_options = webdriver.ChromeOptions()
-    #chrome_options.add_argument("--headless")
-    driver = webdriver.Chrome(service=ChromeService(), options=chrome_options)
-    driver.get(url)
-    # Wait for the page to load completely (you can adjust the wait time as needed)
-    driver.implicitly_wait(10)  # Wait for up to 10 seconds for elements to be available
-    # Find the element containing the gold price (you may need to adjust the selector)
-    tables = driver.find_elements(By.TAG_NAME, 'table')
-    res = dict()
-    for table in tables:
-        # get the heading of the table using thead tag
-        thead = table.find_element(By.TAG_NAME, 'thead')
-        # search for 'Date' and 'Pure Gold (24K)' in the rows of thead
-        if 'Date' in thead.text and 'Price' in thead.text and 'Close' in thead.text:
-            rows = table.find_elements(By.TAG_NAME, 'tr')
-            for i, row in enumerate(rows):
-                if i == 0:
-                    continue
-                cols = row.find_elements(By.TAG_NAME, 'td')
-                dt = get_date_or_none_from_string(cols[0].text.strip(), "%d %B %Y")
-                val24k = get_float_or_none_from_string(cols[3].text.replace('₹ ', '').replace(',',''))
-                if dt and val24k:
-                    res[dt] = val24k
-    driver.quit()
+def get_gold_prices(url, parse):
+    res = parse(get_page(url))
     if res:
         return res
-    r = requests.get(url, timeout=15, allow_redirects=True)
-    res = dict()
-    if r.status_code==200:
-        # Creating a bs4 object to store the contents of the requested page
-        soup = bs4.BeautifulSoup(r.content, 'html.parser')
-        h2 = soup.find_all("h2")
-        for item in h2:
-            if 'Digital Gold Price for Last ' in item.text:
-                rows = item.parent.find_all('tr')
-                for i, row in enumerate(rows):
-                    if i == 0:
-                        continue
-                    cols = row.find_all('td')
-                    if len(cols) > 0:
-                        dt = get_date_or_none_from_string(cols[0].text.strip(), "%d %B %Y")
-                        if dt:
-                            val24k = get_float_or_none_from_string(cols[1].text.replace('₹ ', '').replace(',',''))
-                            if val24k:
-                                res[dt] = val24k
-                        else:
-                            print(f'failed to convert {cols[0].text.strip()} to date')
-        return res
-    else:
-        print(f"Page not found {r.status_code} {url}")
-    print('failed to get any price for latest digital gold price')
+    print(f'no prices in {url}; trying with a browser')
+    try:
+        return parse(get_rendered_page(url))
+    except Exception as ex:
+        print(f'exception {ex} getting {url} with a browser')
+        return dict()
+
+def get_latest_physical_gold_price():
+    res = get_gold_prices(PHYSICAL_GOLD_URL, parse_physical_gold_html)
+    if not res:
+        print('failed to get any price for latest physical gold price')
     return res
 
-def load_entries_from_file():
-    # get current directory of the python file
-    script_path = os.path.abspath(__file__)
-    script_dir = os.path.dirname(script_path)
-    gold_dir = os.path.join(os.path.dirname(script_dir), 'gold')
-    if not os.path.exists(gold_dir):
-        raise Exception(f"gold directory {gold_dir} does not exist")
-    today = datetime.date.today()
-    gold_file_path = os.path.join(gold_dir, f'{today.year}.json')
-    if not os.path.exists(gold_file_path):
-        # create file with content
-        data = {
-            "date_format": "dd/mm/yyyy",
-            "currency": "INR",
-            "weight": "gram",
-            "prices": {
-            }
-        }
-        with open(gold_file_path, 'w') as f:
-            json.dump(data, f, indent=4)
-    with open(gold_file_path, 'r') as f:
-        data = json.load(f)
-    return data, gold_file_path
+def get_last_close_digital_gold_price():
+    res = get_gold_prices(DIGITAL_GOLD_URL, parse_digital_gold_html)
+    if not res:
+        print('failed to get any price for latest digital gold price')
+    return res
 
-def write_entries_to_file(data, file_path):
-    with open(file_path, 'w') as f:
-        json.dump(data, f, indent=4)
+def fetch_gold_prices():
+    # both pages at once
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        physical_future = executor.submit(get_latest_physical_gold_price)
+        digi_future = executor.submit(get_last_close_digital_gold_price)
+        physical_gold = physical_future.result()
+        digi_gold = digi_future.result()
+    print(f'physical gold prices fetched {len(physical_gold)} entries')
+    print(f'digital gold prices fetched {len(digi_gold)} entries')
+    return physical_gold, digi_gold
 
-def update_gold_price():
+def update_gold_price(gold_dir=None):
     try:
-        data, file_path = load_entries_from_file()
-        physical_gold = get_latest_physical_gold_price()
-        print(f'physical gold prices fetched {len(physical_gold)} entries')
-        digi_gold = get_last_close_digital_gold_price()
-        print(f'digital gold prices fetched {len(digi_gold)} entries')
-        for k,v in digi_gold.items():
-            if k in physical_gold and k.day == 1:
-                dt_str = k.strftime("%d/%m/%Y")
-                if dt_str not in data["prices"]:
-                    data["prices"][dt_str] = dict()
-                    data["prices"][dt_str]["24K"] = physical_gold[k]["24K"]
-                    data["prices"][dt_str]["22K"] = physical_gold[k]["22K"]
-                    data["prices"][dt_str]["digital"] = v
-
-        write_entries_to_file(data, file_path)
-        print(f'gold prices updated to file {file_path}')
+        backfill = GoldBackfill(gold_dir)
+        if not backfill.missing:
+            print('gold prices are up to date')
+            return
+        print(f'gold prices missing for {len(backfill.missing)} months')
+        physical_gold, digi_gold = fetch_gold_prices()
+        for file_path in backfill.fill(physical_gold, digi_gold):
+            print(f'gold prices updated to file {file_path}')
+        for dt in sorted(backfill.filled):
+            print(f'added gold price for {dt.strftime("%d/%m/%Y")}')
+        if backfill.still_missing:
+            months = ', '.join(dt.strftime('%b %Y') for dt in backfill.still_missing)
+            print(f'gold prices still missing for {months}')
     except Exception as ex:
         print(f"exception {ex} when getting gold price")
 
@@ -1,19 +1,33 @@
 from helpers.mf_entry import get_mf_entries, write_entries, get_path_to_csv
-from helpers.mf_amfi import get_all_schemes, check_amfi_entry_complete, get_details_amfi
+from helpers.mf_amfi import iter_all_schemes, get_details_amfi_async
 from helpers.mf_kuvera import Kuvera
 from helpers.mf_ms import update_ms_details
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from helpers.async_enrich import enrich, MAX_IN_FLIGHT
+from helpers.atomic_io import Journal, Checkpoint, run_step
+from helpers.mf_table import MFTable
+from helpers.review_policy import ReviewPolicy, save_deferred_changes, apply_change_file, DEFAULT_CHANGES_FILE
+import argparse
 import os
 import subprocess
-import io
-import csv
 
 
-def review_data_changes(original_data, updated_data, phase):
-    """Interactively review per-field changes and new entries before writing."""
+def review_data_changes(original_data, updated_data, phase, policy=None, changes_file=DEFAULT_CHANGES_FILE):
+    """Interactively review per-field changes and new entries before writing.
+
+    With a ReviewPolicy nothing is asked: the policy's rules accept or reject
+    each change, and changes it can't decide are kept as they were and
+    saved to changes_file for a later apply_change_file.
+    """
     if not isinstance(original_data, dict) or not isinstance(updated_data, dict):
         return updated_data
 
+    if policy:
+        reviewed_data, deferred = policy.review(original_data, updated_data)
+        save_deferred_changes(deferred, phase, changes_file)
+        if phase:
+            write_entries(reviewed_data, phase)
+        return reviewed_data
+
     reviewed_data = {}
     for code in sorted(set(original_data.keys()) | set(updated_data.keys())):
         original_entry = original_data.get(code, {}) or {}
@@ -68,14 +82,13 @@ def review_data_changes(original_data, updated_data, phase):
     return reviewed_data
 
 
-def get_amfi():
+def get_amfi(policy=None):
     # Step 1: Get the current data from CSV and the latest schemes from AMFI, merge them to add any missing entries, and write back to CSV
     current_data = get_mf_entries()
-    amfi_schemes = get_all_schemes()
     needs_write = False
     fund_house_name_changes = {}
-    # merge these two datasets to add any missing entries in current_data
-    for code, details in amfi_schemes.items():
+    # merge each AMFI scheme into current_data as NAVAll.txt streams in, adding any missing entries
+    for code, details in iter_all_schemes():
         if code not in current_data:
             current_data[code] = details
             needs_write = True
@@ -95,19 +108,20 @@ def get_amfi():
     if needs_write:
         reset_kuvera_helper = Kuvera.__new__(Kuvera)
         reset_kuvera_helper.reset_fund_house_name_change(current_data, fund_house_name_changes)
-        current_data = review_data_changes(get_mf_entries(), current_data, 'getting all amfi schemes')
+        current_data = review_data_changes(get_mf_entries(), current_data, 'getting all amfi schemes', policy)
     return current_data
 
-def populate_amfi(current_data):
+def populate_amfi(current_data, max_in_flight=MAX_IN_FLIGHT, resume=False, policy=None):
     # Step 2: Update details from AMFI
-    needs_write = False
-    incomplete_entries = {code: details for code, details in current_data.items() 
-                         if not check_amfi_entry_complete(details)}
+    checkpoint = Checkpoint('populate_amfi', resume)
+    table = MFTable.from_entries(current_data)
+    incomplete_entries = {code: current_data[code] for code in table.codes(~table.amfi_complete_mask())
+                          if code not in checkpoint}
     
     # temp get only 10 entries
     #incomplete_entries = dict(list(incomplete_entries.items())[:10])
-    def fetch_and_update(code, details):
-        amfi_data = get_details_amfi(code)
+    async def fetch_and_update(fetcher, code, details):
+        amfi_data = await get_details_amfi_async(fetcher, code)
         if amfi_data:
             try:
                 ret = {
@@ -119,47 +133,66 @@ def populate_amfi(current_data):
                 }
                 if not 'open ended' in amfi_data['fund_house'].lower() and amfi_data['fund_house'] != '':
                     ret['fund_house'] = amfi_data['fund_house']
-                return code, ret
+                return ret
             except Exception as e:
                 print(f'ERROR: exception processing AMFI data for code {code} {amfi_data}: {e}')
                 raise e
-        return code, None
-    
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        futures = {executor.submit(fetch_and_update, code, details): code 
-                   for code, details in incomplete_entries.items()}
-        
-        for future in as_completed(futures):
-            code, data = future.result()
-            if data:
-                for key, value in data.items():
-                    current_data[code][key] = value
-                needs_write = True
-    if needs_write:
-        current_data = review_data_changes(get_mf_entries(), current_data, 'populating amfi details')
+        return None
+
+    updated_codes = set()
+    def apply_result(code, data):
+        if data and code in current_data:
+            for key, value in data.items():
+                current_data[code][key] = value
+            updated_codes.add(code)
+
+    def record_result(code, data):
+        checkpoint.add(code, data)
+        apply_result(code, data)
+
+    failed_codes = list()
+    def record_failure(code, ex):
+        # kept out of the checkpoint, so a resumed run fetches it again
+        failed_codes.append(code)
+
+    for code, data in checkpoint.results.items():
+        apply_result(code, data)
+    # api.mfapi.in has always been fetched without certificate verification
+    enrich(incomplete_entries.items(), fetch_and_update, record_result, max_in_flight=max_in_flight, verify=False,
+           on_error=record_failure)
+    checkpoint.flush()
+    if failed_codes:
+        print(f'failed to fetch amfi details for {len(failed_codes)} codes')
+    if updated_codes:
+        current_data = review_data_changes(get_mf_entries(), current_data, 'populating amfi details', policy)
+    checkpoint.clear()
     return current_data
 
-def populate_kuvera(current_data):
+def populate_kuvera(current_data, max_in_flight=MAX_IN_FLIGHT, resume=False, policy=None):
     # Step 3: Update details from Kuvera
-    needs_write = False
+    checkpoint = Checkpoint('populate_kuvera', resume)
     kuvera = Kuvera()
-    incomplete_entries = {code: details for code, details in current_data.items() 
-                         if not Kuvera.check_kuvera_entry_complete(details) and not Kuvera.check_kuvera_skip_entry(details)}
+    kuvera.resolve_isin_mapping(max_in_flight=max_in_flight)
+    table = MFTable.from_entries(current_data)
+    incomplete_entries = {code: current_data[code]
+                          for code in table.codes(~table.kuvera_complete_mask() & ~table.kuvera_skip_mask())
+                          if code not in checkpoint}
     # temp get only 10 entries
     #incomplete_entries = dict(list(incomplete_entries.items())[:2000])
-    def fetch_and_update(code, details):
+    async def fetch_and_update(fetcher, code, details):
         #print(f'fetching kuvera details for code {code} details {details}')
         isin = details.get('isin', '')
         if isin == '':
             isin = details.get('isin2', '')
-        kuvera_data = kuvera.get_fund_info(details['name'],
-                                                 isin, 
-                                                 details['amfi_fund_type'], 
-                                                 details['amfi_category'], 
-                                                 details['fund_house'])
+        kuvera_data = await kuvera.get_fund_info_async(fetcher,
+                                                       details['name'],
+                                                       isin, 
+                                                       details['amfi_fund_type'], 
+                                                       details['amfi_category'], 
+                                                       details['fund_house'])
         if kuvera_data:
             try:
-                return code,{
+                return {
                     'kuvera_name': kuvera_data['name'],
                     'kuvera_fund_category': kuvera_data['fund_category'],
                     'kuvera_code': kuvera_data['kuvera_code']
@@ -169,22 +202,37 @@ def populate_kuvera(current_data):
                 raise e
         elif 'direct' in details['name'].lower():
             print(f'no kuvera data found for name {details["name"]} and isin {isin}')
-        return code, None
-    
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        futures = {executor.submit(fetch_and_update, code, details): code 
-                   for code, details in incomplete_entries.items()}
-        
-        for future in as_completed(futures):
-            code, data = future.result()
-            if data:
-                for key, value in data.items():
-                    current_data[code][key] = value
-                needs_write = True
+        return None
+
+    updated_codes = set()
+    def apply_result(code, data):
+        if data and code in current_data:
+            for key, value in data.items():
+                current_data[code][key] = value
+            updated_codes.add(code)
+
+    def record_result(code, data):
+        checkpoint.add(code, data)
+        apply_result(code, data)
+
+    failed_codes = list()
+    def record_failure(code, ex):
+        # kept out of the checkpoint, so a resumed run fetches it again
+        failed_codes.append(code)
+
+    for code, data in checkpoint.results.items():
+        apply_result(code, data)
+    enrich(incomplete_entries.items(), fetch_and_update, record_result, max_in_flight=max_in_flight,
+           on_error=record_failure)
+    checkpoint.flush()
+    if failed_codes:
+        print(f'failed to fetch kuvera details for {len(failed_codes)} codes')
+    print(f'kuvera lookups: {kuvera.get_lookup_stats()}')
+    needs_write = bool(updated_codes)
     known_mapping = kuvera.get_known_isin_mapping()
-    for code, details in current_data.items():
-        if Kuvera.check_kuvera_entry_complete(details):
-            continue
+    table = MFTable.from_entries(current_data)
+    for code in table.codes(~table.kuvera_complete_mask()):
+        details = current_data[code]
         isin = details.get('isin', '')
         if isin == '':
             isin = details.get('isin2', '')
@@ -197,7 +245,8 @@ def populate_kuvera(current_data):
             needs_write = True
 
     if needs_write:
-        current_data = review_data_changes(get_mf_entries(), current_data, 'populating kuvera details')
+        current_data = review_data_changes(get_mf_entries(), current_data, 'populating kuvera details', policy)
+    checkpoint.clear()
     return current_data
 
 def populate_ms(current_data):
@@ -205,239 +254,148 @@ def populate_ms(current_data):
     return current_data
 
 
-def diff_with_git_head(csv_file=None):
-    """Interactively review differences between the current CSV and git HEAD."""
-    if not csv_file:
-        csv_file = get_path_to_csv()
-
-    if not os.path.exists(csv_file):
-        print(f'CSV not found: {csv_file}')
-        return
-
+def get_git_head_table(csv_file):
+    """Return (path of csv_file in the repo, MFTable of its copy at git HEAD), or (None, None) after saying why not."""
     try:
-        repo_root = subprocess.run(['git', 'rev-parse', '--show-toplevel'], check=True, stdout=subprocess.PIPE, text=True).stdout.strip()
-    except subprocess.CalledProcessError:
+        repo_root = subprocess.run(['git', 'rev-parse', '--show-toplevel'], check=True, stdout=subprocess.PIPE, text=True,
+                                   cwd=os.path.dirname(os.path.abspath(csv_file))).stdout.strip()
+    except (subprocess.CalledProcessError, OSError):
         print('Not a git repository; cannot compare with HEAD')
-        return
+        return None, None
 
-    rel_csv = os.path.relpath(csv_file, repo_root)
+    rel_csv = os.path.relpath(os.path.realpath(csv_file), os.path.realpath(repo_root)).replace(os.sep, '/')
     try:
-        subprocess.run(['git', 'ls-files', '--error-unmatch', rel_csv], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        subprocess.run(['git', 'ls-files', '--error-unmatch', rel_csv], check=True, cwd=repo_root,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
     except subprocess.CalledProcessError:
         print(f'File {rel_csv} is not tracked in git; cannot compare with HEAD')
-        return
+        return None, None
 
     try:
-        head_out = subprocess.run(['git', 'show', f'HEAD:{rel_csv}'], check=True, stdout=subprocess.PIPE, text=True).stdout
+        head_out = subprocess.run(['git', 'show', f'HEAD:{rel_csv}'], check=True, cwd=repo_root,
+                                  stdout=subprocess.PIPE, text=True).stdout
     except subprocess.CalledProcessError:
         print('Unable to read file from HEAD')
-        return
+        return None, None
+    if not head_out.strip():
+        print('HEAD CSV is empty')
+        return None, None
+    return rel_csv, MFTable.from_csv_text(head_out)
 
-    with open(csv_file, 'r', newline='') as work_f:
-        work_text = work_f.read()
-    head_text = head_out
 
-    head_lines = head_text.splitlines()
-    work_lines = work_text.splitlines()
+def get_changes_since_git_head(csv_file=None):
+    """Return (path of mf.csv in the repo, MFTableDiff of the working copy against git HEAD), or (None, None)."""
+    if not csv_file:
+        csv_file = get_path_to_csv()
+    if not os.path.exists(csv_file):
+        print(f'Working CSV not found: {csv_file}')
+        return None, None
+    rel_csv, head = get_git_head_table(csv_file)
+    if head is None:
+        return None, None
+    return rel_csv, MFTable.read_csv(csv_file).diff(head)
 
-    print(f'Diff for {rel_csv}')
-    print('--- HEAD ---')
-    print('\n'.join(head_lines[:20]))
-    print('--- WORKTREE ---')
-    print('\n'.join(work_lines[:20]))
 
-    if len(head_lines) != len(work_lines):
-        print(f'Line count changed: {len(head_lines)} -> {len(work_lines)}')
+def diff_with_git_head(csv_file=None):
+    """Interactively review differences between the current CSV and git HEAD."""
+    if not csv_file:
+        csv_file = get_path_to_csv()
+    rel_csv, diff = get_changes_since_git_head(csv_file)
+    if diff is None:
+        return
 
-    head_rows = list(csv.reader(io.StringIO(head_text)))
-    work_rows = list(csv.reader(io.StringIO(work_text)))
-    if not head_rows or not work_rows:
+    changed = diff.changed_codes()
+    print(f'Diff for {rel_csv}')
+    print(f'Added entries: {len(diff.added)}, removed entries: {len(diff.removed)}, changed entries: {len(changed)}')
+    if not diff:
         print('No rows to review')
         return
 
-    head_header = head_rows[0]
-    work_header = work_rows[0]
-    if head_header != work_header:
-        print('Header changed')
-        print(f'  HEAD: {head_header}')
-        print(f'  WORK: {work_header}')
-        choice = input('Keep header change? [Y/n]: ').strip().lower()
-        if choice not in {'', 'y', 'yes'}:
-            work_rows[0] = head_header
-            work_text = '\n'.join([','.join(row) for row in work_rows]) + '\n'
-
-    head_map = {}
-    work_map = {}
-    for row in head_rows[1:]:
-        if not row:
-            continue
-        code = row[0]
-        head_map[code] = row
-    for row in work_rows[1:]:
-        if not row:
-            continue
-        code = row[0]
-        work_map[code] = row
-
-    all_codes = sorted(set(head_map.keys()) | set(work_map.keys()))
-    for code in all_codes:
-        head_row = head_map.get(code)
-        work_row = work_map.get(code)
-        if head_row is None and work_row is not None:
+    reviewed = diff.new.to_entries()
+    added = set(diff.added)
+    removed = set(diff.removed)
+    for code in sorted(added | removed | set(changed)):
+        if code in added:
             print(f'\nNew entry {code}:')
-            for field, value in zip(work_header, work_row):
+            for field, value in diff.new.get_entry(code).items():
                 print(f'  {field}: {value}')
             choice = input('Keep this new entry? [Y/n]: ').strip().lower()
             if choice not in {'', 'y', 'yes'}:
-                work_rows = [row for row in work_rows if not (row and row[0] == code)]
-                continue
-        elif head_row is not None and work_row is None:
+                del reviewed[code]
+        elif code in removed:
             print(f'\nDeleted entry {code}')
             choice = input('Restore this deleted entry? [Y/n]: ').strip().lower()
             if choice in {'', 'y', 'yes'}:
-                work_rows.append(head_row)
-        elif head_row is not None and work_row is not None:
+                reviewed[code] = diff.old.get_entry(code)
+        else:
             print(f'\nEntry {code}:')
-            for idx, field in enumerate(head_header):
-                old_value = head_row[idx] if idx < len(head_row) else ''
-                new_value = work_row[idx] if idx < len(work_row) else ''
-                if (old_value or '') != (new_value or ''):
-                    print(f'  {field}: {old_value} -> {new_value}')
-            if any((head_row[idx] if idx < len(head_row) else '') != (work_row[idx] if idx < len(work_row) else '') for idx in range(len(head_header))):
-                choice = input('Keep this entry change? [Y/n]: ').strip().lower()
-                if choice not in {'', 'y', 'yes'}:
-                    work_map[code] = head_row
-
-    final_rows = [head_header]
-    for code in sorted(work_map.keys()):
-        final_rows.append(work_map[code])
-
-    work_text = '\n'.join([','.join(row) for row in final_rows]) + '\n'
-    with open(csv_file, 'w', newline='') as out_f:
-        out_f.write(work_text)
-    print(f'Wrote reviewed content back to {csv_file}')
-
-
-def print_summary_of_changes():
-    csv_file = get_path_to_csv()
-    # Read working copy
-    if not os.path.exists(csv_file):
-        print(f'Working CSV not found: {csv_file}')
-        return
-
-    with open(csv_file, newline='') as f:
-        reader = csv.reader(f)
-        try:
-            work_header = next(reader)
-        except StopIteration:
-            print('Working CSV is empty')
-            return
-        work_rows = list(reader)
-
-    # Determine repo root and relative path
-    try:
-        repo_root = subprocess.run(['git', 'rev-parse', '--show-toplevel'], check=True, stdout=subprocess.PIPE, text=True).stdout.strip()
-    except subprocess.CalledProcessError:
-        print('Not a git repository; cannot obtain HEAD version for comparison')
-        return
+            for field, old_value, new_value in diff.get_field_changes(code):
+                print(f'  {field}: {old_value} -> {new_value}')
+            choice = input('Keep this entry change? [Y/n]: ').strip().lower()
+            if choice not in {'', 'y', 'yes'}:
+                reviewed[code] = diff.old.get_entry(code)
 
-    rel_csv = "../mf.csv"
+    write_entries(reviewed, 'reviewing changes against git HEAD', csv_file)
+    print(f'Wrote reviewed content back to {csv_file}')
 
-    # Ensure file is tracked
-    try:
-        subprocess.run(['git', 'ls-files', '--error-unmatch', rel_csv], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-    except subprocess.CalledProcessError:
-        print(f'File {rel_csv} is not tracked in git; cannot compare with HEAD')
-        return
 
-    # Read HEAD version from git
-    try:
-        head_out = subprocess.run(['git', 'show', f'HEAD:{rel_csv}'], check=True, stdout=subprocess.PIPE, text=True).stdout
-    except subprocess.CalledProcessError:
-        print('Unable to read file from HEAD')
+def print_summary_of_changes(csv_file=None):
+    rel_csv, diff = get_changes_since_git_head(csv_file)
+    if diff is None:
         return
 
-    head_f = io.StringIO(head_out)
-    head_reader = csv.reader(head_f)
-    try:
-        head_header = next(head_reader)
-    except StopIteration:
-        print('HEAD CSV is empty')
-        return
-    head_rows = list(head_reader)
-
-    # Build dicts keyed by first column (code)
-    def build_map(header, rows):
-        fields = header[1:]
-        m = {}
-        for row in rows:
-            if not row:
-                continue
-            key = row[0]
-            values = {}
-            for i, field in enumerate(fields, start=1):
-                val = ''
-                if i < len(row):
-                    val = row[i]
-                values[field] = val
-            m[key] = values
-        return fields, m
-
-    work_fields, work_map = build_map(work_header, work_rows)
-    head_fields, head_map = build_map(head_header, head_rows)
-
-    # Union of all fields
-    all_fields = list(dict.fromkeys(head_fields + work_fields))
-
-    work_keys = set(work_map.keys())
-    head_keys = set(head_map.keys())
-
-    added = sorted(work_keys - head_keys)
-    removed = sorted(head_keys - work_keys)
-    common = sorted(work_keys & head_keys)
-
-    field_change_counts = {f: 0 for f in all_fields}
-    field_changed_codes = {f: [] for f in all_fields}
-    entries_with_changes = []
-
-    for code in common:
-        changed = False
-        for field in all_fields:
-            v_work = work_map.get(code, {}).get(field, '')
-            v_head = head_map.get(code, {}).get(field, '')
-            if (v_work or '') != (v_head or ''):
-                field_change_counts[field] += 1
-                field_changed_codes[field].append(code)
-                changed = True
-        if changed:
-            entries_with_changes.append(code)
+    changed = diff.changed_codes()
+    field_change_counts = diff.field_change_counts()
+    field_changed_codes = diff.changed_codes_by_field()
 
     # Print summary
     print(f'CSV comparison for {rel_csv}')
-    print(f'Added entries: {len(added)}')
-    if added:
-        print(', '.join(added))
-    print(f'Removed entries: {len(removed)}')
-    if removed:
-        print(', '.join(removed))
-    print(f'Entries changed: {len(entries_with_changes)}')
+    print(f'Added entries: {len(diff.added)}')
+    if diff.added:
+        print(', '.join(diff.added))
+    print(f'Removed entries: {len(diff.removed)}')
+    if diff.removed:
+        print(', '.join(diff.removed))
+    print(f'Entries changed: {len(changed)}')
 
     print('\nPer-field change counts:')
-    for field in all_fields:
-        print(f'- {field}: {field_change_counts.get(field,0)}')
+    for field, count in field_change_counts.items():
+        print(f'- {field}: {count}')
 
     # Optionally show sample codes changed per field
     print('\nSample changed codes per field (up to 10 each):')
-    for field in all_fields:
-        codes = field_changed_codes.get(field, [])[:10]
+    for field, codes in field_changed_codes.items():
         if codes:
-            print(f'- {field}: {", ".join(codes)}')
+            print(f'- {field}: {", ".join(codes[:10])}')
+
 
 if __name__ == "__main__":
-    data = get_amfi()
-    #data = populate_amfi(data)
-    data = populate_kuvera(data)
-    #data = populate_ms(data)
+    parser = argparse.ArgumentParser(description='Update mf.csv from AMFI, Kuvera and Morningstar')
+    parser.add_argument('--resume', action='store_true',
+                        help='continue an interrupted run: skip completed phases and scheme codes already fetched')
+    parser.add_argument('--unattended', action='store_true',
+                        help='review changes with rules instead of prompting; undecided changes go to the change file')
+    parser.add_argument('--rules', help='JSON file of review rules for --unattended (default: accept blank fields being filled)')
+    parser.add_argument('--changes-file', default=DEFAULT_CHANGES_FILE, help='where --unattended keeps undecided changes')
+    parser.add_argument('--apply-changes', action='store_true',
+                        help='apply the changes marked accept in the change file to mf.csv and exit')
+    args = parser.parse_args()
+    if args.apply_changes:
+        apply_change_file(args.changes_file)
+        raise SystemExit(0)
+    policy = None
+    if args.unattended:
+        policy = ReviewPolicy.load(args.rules) if args.rules else ReviewPolicy()
+    journal = Journal('update_mf')
+    if not args.resume:
+        journal.clear()
+    # a phase an interrupted run completed has written its results to mf.csv,
+    # so when it is skipped its data is read from there
+    data = run_step(journal, 'get_amfi', get_amfi, policy) or get_mf_entries()
+    #data = run_step(journal, 'populate_amfi', populate_amfi, data, resume=args.resume, policy=policy) or get_mf_entries()
+    data = run_step(journal, 'populate_kuvera', populate_kuvera, data, resume=args.resume, policy=policy) or get_mf_entries()
+    #data = run_step(journal, 'populate_ms', populate_ms, data) or get_mf_entries()
+    journal.clear()
     print_summary_of_changes()
 
 
@@ -1,8 +1,12 @@
+import argparse
 import os
 import pathlib
 import json
 from helpers.stock_nse import update_nse
 from helpers.stock_bse import update_bse
+from helpers.atomic_io import write_json, Journal, run_step
+from helpers.symbol_index import SymbolIndex
+from helpers.merge_rules import merge_entry, merge_entries, count_fired_rules, UPDATE_RULES, SELECTED_FIELD_RULES
 from datetime import datetime
 from rich.console import Console
 from rich.table import Table
@@ -17,17 +21,18 @@ def check_strings(string1, string2):
         return True
     return False
 
-def check_matching_symbols(orig_data, new_data):
-    for isin, data in orig_data.items():
-        if check_strings(data['bse_security_id'], new_data['bse_security_id']):
-            return isin, data
-        if new_data['bse_security_id'] != '' and new_data['bse_security_id'] in data['old_bse_security_id']:
-            return isin, data
-        if check_strings(data['nse_symbol'], new_data['nse_symbol']):
-            return isin, data
-        if new_data['nse_symbol'] != '' and  new_data['nse_symbol'] in data['old_nse_symbol']:
-            return isin, data
-    return None, None
+def check_matching_symbols(orig_data, new_data, index=None):
+    """
+    Return (isin, data) of the entry in orig_data whose current or old BSE security id or NSE
+    symbol is one of new_data's, or (None, None).  Pass a SymbolIndex kept in step with
+    orig_data to avoid indexing orig_data on every call.
+    """
+    if index is None:
+        index = SymbolIndex(orig_data)
+    isin = index.find(new_data)
+    if isin is None:
+        return None, None
+    return isin, orig_data[isin]
 
 def merge_new_info(download_dir, delete_downloaded_files, delete_processed_files):
     orig_file_path = os.path.join(str(pathlib.Path(__file__).parent.parent.absolute()), 'nse_bse_eq.json')
@@ -40,21 +45,21 @@ def merge_new_info(download_dir, delete_downloaded_files, delete_processed_files
     with open(new_file_path, 'r', encoding='utf-8') as f:
         update_data = json.load(f)
     merged_data = dict()
+    # symbols of merged_data, updated along with it
+    index = SymbolIndex()
     
     for isin, data in original_data.items():
         if isin in update_data:
             n_data = update_data[isin]
             merged_data[isin] = data
-            for key, value in n_data.items():
-                if value and value.strip() != '':
-                    merged_data[isin][key] = value
+            merge_entry(n_data, merged_data[isin], UPDATE_RULES)
+            index.add(isin, merged_data[isin])
         else:
-            matching_isin, matching_data = check_matching_symbols(merged_data, data)
+            matching_isin, matching_data = check_matching_symbols(merged_data, data, index)
             if matching_isin:
                 merged_data[matching_isin] = data
-                for key, value in matching_data.items():
-                    if value and value.strip() != '':
-                        merged_data[matching_isin][key] = value
+                merge_entry(matching_data, merged_data[matching_isin], UPDATE_RULES)
+                index.add(matching_isin, merged_data[matching_isin])
             else:
                 print(f'found no matching data {isin} {data}')
     
@@ -64,20 +69,19 @@ def merge_new_info(download_dir, delete_downloaded_files, delete_processed_files
         #    print(f'ignoring isin {isin} because its a ETF or MF')
         #    continue
         if isin in merged_data:
-            for key, value in data.items():
-                if value and value.strip() != '':
-                    merged_data[isin][key] = value  # Replace or add the key-value pair
+            merge_entry(data, merged_data[isin], UPDATE_RULES)  # Replace or add the non blank fields
+            index.add(isin, merged_data[isin])
         else:
-            matching_isin, matching_data = check_matching_symbols(merged_data, data)
+            matching_isin, matching_data = check_matching_symbols(merged_data, data, index)
             if not matching_isin:
                 merged_data[isin] = data
+                index.add(isin, data)
             else:
                 print(f'found matching data {matching_isin} {matching_data} {isin} {data}')
     merged_file_path = os.path.join(str(pathlib.Path(__file__).parent.parent.absolute()), 'modified_nse_bse_eq.json')
 
     # Write the updated JSON back to the output file while maintaining order
-    with open(merged_file_path, 'w', encoding='utf-8') as f:
-        json.dump(merged_data, f, indent=1, ensure_ascii=False)
+    write_json(merged_file_path, merged_data, encoding='utf-8', indent=1, ensure_ascii=False)
     if delete_processed_files:
         os.remove(new_file_path)
     print(f"Updated JSON has been saved to {merged_file_path}")
@@ -94,60 +98,12 @@ def copy_selected_fields(delete_downloaded_files, delete_processed_files):
     with open(orig_file_path, 'r') as file2:
         dict2 = json.load(file2)
 
-    # Loop through each key in dict1
-    for key, value in dict1.items():
-        if key in dict2:
-            # Check if the 'bse_security_id', 'bse_security_code', and 'nse_symbol' match
-            if (dict1[key].get('bse_security_id') != '' and
-                dict1[key].get('bse_security_id') == dict2[key].get('bse_security_id') and
-                dict1[key].get('bse_security_code') == dict2[key].get('bse_security_code') and
-                dict1[key].get('nse_symbol') == dict2[key].get('nse_symbol')):
-                
-                # Copy 'bse_name', 'status', and 'industry' from dict1 to dict2
-                dict2[key]['bse_name'] = value.get('bse_name')
-                dict2[key]['status'] = value.get('status')
-                dict2[key]['industry'] = value.get('industry')
-                if value.get('listing_date','').strip() != '':
-                    dict2[key]['listing_date'] = value.get('listing_date')
-                if value.get('cap','').strip() != '':
-                    dict2[key]['cap'] = value.get('cap')
-                if value.get('face_value','').strip() != '':
-                    dict2[key]['face_value'] = value.get('face_value')
-    # Copy NSE
-    for key, value in dict1.items():
-        if key in dict2:
-            # Check if the 'bse_security_id', 'bse_security_code' match
-            if (dict1[key].get('bse_security_id') == dict2[key].get('bse_security_id') and
-                dict1[key].get('bse_security_code') == dict2[key].get('bse_security_code')):
-                # if nse info is missing or if nse symbol is same while info needs updates
-                if (dict1[key].get('nse_symbol', '') != '' and
-                    dict2[key].get('nse_symbol', '') == ''):
-                        dict2[key]['nse_symbol'] = value.get('nse_symbol')
-                        dict2[key]['listing_date'] = value.get('listing_date')
-                        dict2[key]['nse_name'] = value.get('nse_name')
-                        dict2[key]['industry'] = value.get('industry')
-                elif (dict1[key].get('nse_symbol', '') != '' and
-                    dict2[key].get('nse_symbol', '') == dict1[key].get('nse_symbol')):
-                    dict2[key]['listing_date'] = value.get('listing_date')
-                    dict2[key]['nse_name'] = value.get('nse_name')
-                    dict2[key]['industry'] = value.get('industry')
-    # Copy BSE
-    for key, value in dict1.items():
-        if key in dict2:
-            # Check if the 'nse_symbol', 'bse_security_code', and 'nse_symbol' match
-            if (dict1[key].get('nse_symbol', '') != '' and
-                dict1[key].get('nse_symbol') == dict2[key].get('nse_symbol') and
-                dict2[key].get('bse_security_code') == '' and
-                dict2[key].get('bse_security_id') == '' and
-                dict2[key].get('nse_symbol') == dict1[key].get('bse_security_id')):
-                # if bse info is missing while nse symbol matches and is same as new bse security id
-                    dict2[key]['bse_security_code'] = value.get('bse_security_code')
-                    dict2[key]['bse_security_id'] = value.get('bse_security_id')
-                    dict2[key]['bse_name'] = value.get('bse_name')
-                    dict2[key]['status'] = value.get('status')
+    # one pass over dict1 applies every rule to each ISIN in both
+    fired = merge_entries(dict1, dict2, SELECTED_FIELD_RULES)
+    for name, count in sorted(count_fired_rules(fired).items()):
+        print(f'{name}: updated {count} ISINs')
     # Write the updated dictionary back to the second JSON file
-    with open(orig_file_path, 'w') as file2:
-        json.dump(dict2, file2, indent=1)
+    write_json(orig_file_path, dict2, indent=1)
 
     print(f"Selected fields copied successfully and written to {orig_file_path}.")
 
@@ -164,30 +120,29 @@ def interactive_mapping(delete_downloaded_files, delete_processed_files):
 
     merged_data = dict()
     result = -1
-    updated_isins = list()
+    updated_isins = set()
+    # find every new entry sharing a BSE security id, BSE security code or NSE
+    # symbol with an original ISIN missing from new_data before asking anything
+    index = SymbolIndex(new_data, old_symbols=False)
+    candidates = {o_key: index.find_all(o_value) for o_key, o_value in orig_data.items() if o_key not in new_data}
     # Loop through each key in dict1
     for o_key, o_value in orig_data.items():
         if o_key in updated_isins:
             continue
         if result != 2 and o_key not in new_data:
             unhandled = True
-            for nk, nv in new_data.items():
-                # Check if the 'bse_security_id', 'bse_security_code', or 'nse_symbol' match
-                if ((o_value.get('bse_security_id', '') != '' and
-                    o_value.get('bse_security_id') == nv.get('bse_security_id', '')) or
-                    (o_value.get('bse_security_code', '') != '' and
-                    o_value.get('bse_security_code') == nv.get('bse_security_code', '')) or
-                    (o_value.get('nse_symbol', '') != '' and
-                    o_value.get('nse_symbol') == nv.get('nse_symbol', ''))):
-                    
-                    accept_data = print_as_table(nk, nv, o_key, o_value)
-                    result = ask_yes_no("Do you want to merge?")
-                    if result == 0:
-                        merged_data[nk] = accept_data
-                        updated_isins.append(nk)
-                    else:
-                        merged_data[o_key] = o_value
-                    unhandled = False
+            for nk in candidates[o_key]:
+                nv = new_data[nk]
+                accept_data = print_as_table(nk, nv, o_key, o_value)
+                result = ask_yes_no("Do you want to merge?")
+                if result == 0:
+                    merged_data[nk] = accept_data
+                    updated_isins.add(nk)
+                else:
+                    merged_data[o_key] = o_value
+                unhandled = False
+                if result == 2:
+                    break
             if unhandled:
                 merged_data[o_key] = o_value
         elif result != 2 and o_key in new_data:
@@ -198,7 +153,7 @@ def interactive_mapping(delete_downloaded_files, delete_processed_files):
                 result = ask_yes_no("Do you want to merge?")
                 if result == 0:
                     merged_data[o_key] = accept_data
-                    updated_isins.append(o_key)
+                    updated_isins.add(o_key)
                 else:
                     merged_data[o_key] = o_value
             else:
@@ -207,8 +162,7 @@ def interactive_mapping(delete_downloaded_files, delete_processed_files):
             merged_data[o_key] = o_value
     
     # Write the updated dictionary back to the second JSON file
-    with open(orig_file_path, 'w') as file2:
-        json.dump(merged_data, file2, indent=1)
+    write_json(orig_file_path, merged_data, indent=1)
 
     print(f"Merged approved data successfully and written to {orig_file_path}.")
 
@@ -223,8 +177,7 @@ def clean_any_stale_data():
             continue
         clean_data[o_key] = o_value
     # Write the updated dictionary back to the JSON file
-    with open(orig_file_path, 'w') as file2:
-        json.dump(clean_data, file2, indent=1)
+    write_json(orig_file_path, clean_data, indent=1)
 
     print(f"Cleaned data successfully and written to {orig_file_path}.")
 
@@ -252,8 +205,7 @@ def add_new_data(delete_downloaded_files, delete_processed_files):
                 break
             
     # Write the updated dictionary back to the second JSON file
-    with open(orig_file_path, 'w') as file2:
-        json.dump(orig_data, file2, indent=1)
+    write_json(orig_file_path, orig_data, indent=1)
     if delete_processed_files:
         os.remove(new_file_path)
     print(f"Merged approved data successfully and written to {orig_file_path}.")
@@ -464,13 +416,21 @@ def ask_yes_no(question):
         return 2
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Update nse_bse_eq.json from the NSE and BSE lists')
+    parser.add_argument('--resume', action='store_true',
+                        help='continue an interrupted run after the last phase it completed')
+    args = parser.parse_args()
     delete_downloaded_files = True
     delete_processed_files = True
-    update_nse(download_dir(), delete_downloaded_files, delete_processed_files)
-    update_bse(download_dir(), delete_downloaded_files, delete_processed_files)
-    merge_new_info(download_dir(), delete_downloaded_files, delete_processed_files)
-    copy_selected_fields(delete_downloaded_files, delete_processed_files)
-    interactive_mapping(delete_downloaded_files, delete_processed_files)
-    add_new_data(delete_downloaded_files, delete_processed_files)
-    clean_any_stale_data()
+    journal = Journal('update_share')
+    if not args.resume:
+        journal.clear()
+    run_step(journal, 'update_nse', update_nse, download_dir(), delete_downloaded_files, delete_processed_files)
+    run_step(journal, 'update_bse', update_bse, download_dir(), delete_downloaded_files, delete_processed_files)
+    run_step(journal, 'merge_new_info', merge_new_info, download_dir(), delete_downloaded_files, delete_processed_files)
+    run_step(journal, 'copy_selected_fields', copy_selected_fields, delete_downloaded_files, delete_processed_files)
+    run_step(journal, 'interactive_mapping', interactive_mapping, delete_downloaded_files, delete_processed_files)
+    run_step(journal, 'add_new_data', add_new_data, delete_downloaded_files, delete_processed_files)
+    run_step(journal, 'clean_any_stale_data', clean_any_stale_data)
+    journal.clear()
     
\ No newline at end of file
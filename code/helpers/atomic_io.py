@@ -0,0 +1,16 @@
+import importlib.util
+import os
+
+
+# India/code/helpers/atomic_io.py is the one implementation; it is loaded by
+# path since this package and that one are both named helpers.
+INDIA_ATOMIC_IO = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                               'India', 'code', 'helpers', 'atomic_io.py')
+
+_spec = importlib.util.spec_from_file_location('india_atomic_io', INDIA_ATOMIC_IO)
+_atomic_io = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(_atomic_io)
+
+fsync_dir = _atomic_io.fsync_dir
+atomic_write = _atomic_io.atomic_write
+write_json = _atomic_io.write_json
@@ -1,4 +1,5 @@
 from helpers.use_llm import query_llm
+from helpers.atomic_io import write_json
 from dateutil.parser import parse
 import json
 import re
@@ -57,8 +58,7 @@ def update_isin_info_for_usa(symbol: str):
         # update existing data with new info
         existing_data.update(info)
         # write back to file
-        with open(file_path, "w") as f:
-            json.dump(existing_data, f, indent=2)
+        write_json(file_path, existing_data, indent=2)
     except Exception as ex:
         print(f"ERROR: exception {ex} when trying to update ISIN info for USA {symbol}")
 